@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the OTHERIDES generation pipeline
+
+Runs the generator against the local fake OpenAI and Drive servers in
+benchmarks/fake_servers.py (no API keys, no cost, no network) and reports
+throughput plus p50/p95/p99 latency per scenario:
+
+- generate_sequential: generate + download + hash + upload + insert, one vehicle at a time
+- generate_concurrent: the same on a thread pool (--concurrency)
+- pipeline:            VehiclePipeline with its default stage pools
+- db_insert:           one transaction per vehicle row
+- db_insert_batched:   rows queued and flushed by VehicleDatabase.batch()
+- export:              streaming JSON and NDJSON metadata exports
+- archive_read:        reading images from a packed mmap archive vs one file each
+- startup:             import + constructor in fresh interpreters
+
+Results are machine-readable (--out results.json) and can be compared with
+an earlier run (--baseline old.json); a throughput drop beyond
+--max-regression exits non-zero.
+
+Usage: python benchmarks/bench_pipeline.py [--vehicles N] [--scenarios a,b] [--latency S] [--out FILE] [--baseline FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_startup  # noqa: E402
+from fake_servers import FakeDriveServer, FakeOpenAIServer  # noqa: E402
+
+SCENARIOS = ('generate_sequential', 'generate_concurrent', 'pipeline', 'db_insert',
+             'db_insert_batched', 'export', 'archive_read', 'startup')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, elapsed, operations=None, unit="vehicle", **extra):
+    """Throughput and latency percentiles (ms) for one scenario"""
+    operations = len(latencies) if operations is None else operations
+    return {
+        'unit': unit,
+        'operations': operations,
+        'seconds': round(elapsed, 4),
+        'throughput_per_sec': round(operations / elapsed, 3) if elapsed > 0 else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'max': round(max(latencies, default=0.0) * 1000, 3),
+        },
+        **extra,
+    }
+
+
+class BenchmarkContext:
+    """Fake servers, scratch directory and settings shared by the scenarios"""
+
+    def __init__(self, args, workdir, openai_server, drive_server):
+        self.args = args
+        self.workdir = workdir
+        self.openai_server = openai_server
+        self.drive_server = drive_server
+        self._runs = 0
+
+    def scratch(self, name):
+        """A fresh directory for one scenario run"""
+        self._runs += 1
+        path = os.path.join(self.workdir, f"{self._runs:02d}_{name}")
+        os.makedirs(path)
+        return path
+
+    def generator(self, name):
+        """Generator with its own database, no generation cache and optional post-processing"""
+        from otherides_generator import OtheridesAssetGenerator
+
+        scratch = self.scratch(name)
+        generator = OtheridesAssetGenerator(
+            db_path=os.path.join(scratch, 'bench.db'),
+            cache_dir=None,
+            seed=self.args.seed,
+            variants_dir=os.path.join(scratch, 'variants') if self.args.postprocess else None,
+            storage_dir=os.path.join(scratch, 'assets'),
+            postprocess_workers=self.args.postprocess_workers,
+        )
+        if not self.args.drive:
+            generator.drive_service = None
+        return generator
+
+    def records(self, count):
+        """Synthetic vehicle rows shaped like the generator's, with unique image_ids"""
+        from otherides_generator import OtheridesAssetGenerator
+
+        planner = OtheridesAssetGenerator(db_path=os.path.join(self.scratch('plan'), 'plan.db'),
+                                          cache_dir=None, seed=self.args.seed, variants_dir=None)
+        records = []
+        for index in range(count):
+            vehicle_data = planner.prepare_otherides_vehicle()
+            vehicle_data['image_id'] = f"{vehicle_data['image_id']}_{index:07d}"
+            records.append(planner._build_vehicle_record(
+                vehicle_data, 'bench', f"{vehicle_data['image_id']}.png", f"bench/{vehicle_data['image_id']}.png",
+                {'id': f"file{index}", 'webViewLink': f"https://drive.example/{index}"},
+                f"{index:064x}", f"{index:016x}"
+            ))
+        planner.db.close()
+        return records
+
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """Swallow the generator's progress output unless --verbose"""
+    if enabled:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    else:
+        yield
+
+
+def _generate_and_save(generator, spec):
+    started = time.perf_counter()
+    vehicle_data = generator.generate_otherides_vehicle(**spec)
+    saved = generator._save_otherides_vehicle(vehicle_data, 'bench') if vehicle_data else None
+    return time.perf_counter() - started, saved is not None
+
+
+def bench_generate_sequential(ctx):
+    generator = ctx.generator('generate_sequential')
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(ctx.args.vehicles):
+        latency, ok = _generate_and_save(generator, {})
+        latencies.append(latency)
+        failures += not ok
+    elapsed = time.perf_counter() - started
+    generator.db.close()
+    return summarize(latencies, elapsed, ctx.args.vehicles - failures, failures=failures)
+
+
+def bench_generate_concurrent(ctx):
+    generator = ctx.generator('generate_concurrent')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=ctx.args.concurrency) as executor:
+        outcomes = list(executor.map(lambda _: _generate_and_save(generator, {}), range(ctx.args.vehicles)))
+    elapsed = time.perf_counter() - started
+    generator.db.close()
+    failures = sum(1 for _, ok in outcomes if not ok)
+    return summarize([latency for latency, _ in outcomes], elapsed, len(outcomes) - failures,
+                     failures=failures, concurrency=ctx.args.concurrency)
+
+
+def bench_pipeline(ctx):
+    from otherides_pipeline import VehiclePipeline
+
+    class TimedPipeline(VehiclePipeline):
+        """Records each item's time from entering generate to leaving persist"""
+
+        def _generate(self, item):
+            item['bench_started'] = time.perf_counter()
+            return super()._generate(item)
+
+        def _persist(self, item):
+            item = super()._persist(item)
+            item['result']['bench_latency'] = time.perf_counter() - item['bench_started']
+            return item
+
+    generator = ctx.generator('pipeline')
+    pipeline = TimedPipeline(generator, 'bench')
+    started = time.perf_counter()
+    results = pipeline.run([{} for _ in range(ctx.args.vehicles)])
+    elapsed = time.perf_counter() - started
+    generator.db.close()
+
+    latencies = [result['bench_latency'] for _, result in results if result]
+    stages = {stage['stage']: stage['utilization'] for stage in pipeline.stats()}
+    return summarize(latencies, elapsed, failures=len(results) - len(latencies),
+                     bottleneck=pipeline.bottleneck(), utilization=stages)
+
+
+def _insert_rows(ctx, name, batched):
+    from otherides_db import VehicleDatabase
+    from otherides_schema import migrate
+
+    records = ctx.records(ctx.args.rows)
+    db = VehicleDatabase(os.path.join(ctx.scratch(name), 'bench.db'))
+    migrate(db.connection)
+
+    latencies = []
+    started = time.perf_counter()
+    with (db.batch() if batched else contextlib.nullcontext()):
+        for record in records:
+            row_started = time.perf_counter()
+            if batched:
+                db.queue_vehicle(record)
+            else:
+                db.insert_vehicle(record)
+            latencies.append(time.perf_counter() - row_started)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return latencies, elapsed, db.db_path
+
+
+def bench_db_insert(ctx):
+    latencies, elapsed, _ = _insert_rows(ctx, 'db_insert', batched=False)
+    return summarize(latencies, elapsed, unit="row")
+
+
+def bench_db_insert_batched(ctx):
+    latencies, elapsed, _ = _insert_rows(ctx, 'db_insert_batched', batched=True)
+    # Most rows only join the queue; the flushes show up in p99/max
+    return summarize(latencies, elapsed, unit="row")
+
+
+def bench_export(ctx):
+    from utils.database_viewer import export_metadata
+
+    _, _, db_path = _insert_rows(ctx, 'export', batched=True)
+    output_dir = os.path.dirname(db_path)
+    results = {}
+    for output_format in ('json', 'ndjson'):
+        latencies = []
+        for run in range(ctx.args.repeats):
+            started = time.perf_counter()
+            export_metadata(db_path, os.path.join(output_dir, f"export_{run}.{output_format}"), output_format)
+            latencies.append(time.perf_counter() - started)
+        elapsed = sum(latencies)
+        # Latency is per export; throughput is rows written per second
+        results[output_format] = summarize(latencies, elapsed, ctx.args.rows * len(latencies), unit="row",
+                                           exports=len(latencies))
+    return {**results['ndjson'], 'formats': results}
+
+
+def bench_archive_read(ctx):
+    import zlib
+
+    from otherides_archive import AssetArchive
+
+    scratch = ctx.scratch('archive_read')
+    count = ctx.args.archive_images
+    # Distinct served PNGs (a trailing counter defeats the archive's dedupe)
+    images = [ctx.openai_server.images[index % len(ctx.openai_server.images)] + index.to_bytes(8, 'big')
+              for index in range(count)]
+    paths = [os.path.join(scratch, f"{index:06d}.png") for index in range(count)]
+    with AssetArchive(os.path.join(scratch, 'bench.pack'), writable=True, fsync=False) as archive:
+        for index, (path, data) in enumerate(zip(paths, images)):
+            with open(path, 'wb') as f:
+                f.write(data)
+            archive.append(str(index), data)
+
+    # Each read is consumed (CRC32) so the archive's lazily faulted pages are paid for too
+    def read_files():
+        latencies = []
+        for path in paths:
+            started = time.perf_counter()
+            with open(path, 'rb') as f:
+                zlib.crc32(f.read())
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def read_archive():
+        latencies = []
+        with AssetArchive(os.path.join(scratch, 'bench.pack')) as archive:
+            for index in range(count):
+                started = time.perf_counter()
+                zlib.crc32(archive[str(index)])
+                latencies.append(time.perf_counter() - started)
+        return latencies
+
+    results = {}
+    for name, read in (('files', read_files), ('archive', read_archive)):
+        latencies = read()
+        results[name] = summarize(latencies, sum(latencies), unit="image")
+    return {**results['archive'], 'files': results['files']}
+
+
+def bench_startup_time(ctx):
+    latencies = []
+    workdir = ctx.scratch('startup')
+    bench_startup.measure_once(workdir)
+    for _ in range(ctx.args.repeats):
+        sample = bench_startup.measure_once(workdir)
+        latencies.append(sample['import'] + sample['init'])
+    return summarize(latencies, sum(latencies), unit="startup")
+
+
+BENCHMARKS = {
+    'generate_sequential': bench_generate_sequential,
+    'generate_concurrent': bench_generate_concurrent,
+    'pipeline': bench_pipeline,
+    'db_insert': bench_db_insert,
+    'db_insert_batched': bench_db_insert_batched,
+    'export': bench_export,
+    'archive_read': bench_archive_read,
+    'startup': bench_startup_time,
+}
+
+
+def run(args):
+    """Run the selected scenarios against fresh fake servers; returns the results document"""
+    with tempfile.TemporaryDirectory() as workdir, \
+            FakeOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             image_size=args.image_size, download_latency=args.download_latency,
+                             chunked_images=args.chunked_images, seed=args.seed) as openai_server, \
+            FakeDriveServer(latency=args.drive_latency, error_rate=args.drive_error_rate,
+                            seed=args.seed) as drive_server:
+        # Point the clients at the fakes; run outside the repo so a
+        # developer's token.json/credentials.json are not picked up
+        os.environ['OPENAI_API_KEY'] = 'bench-pipeline'
+        os.environ['OPENAI_BASE_URL'] = openai_server.api_base
+        os.environ['DRIVE_API_ENDPOINT'] = drive_server.url
+        if args.images_per_minute:
+            os.environ['OPENAI_IMAGES_PER_MINUTE'] = str(args.images_per_minute)
+        else:
+            os.environ.pop('OPENAI_IMAGES_PER_MINUTE', None)
+
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        ctx = BenchmarkContext(args, workdir, openai_server, drive_server)
+        scenarios = {}
+        try:
+            for name in args.scenarios:
+                if not args.json:
+                    print(f"⏱️  {name}...", file=sys.stderr)
+                with quiet(not args.verbose):
+                    scenarios[name] = BENCHMARKS[name](ctx)
+        finally:
+            os.chdir(previous_cwd)
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {
+                'vehicles': args.vehicles,
+                'rows': args.rows,
+                'concurrency': args.concurrency,
+                'latency': args.latency,
+                'jitter': args.jitter,
+                'download_latency': args.download_latency,
+                'error_rate': args.error_rate,
+                'drive': args.drive,
+                'drive_latency': args.drive_latency,
+                'drive_error_rate': args.drive_error_rate,
+                'image_size': args.image_size,
+                'image_bytes': openai_server.image_bytes,
+                'postprocess': args.postprocess,
+                'seed': args.seed,
+            },
+            'servers': {
+                'openai': {'requests': openai_server.requests, 'errors': openai_server.errors,
+                           'downloads': openai_server.downloads},
+                'drive': {'requests': drive_server.requests, 'errors': drive_server.errors,
+                          'uploaded_bytes': drive_server.uploaded_bytes},
+            },
+            'scenarios': scenarios,
+        }
+
+
+def compare(results, baseline, max_regression):
+    """Throughput change per scenario against a baseline; returns the regressed ones"""
+    regressions = []
+    print(f"📈 Against baseline from {baseline.get('timestamp', 'unknown')}:")
+    for name, current in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before or not before['throughput_per_sec']:
+            print(f"   {name:<22} (not in baseline)")
+            continue
+        change = current['throughput_per_sec'] / before['throughput_per_sec'] - 1
+        p95_before = before['latency_ms']['p95']
+        p95_change = current['latency_ms']['p95'] / p95_before - 1 if p95_before else 0.0
+        regressed = change < -max_regression
+        marker = "❌" if regressed else "✅"
+        print(f"   {marker} {name:<22} throughput {change:+.1%}, p95 latency {p95_change:+.1%}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results):
+    print(f"📊 {'scenario':<22} {'ops':>7} {'ops/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        print(f"   {name:<22} {result['operations']:>7} {result['throughput_per_sec']:>10.2f} "
+              f"{latency['p50']:>10.2f} {latency['p95']:>10.2f} {latency['p99']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline against local fake servers")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--vehicles', type=int, default=20, help="vehicles per generation scenario")
+    parser.add_argument('--rows', type=int, default=5000, help="rows per database/export scenario")
+    parser.add_argument('--chunked-images', action='store_true',
+                        help="serve images without Content-Length (exercises the downloader's spooled buffers)")
+    parser.add_argument('--archive-images', type=int, default=500, help="images in the archive_read scenario")
+    parser.add_argument('--repeats', type=int, default=5, help="runs of the export and startup scenarios")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.2, help="fake images.generate latency, seconds")
+    parser.add_argument('--jitter', type=float, default=0.05, help="+/- seconds on top of --latency")
+    parser.add_argument('--download-latency', type=float, default=0.02, help="fake image download latency, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of generations answered with a 429")
+    parser.add_argument('--image-size', type=int, default=512, help="edge of the served PNGs, pixels")
+    parser.add_argument('--no-drive', dest='drive', action='store_false', help="skip Drive uploads")
+    parser.add_argument('--drive-latency', type=float, default=0.02, help="fake Drive call latency, seconds")
+    parser.add_argument('--drive-error-rate', type=float, default=0.0, help="share of Drive calls answered with a 429")
+    parser.add_argument('--images-per-minute', type=int, help="client-side rate limit (default: none)")
+    parser.add_argument('--postprocess', action='store_true', help="also write image variants (CPU heavy)")
+    parser.add_argument('--postprocess-workers', type=int, help="post-processing worker processes")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help="write the results JSON to this file")
+    parser.add_argument('--baseline', help="results JSON from an earlier run to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="allowed throughput drop against the baseline (0.2 = 20%%)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show the generator's own output")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in args.scenarios if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = run(args)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+        if args.out:
+            print(f"💾 Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Throughput regressed more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No throughput regressions")
+
+
+if __name__ == "__main__":
+    main()
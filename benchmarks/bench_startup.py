@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the OTHERIDES generator
+
+Measures, in fresh interpreter processes, how long `import otherides_generator`
+and `OtheridesAssetGenerator()` take, and checks that no heavy client library
+(openai, googleapiclient, google-auth-oauthlib, requests) was imported along
+the way. Exits non-zero when a median exceeds its budget, so it can guard CI.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--import-budget S] [--init-budget S]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only load once a client is actually used
+HEAVY_MODULES = ('openai', 'googleapiclient', 'google_auth_oauthlib', 'requests', 'httplib2')
+
+PROBE = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import otherides_generator
+imported = time.perf_counter()
+otherides_generator.OtheridesAssetGenerator(db_path={db_path!r}, cache_dir={cache_dir!r})
+constructed = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'init': constructed - imported,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def measure_once(workdir):
+    """Import and construct the generator in a fresh interpreter"""
+    code = PROBE.format(
+        root=REPO_ROOT,
+        db_path=os.path.join(workdir, 'bench_startup.db'),
+        cache_dir=os.path.join(workdir, 'cache'),
+        heavy=HEAVY_MODULES,
+    )
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_KEY', 'bench-startup')
+
+    # Run outside the repo so a developer's token.json/credentials.json are not picked up
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=workdir, env=env,
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"startup probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs=10):
+    """Median/max import and constructor times over several fresh processes"""
+    samples = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # The first run creates the database; later runs see an up-to-date schema
+        measure_once(workdir)
+        for _ in range(runs):
+            samples.append(measure_once(workdir))
+
+    imports = [sample['import'] for sample in samples]
+    inits = [sample['init'] for sample in samples]
+    return {
+        'runs': runs,
+        'import_median': statistics.median(imports),
+        'import_max': max(imports),
+        'init_median': statistics.median(inits),
+        'init_max': max(inits),
+        'heavy_modules': sorted({name for sample in samples for name in sample['heavy']}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure generator import and constructor time")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--import-budget', type=float, default=0.3, help="seconds, median")
+    parser.add_argument('--init-budget', type=float, default=0.1, help="seconds, median")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"📊 Startup over {results['runs']} runs")
+        print(f"   import: median {results['import_median'] * 1000:.1f} ms, max {results['import_max'] * 1000:.1f} ms")
+        print(f"   init:   median {results['init_median'] * 1000:.1f} ms, max {results['init_max'] * 1000:.1f} ms")
+
+    failures = []
+    if results['import_median'] > args.import_budget:
+        failures.append(f"import took {results['import_median']:.3f}s (budget {args.import_budget}s)")
+    if results['init_median'] > args.init_budget:
+        failures.append(f"constructor took {results['init_median']:.3f}s (budget {args.init_budget}s)")
+    if results['heavy_modules']:
+        failures.append(f"heavy modules imported at startup: {', '.join(results['heavy_modules'])}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
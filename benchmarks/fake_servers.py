@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the OpenAI image API, image CDN, Google Drive and S3
+
+Benchmarks point the generator at these servers (OPENAI_BASE_URL and
+DRIVE_API_ENDPOINT) so runs cost nothing, need no credentials and are
+repeatable; FakeS3Server is a MinIO-style bucket endpoint for the s3 storage
+backend (OTHERIDES_S3_ENDPOINT). Each server has configurable latency, jitter and error rate;
+the image server returns real PNGs of a configurable size so hashing,
+post-processing and uploads do realistic work.
+
+Usage:
+    with FakeOpenAIServer(latency=0.5, error_rate=0.05) as openai_server, FakeDriveServer() as drive:
+        os.environ['OPENAI_BASE_URL'] = openai_server.api_base
+        os.environ['DRIVE_API_ENDPOINT'] = drive.url
+"""
+
+import email
+import hashlib
+import io
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                if not size:
+                    return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _serve(self):
+        body = self._read_body()
+        status, headers, payload = self.server.fake.handle(self.command, self.path, self.headers, body)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        chunked = headers.get('Transfer-Encoding') == 'chunked'
+        if 'Content-Length' not in headers and not chunked:
+            self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        if chunked:
+            # No Content-Length, like a CDN streaming the body
+            for start in range(0, len(payload), 64 * 1024):
+                chunk = payload[start:start + 64 * 1024]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.wfile.write(payload)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+
+class FakeServer:
+    """Threaded HTTP server on a free local port with latency and error injection"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self.requests = 0
+        self.errors = 0
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _delay(self, latency=None):
+        """Sleep for the configured latency (+/- jitter)"""
+        latency = self.latency if latency is None else latency
+        with self._lock:
+            spread = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        if latency + spread > 0:
+            time.sleep(latency + spread)
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def handle(self, method, path, headers, body):
+        raise NotImplementedError
+
+
+def _json(payload, status=200, headers=None):
+    return status, {'Content-Type': 'application/json', **(headers or {})}, json.dumps(payload).encode()
+
+
+def render_images(count=8, size=1024, seed=0):
+    """Distinct noise PNGs that compress (and hash) like generated artwork"""
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        channels = [
+            Image.effect_noise((size, size), rng.uniform(30, 80)).filter(ImageFilter.GaussianBlur(rng.uniform(1, 4)))
+            for _ in range(3)
+        ]
+        buffer = io.BytesIO()
+        Image.merge('RGB', channels).save(buffer, 'PNG')
+        images.append(buffer.getvalue())
+    return images
+
+
+class FakeOpenAIServer(FakeServer):
+    """images.generate endpoint plus the image URLs it hands out
+
+    Failed generations answer error_status (429 by default, with a short
+    retry-after-ms) so the rate limiter's retry path is exercised. With
+    chunked_images=True images are sent without a Content-Length, which the
+    downloader spools instead of pre-sizing a buffer.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=429, image_size=1024,
+                 image_variants=8, download_latency=0.0, retry_after_ms=50, chunked_images=False, seed=None):
+        super().__init__(latency, jitter, error_rate, seed)
+        self.chunked_images = chunked_images
+        self.error_status = error_status
+        self.download_latency = download_latency
+        self.retry_after_ms = retry_after_ms
+        self.images = render_images(image_variants, image_size, seed or 0)
+        self._ids = itertools.count()
+        self.generations = 0
+        self.downloads = 0
+
+    @property
+    def api_base(self):
+        return f"{self.url}/v1"
+
+    @property
+    def image_bytes(self):
+        """Average size of the served images"""
+        return sum(len(image) for image in self.images) // len(self.images)
+
+    def handle(self, method, path, headers, body):
+        if method == 'POST' and path.startswith('/v1/images/generations'):
+            self._delay()
+            if self._should_fail():
+                return _json(
+                    {'error': {'message': 'Simulated failure', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                    self.error_status, {'retry-after-ms': str(self.retry_after_ms)}
+                )
+            with self._lock:
+                self.generations += 1
+            image_id = next(self._ids)
+            return _json({
+                'created': int(time.time()),
+                'data': [{'url': f"{self.url}/images/{image_id}.png", 'revised_prompt': None}],
+            })
+
+        if method == 'GET' and path.startswith('/images/'):
+            self._delay(self.download_latency)
+            with self._lock:
+                self.downloads += 1
+            image_id = int(path.rsplit('/', 1)[1].split('.')[0])
+            headers = {'Content-Type': 'image/png'}
+            if self.chunked_images:
+                headers['Transfer-Encoding'] = 'chunked'
+            return 200, headers, self.images[image_id % len(self.images)]
+
+        return _json({'error': {'message': f'No route for {method} {path}'}}, 404)
+
+
+class FakeDriveServer(FakeServer):
+    """The Drive v3 calls DriveUploadManager makes: folder list/create, resumable
+    uploads, metadata PATCH and batch requests
+
+    Failed calls answer 429 rateLimitExceeded, which the upload manager backs
+    off from and retries.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__(latency, jitter, error_rate, seed)
+        self.files = {}
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self.uploaded_bytes = 0
+
+    def _new_id(self, prefix="file"):
+        return f"{prefix}{next(self._ids)}"
+
+    def handle(self, method, path, headers, body):
+        if path.startswith('/batch'):
+            return self._batch(headers, body)
+        return self._call(method, path, headers, body)
+
+    def _call(self, method, path, headers, body):
+        if self._should_fail():
+            return _json({'error': {'code': 429, 'message': 'Rate Limit Exceeded',
+                                    'errors': [{'reason': 'rateLimitExceeded'}]}}, 429, {'Retry-After': '0'})
+        self._delay()
+
+        parsed = urllib.parse.urlparse(path)
+        query = urllib.parse.parse_qs(parsed.query)
+        route = parsed.path.rstrip('/')
+
+        if route.endswith('/upload/drive/v3/files') and method == 'POST':
+            session = self._new_id("upload")
+            with self._lock:
+                self._sessions[session] = {'meta': json.loads(body or b'{}'), 'data': bytearray()}
+            return 200, {'Location': f"{self.url}/upload/drive/v3/files?uploadType=resumable&upload_id={session}"}, b''
+
+        if route.endswith('/upload/drive/v3/files') and method == 'PUT':
+            return self._upload_chunk(query['upload_id'][0], headers.get('Content-Range', ''), body)
+
+        if route.endswith('/files') and method == 'GET':
+            search = query.get('q', [''])[0]
+            name = search.split("name='")[1].split("'")[0] if "name='" in search else None
+            parent = search.split(" and '")[1].split("'")[0] if "in parents" in search else None
+            with self._lock:
+                hits = [f for f in self.files.values()
+                        if (name is None or f['name'] == name) and (parent is None or parent in f['parents'])]
+            return _json({'files': [{'id': f['id'], 'name': f['name']} for f in hits]})
+
+        if route.endswith('/files') and method == 'POST':
+            meta = json.loads(body or b'{}')
+            with self._lock:
+                if any(parent not in self.files for parent in meta.get('parents', [])):
+                    return _json({'error': {'code': 404, 'message': 'File not found'}}, 404)
+                file_id = self._new_id("folder")
+                self.files[file_id] = {'id': file_id, 'name': meta.get('name'), 'parents': meta.get('parents', [])}
+            return _json({'id': file_id, 'webViewLink': f"{self.url}/view/{file_id}"})
+
+        if '/files/' in route and method == 'PATCH':
+            file_id = route.rsplit('/', 1)[1]
+            with self._lock:
+                if file_id not in self.files:
+                    return _json({'error': {'code': 404, 'message': 'File not found'}}, 404)
+                self.files[file_id].update(json.loads(body or b'{}'))
+            return _json({'id': file_id})
+
+        return _json({'error': {'code': 404, 'message': f'No route for {method} {route}'}}, 404)
+
+    def _upload_chunk(self, session_id, content_range, body):
+        """One PUT of a resumable upload ('bytes start-end/total' or 'bytes */total')"""
+        with self._lock:
+            session = self._sessions[session_id]
+            span, total = content_range.split(' ', 1)[1].split('/')
+            if span != '*':
+                start, end = map(int, span.split('-'))
+                session['data'][start:end + 1] = body
+            received = len(session['data'])
+
+            if total != '*' and received >= int(total):
+                del self._sessions[session_id]
+                file_id = self._new_id()
+                meta = session['meta']
+                self.files[file_id] = {'id': file_id, 'name': meta.get('name'),
+                                       'parents': meta.get('parents', []), 'size': received}
+                self.uploaded_bytes += received
+                return _json({'id': file_id, 'webViewLink': f"{self.url}/view/{file_id}",
+                              'webContentLink': f"{self.url}/content/{file_id}"})
+
+        return 308, ({'Range': f"bytes=0-{received - 1}"} if received else {}), b''
+
+    def _batch(self, headers, body):
+        """multipart/mixed batch: run each embedded request and answer in kind"""
+        message = email.message_from_bytes(
+            b'Content-Type: ' + headers['Content-Type'].encode() + b'\r\n\r\n' + body
+        )
+        boundary = 'fake_drive_batch'
+        parts = []
+        for part in message.get_payload():
+            content_id = part['Content-ID'].strip('<>')
+            raw = part.get_payload(decode=False)
+            head, _, part_body = raw.partition('\r\n\r\n') if '\r\n\r\n' in raw else raw.partition('\n\n')
+            lines = head.splitlines()
+            method, path, _ = lines[0].split(' ', 2)
+            part_headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+
+            status, _, payload = self._call(method, path, part_headers, part_body.encode())
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+                f"{payload.decode()}\r\n"
+            )
+        data = (''.join(parts) + f"--{boundary}--\r\n").encode()
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, data
+
+
+class FakeS3Server(FakeServer):
+    """Path-style S3 object API (PUT, HEAD, GET, DELETE /<bucket>/<key>), like a local MinIO
+
+    Any bucket name is accepted and credentials are not checked. Failed calls
+    answer 503 SlowDown, which boto3 retries.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__(latency, jitter, error_rate, seed)
+        self.objects = {}
+        self.uploaded_bytes = 0
+
+    @staticmethod
+    def _error(code, message, status):
+        body = (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Error><Code>{code}</Code><Message>{message}</Message></Error>').encode()
+        return status, {'Content-Type': 'application/xml'}, body
+
+    def handle(self, method, path, headers, body):
+        if self._should_fail():
+            return self._error('SlowDown', 'Please reduce your request rate.', 503)
+        self._delay()
+
+        parsed = urllib.parse.urlparse(path)
+        bucket, _, key = urllib.parse.unquote(parsed.path).lstrip('/').partition('/')
+        if not key:
+            # Bucket-level calls (create bucket, location...) just succeed
+            return 200, {}, b''
+        name = (bucket, key)
+
+        if method == 'PUT':
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            metadata = {k: v for k, v in headers.items() if k.lower().startswith('x-amz-meta-')}
+            with self._lock:
+                self.objects[name] = {'body': body, 'etag': etag, 'metadata': metadata,
+                                      'content_type': headers.get('Content-Type', 'binary/octet-stream')}
+                self.uploaded_bytes += len(body)
+            return 200, {'ETag': etag}, b''
+
+        with self._lock:
+            stored = self.objects.get(name)
+            if method == 'DELETE':
+                self.objects.pop(name, None)
+                return 204, {}, b''
+        if stored is None:
+            # HEAD responses carry no body, so boto3 only sees the status there
+            return self._error('NoSuchKey', 'The specified key does not exist.', 404)
+
+        response_headers = {'ETag': stored['etag'], 'Content-Type': stored['content_type'], **stored['metadata']}
+        if method == 'HEAD':
+            response_headers['Content-Length'] = str(len(stored['body']))
+            return 200, response_headers, b''
+        return 200, response_headers, stored['body']
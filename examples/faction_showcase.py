@@ -57,34 +57,37 @@ def main():
     }
     
     generated_vehicles = []
+    specs = []
     
     for faction, config in faction_configs.items():
-        print(f"\n🏠 {faction.replace('_', ' ').title()} Faction")
+        print(f"🏠 {faction.replace('_', ' ').title()} Faction")
         print(f"   {config['description']}")
-        print(f"   Generating {config['vehicle_type']} in {config['biome']} biome...")
+        print(f"   Queued {config['vehicle_type']} in {config['biome']} biome")
         
-        vehicle_data = generator.generate_otherides_vehicle(
-            faction=faction,
-            biome=config['biome'],
-            style=config['style'],
-            vehicle_type=config['vehicle_type']
-        )
+        specs.append({
+            'faction': faction,
+            'biome': config['biome'],
+            'style': config['style'],
+            'vehicle_type': config['vehicle_type']
+        })
+    
+    # Generate every faction at once instead of one vehicle at a time
+    print(f"\nGenerating {len(specs)} vehicles concurrently...")
+    results = generator.run_batch(specs, "Faction_Showcase_Collection", concurrency=len(specs))
+    
+    for spec, saved_vehicle in results:
+        faction = spec['faction']
+        print(f"\n🏠 {faction.replace('_', ' ').title()}")
         
-        if vehicle_data:
-            print(f"   ✅ {vehicle_data['variant']}")
-            print(f"      Style: {vehicle_data['style']}")
-            print(f"      Camera: {vehicle_data['camera_view']}")
-            print(f"      Traits: {', '.join(vehicle_data['traits'][:3])}...")
-            
-            # Save the vehicle
-            saved_vehicle = generator._save_otherides_vehicle(
-                vehicle_data,
-                "Faction_Showcase_Collection"
-            )
+        if saved_vehicle:
+            metadata = saved_vehicle['metadata']
+            print(f"   ✅ {metadata['variant']}")
+            print(f"      Style: {metadata['style']}")
+            print(f"      Camera: {metadata['camera_view']}")
+            print(f"      Traits: {', '.join(metadata['traits'][:3])}...")
             
-            if saved_vehicle:
-                generated_vehicles.append(saved_vehicle)
-                print(f"      💾 Saved as: {saved_vehicle['file_name']}")
+            generated_vehicles.append(saved_vehicle)
+            print(f"      💾 Saved as: {saved_vehicle['file_name']}")
         else:
             print(f"   ❌ Failed to generate {faction} vehicle")
     
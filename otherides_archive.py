@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Packed, memory-mapped image archive for OTHERIDES vehicles
+
+Downstream 3D and turntable tools read thousands of images; opening and
+stat-ing one file per image dominates that. An archive keeps them all in
+one append-only data file (<name>.pack) plus an append-only index
+(<name>.idx) of image_id -> (offset, length, sha256). Readers map the data
+file once and get() hands out zero-copy memoryview slices of the mapping.
+
+Index entries are (crc32, id length, offset, length, sha256, image_id).
+A writer appends the image bytes first (fsynced by default) and only then
+the index entry, so an entry never points at data that isn't there; a torn
+entry from a crashed writer fails its CRC and is cut off by the next
+writer. Writers in any number of threads or processes serialize on an
+flock of the index file; readers take no locks and pick up new entries
+(and remap the grown data file) whenever they are asked for an image_id
+they haven't seen. Appending an image whose bytes are already archived
+only adds an index entry; a re-appended image_id points at the new bytes.
+
+Usage: python otherides_archive.py ARCHIVE [--verify] [--get IMAGE_ID --out FILE] [--pack-db DB]
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from otherides_storage import StorageBackend
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): writers are only serialized within one process
+    fcntl = None
+
+DEFAULT_ARCHIVE = 'otherides_assets/otherides.pack'
+
+DATA_MAGIC = b'OTHPACK1'
+INDEX_MAGIC = b'OTHIDX01'
+
+# crc32 of the rest, image_id length, data offset, data length, sha256
+ENTRY = struct.Struct('<IHQQ32s')
+
+
+class AssetArchive:
+    """Append-only packed image archive read through mmap"""
+
+    def __init__(self, path=DEFAULT_ARCHIVE, writable=False, fsync=True):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix('.idx')
+        self.writable = writable
+        self.fsync = fsync
+
+        self._entries = {}
+        self._digests = {}
+        self._index_pos = len(INDEX_MAGIC)
+        self._lock = threading.Lock()
+        self._map = None
+        self._view = memoryview(b'')
+
+        if writable:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._data_fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._index_fd = os.open(self.index_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            with self._write_lock():
+                # First writer of a new archive stamps both files
+                if os.fstat(self._data_fd).st_size == 0:
+                    os.pwrite(self._data_fd, DATA_MAGIC, 0)
+                if os.fstat(self._index_fd).st_size == 0:
+                    os.write(self._index_fd, INDEX_MAGIC)
+        else:
+            self._data_fd = os.open(self.path, os.O_RDONLY)
+            self._index_fd = os.open(self.index_path, os.O_RDONLY)
+
+        if os.pread(self._index_fd, len(INDEX_MAGIC), 0) != INDEX_MAGIC \
+                or os.pread(self._data_fd, len(DATA_MAGIC), 0) != DATA_MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not an OTHERIDES image archive")
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive across this process's threads and (with flock) other processes"""
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._index_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._index_fd, fcntl.LOCK_UN)
+
+    def refresh(self, repair=False):
+        """Read index entries appended since the last refresh (by any writer)
+
+        A trailing entry that is incomplete or fails its CRC is normally a
+        write in progress and is left for the next refresh; with repair=True
+        (only safe under the write lock) it is a crashed write and is cut off.
+        """
+        if not repair:
+            self._lock.acquire()
+        try:
+            size = os.fstat(self._index_fd).st_size
+            if size <= self._index_pos:
+                return 0
+            chunk = os.pread(self._index_fd, size - self._index_pos, self._index_pos)
+            added = 0
+            pos = 0
+            while pos + ENTRY.size <= len(chunk):
+                crc, id_length, offset, length, digest = ENTRY.unpack_from(chunk, pos)
+                end = pos + ENTRY.size + id_length
+                if end > len(chunk) or zlib.crc32(chunk[pos + 4:end]) != crc:
+                    break
+                image_id = chunk[pos + ENTRY.size:end].decode('utf-8')
+                self._entries[image_id] = (offset, length, digest)
+                self._digests[digest] = (offset, length)
+                added += 1
+                pos = end
+
+            self._index_pos += pos
+            if repair and self._index_pos < size:
+                os.truncate(self.index_path, self._index_pos)
+            return added
+        finally:
+            if not repair:
+                self._lock.release()
+
+    def _remap(self, needed):
+        """Map the data file again once it has grown past the current mapping"""
+        with self._lock:
+            if needed <= len(self._view):
+                return
+            # Slices handed out earlier keep the old mapping alive on their own
+            self._map = mmap.mmap(self._data_fd, 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+
+    def append(self, image_id, data, digest=None):
+        """Add an image's bytes under image_id; returns (offset, length)
+
+        digest is the SHA-256 of data (hex or raw) when the caller already
+        has it. Bytes that are already archived are not written again.
+        """
+        if not self.writable:
+            raise ValueError(f"{self.path} was opened read-only")
+        encoded_id = image_id.encode('utf-8')
+        if isinstance(digest, str):
+            digest = bytes.fromhex(digest)
+        digest = digest or hashlib.sha256(data).digest()
+
+        with self._write_lock():
+            self.refresh(repair=True)
+            existing = self._digests.get(digest)
+            if existing:
+                offset, length = existing
+            else:
+                offset = os.fstat(self._data_fd).st_size
+                length = len(data)
+                view = memoryview(data)
+                written = 0
+                while written < length:
+                    written += os.pwrite(self._data_fd, view[written:], offset + written)
+                if self.fsync:
+                    os.fsync(self._data_fd)
+
+            body = ENTRY.pack(0, len(encoded_id), offset, length, digest)[4:] + encoded_id
+            os.write(self._index_fd, struct.pack('<I', zlib.crc32(body)) + body)
+            if self.fsync:
+                os.fsync(self._index_fd)
+            self._index_pos += ENTRY.size + len(encoded_id)
+            self._entries[image_id] = (offset, length, digest)
+            self._digests[digest] = (offset, length)
+        return offset, length
+
+    def get(self, image_id):
+        """Zero-copy memoryview of an image's bytes (None if it isn't archived)"""
+        entry = self._entries.get(image_id)
+        if entry is None:
+            self.refresh()
+            entry = self._entries.get(image_id)
+            if entry is None:
+                return None
+
+        offset, length, _ = entry
+        view = self._view
+        if offset + length > len(view):
+            self._remap(offset + length)
+            view = self._view
+            if offset + length > len(view):
+                # Index entry outlived its data (a crash with fsync=False)
+                return None
+        return view[offset:offset + length]
+
+    def __getitem__(self, image_id):
+        view = self.get(image_id)
+        if view is None:
+            raise KeyError(image_id)
+        return view
+
+    def __contains__(self, image_id):
+        return image_id in self._entries or (self.refresh() and image_id in self._entries)
+
+    def __len__(self):
+        self.refresh()
+        return len(self._entries)
+
+    def __iter__(self):
+        self.refresh()
+        return iter(list(self._entries))
+
+    def digest(self, image_id):
+        """SHA-256 hex of an archived image (None if it isn't archived)"""
+        entry = self._entries.get(image_id) or (self.refresh() and self._entries.get(image_id))
+        return entry[2].hex() if entry else None
+
+    def verify(self):
+        """(entries checked, image_ids whose bytes don't match their SHA-256)"""
+        self.refresh()
+        corrupt = [image_id for image_id, (_, _, digest) in list(self._entries.items())
+                   if hashlib.sha256(self.get(image_id)).digest() != digest]
+        return len(self._entries), corrupt
+
+    def stats(self):
+        """Entries, distinct images and file sizes"""
+        self.refresh()
+        return {
+            'entries': len(self._entries),
+            'images': len(self._digests),
+            'data_bytes': os.fstat(self._data_fd).st_size,
+            'index_bytes': os.fstat(self._index_fd).st_size,
+        }
+
+    def close(self):
+        """Close the files; memoryviews already handed out stay readable"""
+        self._view = memoryview(b'')
+        self._map = None
+        for fd in (self._data_fd, self._index_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class ArchiveStore(StorageBackend):
+    """Storage sink appending each saved image to a packed archive, keyed by image_id"""
+
+    name = 'archive'
+
+    def __init__(self, path=DEFAULT_ARCHIVE, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self._archive = None
+        self._lock = threading.Lock()
+
+    @property
+    def archive(self):
+        """Writable archive, opened on first use"""
+        if self._archive is None:
+            with self._lock:
+                if self._archive is None:
+                    self._archive = AssetArchive(self.path, writable=True, fsync=self.fsync)
+        return self._archive
+
+    def put(self, data, digest, file_name, folder, batch_name=None, subfolder=None):
+        """Append under the image_id; returns '<archive>#<offset>+<length>'"""
+        image_id = file_name.rsplit('.', 1)[0]
+        offset, length = self.archive.append(image_id, data, digest)
+        return f"{self.archive.path.absolute()}#{offset}+{length}"
+
+
+def pack_database(archive, db_path):
+    """Append every vehicle of a database whose image is on disk; returns (packed, missing)"""
+    import json
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    packed = missing = 0
+    try:
+        rows = conn.execute("SELECT image_id, file_path, file_name, storage FROM otherides_vehicles ORDER BY id")
+        for image_id, file_path, file_name, storage in rows:
+            if image_id in archive:
+                continue
+            local = json.loads(storage).get('local') if storage else None
+            path = local or os.path.join(file_path or '', file_name or '')
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                missing += 1
+                continue
+            archive.append(image_id, data)
+            packed += 1
+    finally:
+        conn.close()
+    return packed, missing
+
+
+def main():
+    """Inspect, verify, read from or fill an archive"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OTHERIDES packed image archive")
+    parser.add_argument('archive', nargs='?', default=os.getenv("OTHERIDES_ARCHIVE") or DEFAULT_ARCHIVE)
+    parser.add_argument('--verify', action='store_true', help="re-hash every archived image")
+    parser.add_argument('--get', metavar='IMAGE_ID', help="write one image to --out")
+    parser.add_argument('--out', help="output file for --get")
+    parser.add_argument('--pack-db', metavar='DB', help="append the stored images of a vehicle database")
+    args = parser.parse_args()
+
+    if args.pack_db:
+        with AssetArchive(args.archive, writable=True) as archive:
+            packed, missing = pack_database(archive, args.pack_db)
+        print(f"📦 Packed {packed} images into {args.archive} ({missing} not found on disk)")
+
+    if not os.path.exists(args.archive):
+        print(f"❌ {args.archive} does not exist")
+        raise SystemExit(1)
+
+    with AssetArchive(args.archive) as archive:
+        if args.get:
+            view = archive.get(args.get)
+            if view is None:
+                print(f"❌ {args.get} is not in {args.archive}")
+                raise SystemExit(1)
+            with open(args.out or f"{args.get}.png", 'wb') as f:
+                f.write(view)
+            print(f"✅ Wrote {len(view)} bytes to {args.out or f'{args.get}.png'}")
+            return
+
+        stats = archive.stats()
+        print(f"🗃️  {args.archive}: {stats['entries']} image_ids, {stats['images']} distinct images, "
+              f"{stats['data_bytes'] / 1024 ** 2:.1f} MB data, {stats['index_bytes'] / 1024:.0f} KB index")
+        if args.verify:
+            checked, corrupt = archive.verify()
+            if corrupt:
+                for image_id in corrupt:
+                    print(f"   ❌ {image_id} does not match its SHA-256")
+                raise SystemExit(1)
+            print(f"   ✅ {checked} images verified")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of DALL-E generations
+
+Entries are keyed by a SHA-256 of the prompt plus the image generation
+parameters, so an identical request is answered from disk instead of paying
+for a new HD image. Each entry holds the response metadata (<key>.json) and,
+once downloaded, the image itself (<key>.png), fanned out by key prefix:
+
+    .otherides_cache/3f/3fa4...e1.json
+    .otherides_cache/3f/3fa4...e1.png
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from otherides_http import ImageBuffer
+
+
+class GenerationCache:
+    """On-disk prompt/result cache with size- and age-based eviction"""
+
+    def __init__(self, cache_dir=".otherides_cache", max_bytes=2 * 1024 ** 3, max_age_days=30):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(prompt, params):
+        """Cache key for a prompt and its generation parameters"""
+        payload = json.dumps({'prompt': prompt, 'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key, suffix):
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def _expired(self, path):
+        if self.max_age is None:
+            return False
+        try:
+            return time.time() - path.stat().st_mtime > self.max_age
+        except FileNotFoundError:
+            return True
+
+    def lookup(self, key):
+        """Cached response metadata if the image is also cached, else None
+
+        Counts towards the hit/miss statistics.
+        """
+        image_path = self._path(key, '.png')
+        metadata = self.get_metadata(key)
+
+        if metadata is None or not image_path.exists() or self._expired(image_path):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Refresh mtime so size-based eviction drops least recently used first
+        try:
+            os.utime(image_path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return metadata
+
+    def get_metadata(self, key):
+        """Stored response metadata for key (without touching hit/miss counters)"""
+        try:
+            with open(self._path(key, '.json'), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def has_image(self, key):
+        """True if the image for key is cached and not expired"""
+        path = self._path(key, '.png')
+        return path.exists() and not self._expired(path)
+
+    def put_metadata(self, key, metadata):
+        """Store response metadata for key"""
+        data = json.dumps(metadata, indent=2).encode('utf-8')
+        self._write_atomic(self._path(key, '.json'), lambda f: f.write(data))
+
+    def put_image(self, key, image_data):
+        """Copy a downloaded image (file-like) into the cache"""
+        image_data.seek(0)
+        self._write_atomic(self._path(key, '.png'), lambda f: shutil.copyfileobj(image_data, f))
+        image_data.seek(0)
+
+    def open_image(self, key):
+        """Cached image as an in-memory buffer with its MD5 digest set"""
+        data = self._path(key, '.png').read_bytes()
+        buffer = ImageBuffer(data)
+        buffer.digests = {'md5': hashlib.md5(data).hexdigest()}
+        return buffer
+
+    def _write_atomic(self, path, write):
+        """Write via a temp file + rename so readers never see partial entries"""
+        if self._size is None:
+            # First write this run: measure the cache (and purge stale entries)
+            self.evict()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        old_size = path.stat().st_size if path.exists() else 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            if self._size is not None:
+                self._size += path.stat().st_size - old_size
+            over_limit = self._size is not None and self.max_bytes and self._size > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def iter_entries(self):
+        """Yield (key, metadata) for every cached response, e.g. to re-render metadata"""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob('*/*.json'):
+            metadata = self.get_metadata(path.stem)
+            if metadata is not None:
+                yield path.stem, metadata
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if not self.cache_dir.exists():
+            self._size = 0
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+
+        for path in self.cache_dir.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes:
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+        with self._lock:
+            self._size = total
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        """Hit/miss counters for this run"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def report(self):
+        """Print hit/miss counters"""
+        stats = self.stats()
+        print(f"💾 Generation cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted")
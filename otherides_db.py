@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+SQLite connection manager for the OTHERIDES vehicle database
+
+Keeps one long-lived connection per thread in WAL mode (readers never block
+the writer) with a tunable synchronous level, and can group vehicle inserts
+into a single executemany transaction during batch runs.
+"""
+
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from otherides_schema import decode_json_list, rarity_attributes
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class VehicleDatabase:
+    """Per-thread persistent connections with batched otherides_vehicles inserts"""
+
+    def __init__(self, db_path="otherides_assets.db", synchronous="NORMAL",
+                 busy_timeout=30.0, batch_size=200):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}")
+
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.batch_size = batch_size
+
+        self._local = threading.local()
+        # Thread -> its connection, so connections of finished threads can be closed
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._pending = []
+        self._batch_depth = 0
+
+    @property
+    def connection(self):
+        """This thread's connection, opened and configured on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections[threading.current_thread()] = conn
+            self.close_finished()
+        return conn
+
+    def release(self):
+        """Close this thread's connection; call it when a worker thread is done
+
+        Connections left open by threads that have already exited are closed
+        too, so short-lived threads that never call this don't pile up.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.pop(threading.current_thread(), None)
+            if conn.in_transaction:
+                conn.commit()
+            conn.close()
+        self.close_finished()
+
+    def close_finished(self):
+        """Close connections whose threads have exited (e.g. a shut-down executor's)"""
+        with self._lock:
+            finished = [thread for thread in self._connections if not thread.is_alive()]
+            connections = [self._connections.pop(thread) for thread in finished]
+        for conn in connections:
+            conn.close()
+
+    @property
+    def batching(self):
+        """True while inside a batch() block"""
+        return self._batch_depth > 0
+
+    def insert_vehicle(self, record):
+        """Insert one vehicle row immediately and return its id"""
+        conn = self.connection
+        columns = ', '.join(record.keys())
+        placeholders = ', '.join(['?' for _ in record])
+
+        with conn:
+            cursor = conn.execute(
+                f"INSERT INTO otherides_vehicles ({columns}) VALUES ({placeholders})",
+                list(record.values())
+            )
+            self._insert_traits_and_tags(conn, [record])
+        return cursor.lastrowid
+
+    def _insert_traits_and_tags(self, conn, records):
+        """Fill the trait/tag junction tables and trait counts for freshly inserted rows"""
+        trait_rows = []
+        tag_rows = []
+        for record in records:
+            image_id = record.get('image_id')
+            trait_rows.extend((trait, image_id) for trait in decode_json_list(record.get('traits')))
+            tag_rows.extend((tag, image_id) for tag in decode_json_list(record.get('tags')))
+
+        # Rows are matched by image_id so this also works after executemany,
+        # which doesn't report the new row ids
+        conn.executemany(
+            "INSERT OR IGNORE INTO vehicle_traits (vehicle_id, trait) "
+            "SELECT id, ? FROM otherides_vehicles WHERE image_id = ?",
+            trait_rows
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO vehicle_tags (vehicle_id, tag) "
+            "SELECT id, ? FROM otherides_vehicles WHERE image_id = ?",
+            tag_rows
+        )
+
+        # One upsert per distinct attribute value in the batch
+        counts = Counter(attribute for record in records for attribute in rarity_attributes(record))
+        conn.executemany(
+            "INSERT INTO trait_counts (trait_type, value, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (trait_type, value) DO UPDATE SET count = count + excluded.count",
+            [(trait_type, value, count) for (trait_type, value), count in counts.items()]
+        )
+        conn.execute("UPDATE rarity_state SET counts_version = counts_version + 1 WHERE id = 1")
+
+    def queue_vehicle(self, record):
+        """Queue a vehicle row for the next flush (auto-flushes at batch_size)"""
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all queued rows in one transaction; returns the number inserted"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        if not pending:
+            return 0
+
+        # executemany needs one statement per column layout
+        groups = {}
+        for record in pending:
+            groups.setdefault(tuple(record.keys()), []).append(record)
+
+        conn = self.connection
+        try:
+            with conn:
+                for keys, records in groups.items():
+                    conn.executemany(self._insert_sql(keys), [list(r.values()) for r in records])
+                self._insert_traits_and_tags(conn, pending)
+            return len(pending)
+        except sqlite3.IntegrityError:
+            # One bad row (e.g. duplicate image_id) shouldn't sink the batch
+            return self._insert_individually(groups)
+
+    def _insert_individually(self, groups):
+        """Fallback for flush(): insert row by row, skipping rows that fail"""
+        conn = self.connection
+        inserted = 0
+
+        with conn:
+            for keys, records in groups.items():
+                sql = self._insert_sql(keys)
+                for record in records:
+                    try:
+                        conn.execute(sql, list(record.values()))
+                        self._insert_traits_and_tags(conn, [record])
+                        inserted += 1
+                    except sqlite3.IntegrityError as e:
+                        print(f"Error saving vehicle record {record.get('image_id')}: {e}")
+
+        return inserted
+
+    def _insert_sql(self, keys):
+        columns = ', '.join(keys)
+        placeholders = ', '.join(['?' for _ in keys])
+        return f"INSERT INTO otherides_vehicles ({columns}) VALUES ({placeholders})"
+
+    @contextmanager
+    def batch(self):
+        """Queue vehicle inserts for the duration of the block, then flush"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+            if outermost:
+                self.flush()
+
+    def close(self):
+        """Flush pending rows and close every thread's connection"""
+        self.flush()
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
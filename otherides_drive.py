@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Google Drive helpers for OTHERIDES collection uploads
+
+DriveFolderCache maps folder paths such as "OTHERIDES_Collection/Honoraries"
+to Drive folder IDs. Lookups are answered from memory, then from the local
+database, and only then from Drive, so a batch resolves each folder once
+instead of issuing files().list calls for every saved vehicle.
+"""
+
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime
+
+from otherides_ratelimit import parse_retry_after
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Drive accepts at most 100 calls per batch request
+MAX_BATCH_SIZE = 100
+
+# Resumable upload chunks must be a multiple of 256 KiB
+CHUNK_ALIGNMENT = 256 * 1024
+
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+def _status(error):
+    return getattr(getattr(error, 'resp', None), 'status', None)
+
+
+def is_not_found(error):
+    """True if a Drive API error is a 404 (e.g. a folder deleted in Drive)"""
+    return _status(error) == 404
+
+
+def _error_reason(error):
+    """Drive's error reason string (e.g. 'rateLimitExceeded'), if present"""
+    try:
+        details = json.loads(error.content)
+        return details['error']['errors'][0]['reason']
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error):
+    """True for Drive throttling responses (429, or 403 with a rate-limit reason)"""
+    status = _status(error)
+    return status == 429 or (status == 403 and _error_reason(error) in RATE_LIMIT_REASONS)
+
+
+def is_retryable(error):
+    """True for throttling, transient 5xx and connection-level failures"""
+    status = _status(error)
+    if status is None:
+        import httplib2
+        return isinstance(error, (ConnectionError, TimeoutError, httplib2.HttpLib2Error))
+    return is_rate_limited(error) or status in (408, 500, 502, 503, 504)
+
+
+def _escape_query(value):
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+class DriveFolderCache:
+    """Folder path → Drive ID cache, persisted in the drive_folders table
+
+    Misses are single-flight: within a process the first thread to miss a
+    path resolves it under a per-path lock while the others wait for its
+    answer; across processes sharing the database it first claims the path
+    in drive_folder_claims (like a job lease), and other processes poll
+    until the folder ID is recorded or the claim expires. The Drive call
+    itself runs outside any transaction.
+    """
+
+    def __init__(self, db, resolver, claim_seconds=120, poll_interval=0.25):
+        # resolver(name, parent_id) finds or creates one folder in Drive
+        self.db = db
+        self.resolver = resolver
+        self.claim_seconds = claim_seconds
+        self.poll_interval = poll_interval
+
+        self._ids = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path_lock(self, path):
+        with self._lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _stored_id(self, conn, path):
+        row = conn.execute("SELECT folder_id FROM drive_folders WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def resolve(self, *names):
+        """Drive ID for a folder path (each name is one level), creating it if needed"""
+        path = '/'.join(names)
+
+        folder_id = self._ids.get(path)
+        if folder_id:
+            return folder_id
+
+        parent_id = self.resolve(*names[:-1]) if len(names) > 1 else None
+        if len(names) > 1 and not parent_id:
+            return None
+
+        with self._path_lock(path):
+            folder_id = self._ids.get(path)
+            if folder_id:
+                return folder_id
+
+            conn = self.db.connection
+            folder_id = self._stored_id(conn, path) or self._resolve_claimed(conn, path, names[-1], parent_id)
+
+            if folder_id:
+                self._ids[path] = folder_id
+            return folder_id
+
+    def _claim(self, conn, path, owner):
+        """Stored folder ID, else True if this process now holds the path's claim"""
+        now = time.time()
+        with conn:
+            folder_id = self._stored_id(conn, path)
+            if folder_id:
+                return folder_id
+            conn.execute('''
+                INSERT INTO drive_folder_claims (path, owner, expires) VALUES (?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                WHERE drive_folder_claims.expires < ?
+            ''', (path, owner, now + self.claim_seconds, now))
+            row = conn.execute("SELECT owner FROM drive_folder_claims WHERE path = ?", (path,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def _resolve_claimed(self, conn, path, name, parent_id):
+        """Look up or create the folder in Drive once the path is claimed"""
+        owner = uuid.uuid4().hex
+        while True:
+            claimed = self._claim(conn, path, owner)
+            if claimed is True:
+                break
+            if claimed:
+                return claimed
+            # Another process is resolving it; its claim expires if it died
+            time.sleep(self.poll_interval)
+
+        try:
+            folder_id = self.resolver(name, parent_id)
+            with conn:
+                if folder_id:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO drive_folders (path, folder_id, updated_at) VALUES (?, ?, ?)",
+                        (path, folder_id, datetime.now().isoformat())
+                    )
+                    # Only differs if our claim expired and another process got there first
+                    folder_id = self._stored_id(conn, path)
+                conn.execute("DELETE FROM drive_folder_claims WHERE path = ? AND owner = ?", (path, owner))
+        except Exception:
+            # Let the next process retry straight away instead of waiting out the claim
+            with conn:
+                conn.execute("DELETE FROM drive_folder_claims WHERE path = ? AND owner = ?", (path, owner))
+            raise
+        return folder_id
+
+    def resolve_many(self, parent, names, batch_resolver):
+        """Resolve several folders under one parent path with a single batched call
+
+        batch_resolver(names, parent_id) returns {name: folder_id} (e.g.
+        DriveUploadManager.find_or_create_folders). Only paths this process
+        manages to claim are sent; folders another process is resolving are
+        left to resolve(). Returns {name: folder_id} for what is known now.
+        """
+        parent_id = self.resolve(*parent)
+        if not parent_id:
+            return {}
+
+        conn = self.db.connection
+        owner = uuid.uuid4().hex
+        folder_ids = {}
+        claimed = {}
+        for name in dict.fromkeys(names):
+            path = '/'.join((*parent, name))
+            folder_id = self._ids.get(path) or self._claim(conn, path, owner)
+            if folder_id is True:
+                claimed[name] = path
+            elif folder_id:
+                folder_ids[name] = self._ids[path] = folder_id
+
+        if not claimed:
+            return folder_ids
+        try:
+            resolved = batch_resolver(list(claimed), parent_id)
+            with conn:
+                for name, folder_id in resolved.items():
+                    conn.execute(
+                        "INSERT OR IGNORE INTO drive_folders (path, folder_id, updated_at) VALUES (?, ?, ?)",
+                        (claimed[name], folder_id, datetime.now().isoformat())
+                    )
+                    folder_ids[name] = self._ids[claimed[name]] = self._stored_id(conn, claimed[name])
+        finally:
+            with conn:
+                conn.executemany("DELETE FROM drive_folder_claims WHERE path = ? AND owner = ?",
+                                 [(path, owner) for path in claimed.values()])
+        return folder_ids
+
+    def invalidate(self, folder_id):
+        """Forget a folder (and everything below it) after Drive reports it missing"""
+        with self._lock:
+            paths = [path for path, cached_id in self._ids.items() if cached_id == folder_id]
+
+        conn = self.db.connection
+        stale = set(paths)
+        for row in conn.execute("SELECT path FROM drive_folders WHERE folder_id = ?", (folder_id,)):
+            stale.add(row[0])
+
+        with conn:
+            for path in stale:
+                conn.execute(
+                    "DELETE FROM drive_folders WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                    (path, path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%')
+                )
+
+        with self._lock:
+            for path in list(self._ids):
+                if any(path == stale_path or path.startswith(stale_path + '/') for stale_path in stale):
+                    del self._ids[path]
+
+    def clear(self):
+        """Forget every cached folder"""
+        with self._lock:
+            self._ids.clear()
+        conn = self.db.connection
+        with conn:
+            conn.execute("DELETE FROM drive_folders")
+
+
+class AdaptiveBackoff:
+    """Shared pause that grows on throttling and decays on success
+
+    Every upload worker waits on the same gate, so one rate-limit response
+    slows the whole pool down instead of each worker retrying blindly.
+    """
+
+    def __init__(self, base=1.0, maximum=64.0):
+        self.base = base
+        self.maximum = maximum
+        self.delay = 0.0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleep until the current backoff window has passed"""
+        with self._lock:
+            pause = self._resume_at - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            with self._lock:
+                self.throttled_seconds += pause
+
+    def failure(self, retry_after=None):
+        """Record a throttled or transient failure and widen the window
+
+        retry_after is the server's requested wait in seconds, if it sent one.
+        """
+        with self._lock:
+            self.throttled += 1
+            self.delay = min(self.maximum, max(self.base, self.delay * 2))
+            pause = retry_after if retry_after else random.uniform(self.delay / 2, self.delay)
+            self._resume_at = max(self._resume_at, time.monotonic() + pause)
+
+    def success(self):
+        """Record a success; the window shrinks back towards zero"""
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base / 4 else 0.0
+
+
+class DriveUploadManager:
+    """Chunked resumable uploads and batched Drive folder calls, with shared backoff
+
+    Uploads run on the caller's thread (the pipeline's upload stage runs
+    several). httplib2 connections are not thread-safe, so each thread gets
+    its own (authorized) Http object while sharing the service definition.
+    """
+
+    def __init__(self, service, credentials=None, chunk_size=8 * 1024 * 1024,
+                 max_retries=6, backoff_base=1.0, backoff_max=64.0, api_endpoint=None):
+        if chunk_size % CHUNK_ALIGNMENT:
+            raise ValueError("chunk_size must be a multiple of 256 KiB")
+
+        self.service = service
+        self.credentials = credentials
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        # A custom endpoint (e.g. a local stub server) also needs its own
+        # batch URI, and media uploads moved off googleapis' https URL
+        self.api_endpoint = api_endpoint.rstrip('/') if api_endpoint else None
+        self.batch_uri = f"{self.api_endpoint}/batch/drive/v3" if self.api_endpoint else None
+        self.backoff = AdaptiveBackoff(backoff_base, backoff_max)
+
+        self._local = threading.local()
+
+    @property
+    def http(self):
+        """This thread's Http object"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            from googleapiclient.http import build_http
+
+            # build_http() stops httplib2 treating resumable uploads' 308
+            # "Resume Incomplete" responses as redirects
+            if self.credentials is not None:
+                import google_auth_httplib2
+                http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=build_http())
+            else:
+                http = build_http()
+            self._local.http = http
+        return http
+
+    def _retry_after(self, error):
+        """Seconds from the response's Retry-After header (either form), if any"""
+        resp = getattr(error, 'resp', None)
+        try:
+            return parse_retry_after(resp.get('retry-after')) if resp is not None else None
+        except AttributeError:
+            return None
+
+    def _call(self, func):
+        """Run func(http) with shared adaptive backoff on retryable errors"""
+        attempt = 0
+        while True:
+            self.backoff.wait()
+            try:
+                result = func(self.http)
+                self.backoff.success()
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                attempt += 1
+                self.backoff.failure(self._retry_after(e))
+
+    def execute(self, request):
+        """Execute a single API request on this thread's connection, with backoff"""
+        return self._call(lambda http: request.execute(http=http))
+
+    def upload(self, image_data, filename, folder_id, mimetype='image/png'):
+        """Upload one file in resumable chunks; returns id/webViewLink/webContentLink"""
+        from googleapiclient.http import MediaIoBaseUpload
+
+        image_data.seek(0)
+        media = MediaIoBaseUpload(image_data, mimetype=mimetype, chunksize=self.chunk_size, resumable=True)
+        request = self.service.files().create(
+            body={'name': filename, 'parents': [folder_id] if folder_id else []},
+            media_body=media,
+            fields='id,webViewLink,webContentLink'
+        )
+        if self.api_endpoint:
+            parsed = urllib.parse.urlparse(request.uri)
+            request.uri = self.api_endpoint + parsed.path + (f"?{parsed.query}" if parsed.query else '')
+
+        response = None
+        while response is None:
+            # A failed chunk is resumed from the last byte Drive acknowledged
+            _, response = self._call(lambda http: request.next_chunk(http=http))
+        return response
+
+    def _batch(self, requests):
+        """Run {request_id: request} as Drive batch HTTP requests
+
+        Returns {request_id: response}; requests that still fail after the
+        retries are reported as exceptions in the result.
+        """
+        from googleapiclient.http import BatchHttpRequest
+
+        results = {}
+        pending = dict(requests)
+        attempt = 0
+
+        while pending:
+            failed = {}
+            ids = list(pending)
+
+            for start in range(0, len(ids), MAX_BATCH_SIZE):
+                def callback(request_id, response, exception):
+                    if exception is not None and is_retryable(exception) and attempt < self.max_retries:
+                        failed[request_id] = pending[request_id]
+                    else:
+                        results[request_id] = exception if exception is not None else response
+
+                batch = BatchHttpRequest(callback=callback, batch_uri=self.batch_uri) if self.batch_uri \
+                    else self.service.new_batch_http_request(callback=callback)
+                for request_id in ids[start:start + MAX_BATCH_SIZE]:
+                    batch.add(pending[request_id], request_id=request_id)
+                self._call(lambda http: batch.execute(http=http))
+
+            if failed:
+                attempt += 1
+                self.backoff.failure()
+            else:
+                self.backoff.success()
+            pending = failed
+
+        return results
+
+    def find_or_create_folders(self, names, parent_id=None):
+        """Resolve several folders under one parent in two batch requests
+
+        Returns {name: folder_id}. One batched files().list finds the
+        existing folders; a second batch creates the missing ones.
+        """
+        names = list(dict.fromkeys(names))
+        lookups = {}
+        for index, name in enumerate(names):
+            query = f"name='{_escape_query(name)}' and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+            if parent_id:
+                query += f" and '{parent_id}' in parents"
+            lookups[str(index)] = self.service.files().list(q=query, fields="files(id, name)")
+
+        folder_ids = {}
+        for request_id, response in self._batch(lookups).items():
+            if isinstance(response, Exception):
+                raise response
+            files = response.get('files', [])
+            if files:
+                folder_ids[names[int(request_id)]] = files[0]['id']
+
+        creates = {}
+        for index, name in enumerate(names):
+            if name not in folder_ids:
+                body = {'name': name, 'mimeType': FOLDER_MIME_TYPE}
+                if parent_id:
+                    body['parents'] = [parent_id]
+                creates[str(index)] = self.service.files().create(body=body, fields='id')
+
+        for request_id, response in self._batch(creates).items():
+            if isinstance(response, Exception):
+                raise response
+            folder_ids[names[int(request_id)]] = response['id']
+
+        return folder_ids
+
+    def stats(self):
+        """Throttling counters for the run"""
+        return {
+            'throttled': self.backoff.throttled,
+            'throttled_seconds': round(self.backoff.throttled_seconds, 3),
+            'current_backoff': round(self.backoff.delay, 3)
+        }
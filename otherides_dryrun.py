@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Dry runs: plan a whole drop and estimate its cost without calling any API
+
+dry_run() prepares every spec through generator.plan_batch() - the same
+code path enqueue_batch() uses - so the image_ids, variant names, prompts,
+traits, tags and file locations it reports are exactly the ones a real run
+would produce. Nothing is sent to OpenAI or Drive and no vehicle or job is
+written. On top of the plan it reports:
+
+- collisions: image_ids repeated within the plan or already used (by this
+  batch or another), and prompts repeated within the plan
+- distribution skew: dimensions whose value counts stray from an even split
+- projected OpenAI cost for the images that would actually be requested
+  (minus collisions and generation cache hits) and Drive/local storage
+
+The plan goes to an NDJSON file and/or the dry_run_plans table.
+
+Usage: python otherides_dryrun.py (--total N [--seed S] | --specs plan.json) [--batch NAME] [--out plan.ndjson] [--save]
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+# USD per image by (model, quality, size), from OpenAI's published pricing
+IMAGE_PRICES = {
+    ('dall-e-3', 'standard', '1024x1024'): 0.040,
+    ('dall-e-3', 'standard', '1024x1792'): 0.080,
+    ('dall-e-3', 'standard', '1792x1024'): 0.080,
+    ('dall-e-3', 'hd', '1024x1024'): 0.080,
+    ('dall-e-3', 'hd', '1024x1792'): 0.120,
+    ('dall-e-3', 'hd', '1792x1024'): 0.120,
+    ('dall-e-2', 'standard', '1024x1024'): 0.020,
+    ('dall-e-2', 'standard', '512x512'): 0.018,
+    ('dall-e-2', 'standard', '256x256'): 0.016,
+}
+
+# Typical DALL-E 3 1024x1024 PNG, used until the database has post-processed images to measure
+DEFAULT_IMAGE_BYTES = 1_700_000
+
+# Dimensions checked for skew (vehicle_data keys)
+SKEW_DIMENSIONS = ('faction', 'vehicle_type', 'biome', 'style', 'camera_view', 'lighting')
+
+PLAN_COLUMNS = ('position', 'image_id', 'faction', 'vehicle_type', 'variant', 'biome', 'style',
+                'camera_view', 'lighting', 'honorary', 'traits', 'tags', 'prompt', 'file_name',
+                'file_path', 'cached', 'flags')
+
+
+def image_price(params):
+    """USD per image for generation parameters (None if the combination is unknown)"""
+    return IMAGE_PRICES.get((params.get('model'), params.get('quality', 'standard'), params.get('size')))
+
+
+def measured_image_bytes(conn):
+    """Average uploaded (full.png) and all-variant bytes per image from image_variants, if any"""
+    uploaded = []
+    local = []
+    for (variants,) in conn.execute(
+        "SELECT image_variants FROM otherides_vehicles WHERE image_variants IS NOT NULL ORDER BY id DESC LIMIT 1000"
+    ):
+        try:
+            variants = json.loads(variants)
+        except json.JSONDecodeError:
+            continue
+        if 'full.png' in variants:
+            uploaded.append(variants['full.png']['bytes'])
+        local.append(sum(variant['bytes'] for variant in variants.values()))
+    if not uploaded:
+        return None, None
+    return sum(uploaded) / len(uploaded), sum(local) / len(local)
+
+
+def find_collisions(vehicles, existing, batch_name):
+    """Per-vehicle flags for repeated and already-used image_ids and repeated prompts
+
+    existing maps image_id -> batch for ids in use before the plan was made.
+    """
+    image_ids = Counter(vehicle['image_id'] for vehicle in vehicles)
+    prompts = Counter(vehicle['prompt'] for vehicle in vehicles)
+    seen = set()
+    flags = []
+    for vehicle in vehicles:
+        image_id = vehicle['image_id']
+        vehicle_flags = []
+        if image_ids[image_id] > 1:
+            vehicle_flags.append('duplicate_image_id')
+        if image_id in existing:
+            owner = existing[image_id]
+            vehicle_flags.append('already_in_batch' if owner == batch_name else 'existing_image_id')
+        if prompts[vehicle['prompt']] > 1:
+            vehicle_flags.append('duplicate_prompt')
+        # Only the first copy of an image_id would be queued
+        if image_id in seen:
+            vehicle_flags.append('skipped')
+        seen.add(image_id)
+        flags.append(vehicle_flags)
+    return flags
+
+
+def distribution_skew(vehicles, allowed=None, tolerance=0.25, min_expected=5):
+    """Dimensions whose most or least common value strays more than tolerance from an even split
+
+    allowed maps a dimension to every value it could take, so values the
+    plan never uses count as zero. Dimensions where an even split would
+    give fewer than min_expected vehicles per value are not judged.
+    """
+    skewed = []
+    total = len(vehicles)
+    for dimension in SKEW_DIMENSIONS:
+        counts = Counter(vehicle[dimension] for vehicle in vehicles)
+        for value in (allowed or {}).get(dimension, ()):
+            counts.setdefault(value, 0)
+        if len(counts) < 2:
+            continue
+        expected = total / len(counts)
+        if expected < min_expected:
+            continue
+
+        (high_value, high), (low_value, low) = counts.most_common(1)[0], min(counts.items(), key=lambda item: item[1])
+        if high / expected - 1 > tolerance or 1 - low / expected > tolerance:
+            skewed.append({
+                'dimension': dimension,
+                'values': len(counts),
+                'expected': round(expected, 1),
+                'most_common': [high_value, high],
+                'least_common': [low_value, low],
+                'unused': sorted(value for value, count in counts.items() if not count),
+            })
+    return skewed
+
+
+def _allowed_values(generator):
+    """Values a dimension can take for ordinary (non-honorary) vehicles"""
+    from otherides_planner import RESERVED
+
+    return {
+        'faction': [f for f in generator.racing_factions if f not in RESERVED['faction']],
+        'vehicle_type': list(generator.vehicle_types),
+        'biome': [b for b in generator.biomes if b not in RESERVED['biome']],
+        'style': list(generator.aesthetic_styles.values()),
+        'camera_view': list(generator.camera_views),
+        'lighting': list(generator.lighting_setups),
+    }
+
+
+def dry_run(generator, specs, batch_name="dry_run", seed=None, subfolder=None, tolerance=0.25):
+    """Plan specs exactly as a real run would and report collisions, skew, cost and storage
+
+    Returns (plan rows, report). No API, Drive or database writes happen;
+    the generator's in-memory name index does record the planned image_ids.
+    """
+    from otherides_generator import IMAGE_GENERATION_PARAMS
+
+    started = time.perf_counter()
+    existing = dict(generator.names.taken)
+    vehicles = generator.plan_batch(specs, seed)
+    planned = time.perf_counter()
+
+    flags = find_collisions(vehicles, existing, batch_name)
+    cache = generator.cache
+    plan = []
+    for position, (vehicle, vehicle_flags) in enumerate(zip(vehicles, flags)):
+        file_name, file_path = generator._vehicle_file_location(vehicle, subfolder)
+        cached = bool(cache and cache.has_image(cache.key_for(vehicle['prompt'], IMAGE_GENERATION_PARAMS)))
+        plan.append({
+            'position': position,
+            'image_id': vehicle['image_id'],
+            'faction': vehicle['faction'],
+            'vehicle_type': vehicle['vehicle_type'],
+            'variant': vehicle['variant'],
+            'biome': vehicle['biome'],
+            'style': vehicle['style'],
+            'camera_view': vehicle['camera_view'],
+            'lighting': vehicle['lighting'],
+            'honorary': vehicle.get('honorary'),
+            'traits': vehicle['traits'],
+            'tags': vehicle['tags'],
+            'prompt': vehicle['prompt'],
+            'file_name': file_name,
+            'file_path': file_path,
+            'cached': cached,
+            'flags': vehicle_flags,
+        })
+
+    # What a real run would pay for: the first copy of each image_id that no
+    # batch has yet and the generation cache can't answer
+    blocked = {'existing_image_id', 'already_in_batch', 'skipped'}
+    billable = [row for row in plan if not blocked.intersection(row['flags']) and not row['cached']]
+
+    price = image_price(IMAGE_GENERATION_PARAMS)
+    uploaded_bytes, local_bytes = measured_image_bytes(generator.db.connection)
+    storage_source = 'measured' if uploaded_bytes else 'default'
+    uploaded_bytes = uploaded_bytes or DEFAULT_IMAGE_BYTES
+    new_images = sum(1 for row in plan if not blocked.intersection(row['flags']))
+
+    flag_counts = Counter(flag for row in plan for flag in row['flags'])
+    report = {
+        'batch': batch_name,
+        'vehicles': len(plan),
+        'new_images': new_images,
+        'cached': sum(1 for row in plan if row['cached']),
+        'billable_images': len(billable),
+        'collisions': {flag: flag_counts[flag] for flag in
+                       ('duplicate_image_id', 'existing_image_id', 'already_in_batch', 'duplicate_prompt')
+                       if flag_counts[flag]},
+        'skew': distribution_skew(vehicles, _allowed_values(generator), tolerance),
+        'cost': {
+            'params': IMAGE_GENERATION_PARAMS,
+            'usd_per_image': price,
+            'usd': round(price * len(billable), 2) if price is not None else None,
+        },
+        'storage': {
+            'source': storage_source,
+            'bytes_per_image': int(uploaded_bytes),
+            'drive_bytes': int(uploaded_bytes * new_images),
+            'local_variant_bytes': int(local_bytes * new_images) if local_bytes else None,
+        },
+        'plan_seconds': round(planned - started, 3),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    return plan, report
+
+
+def write_ndjson(path, plan, report=None):
+    """One JSON object per planned vehicle, preceded by the report (if given)"""
+    with open(path, 'w') as f:
+        if report is not None:
+            f.write(json.dumps({'report': report}) + "\n")
+        for row in plan:
+            f.write(json.dumps(row) + "\n")
+
+
+def save_plan(conn, name, plan, report):
+    """Store a dry run in dry_runs/dry_run_plans, replacing an earlier run of the same name"""
+    with conn:
+        conn.execute("DELETE FROM dry_run_plans WHERE run_name = ?", (name,))
+        conn.execute(
+            "INSERT OR REPLACE INTO dry_runs (name, batch_name, vehicles, billable_images, estimated_usd, "
+            "estimated_drive_bytes, report, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, report['batch'], report['vehicles'], report['billable_images'], report['cost']['usd'],
+             report['storage']['drive_bytes'], json.dumps(report), datetime.now().isoformat())
+        )
+        conn.executemany(
+            f"INSERT INTO dry_run_plans (run_name, {', '.join(PLAN_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in PLAN_COLUMNS)})",
+            [
+                (name, *[json.dumps(row[c]) if c in ('traits', 'tags', 'flags') else row[c] for c in PLAN_COLUMNS])
+                for row in plan
+            ]
+        )
+
+
+def print_report(report):
+    """Human-readable dry run summary"""
+    cost = report['cost']
+    storage = report['storage']
+    print(f"🧪 Dry run of {report['batch']}: {report['vehicles']} vehicles planned in {report['plan_seconds']:.2f}s")
+    print(f"   {report['new_images']} new images, {report['cached']} in the generation cache, "
+          f"{report['billable_images']} to generate")
+    if cost['usd'] is not None:
+        print(f"💵 Projected OpenAI cost: ${cost['usd']:,.2f} "
+              f"({report['billable_images']} x ${cost['usd_per_image']:.3f}, "
+              f"{cost['params'].get('model')} {cost['params'].get('quality')} {cost['params'].get('size')})")
+    else:
+        print(f"💵 No price known for {cost['params']}")
+    local = f", ~{storage['local_variant_bytes'] / 1024 ** 3:.2f} GB of local variants" \
+        if storage['local_variant_bytes'] else ""
+    print(f"💾 Projected Drive storage: ~{storage['drive_bytes'] / 1024 ** 3:.2f} GB "
+          f"({storage['bytes_per_image'] / 1024 ** 2:.2f} MB per image, {storage['source']}){local}")
+
+    if report['collisions']:
+        print("⚠️ Collisions: " + ", ".join(f"{count} {flag.replace('_', ' ')}" for flag, count in report['collisions'].items()))
+    else:
+        print("✅ No image_id or prompt collisions")
+    for skew in report['skew']:
+        unused = f", unused: {', '.join(skew['unused'][:5])}" if skew['unused'] else ""
+        print(f"⚠️ Skewed {skew['dimension']}: expected ~{skew['expected']} per value, "
+              f"{skew['most_common'][0]} has {skew['most_common'][1]}, "
+              f"{skew['least_common'][0]} has {skew['least_common'][1]}{unused}")
+    if not report['skew']:
+        print("✅ No distribution skew beyond tolerance")
+
+
+def main():
+    """Plan a drop without API calls and print its projected cost"""
+    import argparse
+
+    from otherides_generator import OtheridesAssetGenerator
+
+    parser = argparse.ArgumentParser(description="Dry-run an OTHERIDES drop: exact plan, collisions, skew and cost")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--total', type=int, help="plan a stratified drop of this many vehicles")
+    source.add_argument('--specs', help="JSON file with a list of generate_otherides_vehicle specs")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--batch', default="dry_run", help="batch the drop would be queued as")
+    parser.add_argument('--db', default="otherides_assets.db")
+    parser.add_argument('--cache-dir', help="generation cache to count free (cached) images from")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed deviation from an even split")
+    parser.add_argument('--out', help="write the report and plan to this NDJSON file")
+    parser.add_argument('--save', action='store_true', help="store the plan in the dry_run_plans table")
+    parser.add_argument('--name', help="name of the saved dry run (default: the batch name)")
+    args = parser.parse_args()
+
+    try:
+        generator = OtheridesAssetGenerator(db_path=args.db, cache_dir=args.cache_dir, variants_dir=None,
+                                            telemetry=False)
+        if args.total:
+            specs = generator.plan_collection(args.total, seed=args.seed)
+        else:
+            with open(args.specs, 'r') as f:
+                specs = json.load(f)
+
+        plan, report = dry_run(generator, specs, args.batch, args.seed, tolerance=args.tolerance)
+        print_report(report)
+
+        if args.out:
+            write_ndjson(args.out, plan, report)
+            print(f"📝 Plan written to {args.out}")
+        if args.save:
+            save_plan(generator.db.connection, args.name or args.batch, plan, report)
+            print(f"📝 Plan saved as dry run '{args.name or args.batch}' in {args.db}")
+        generator.db.close()
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
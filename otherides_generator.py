@@ -6,167 +6,292 @@ AI-powered vehicle generator for the OTHERIDES NFT collection with authentic
 faction lore, real Otherside metaverse biomes, and 3D pipeline integration.
 """
 
-import openai
 import os
-import requests
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-import io
+import itertools
 from datetime import datetime
 import json
 import hashlib
-import sqlite3
+import threading
+from functools import lru_cache
 from typing import List, Dict, Optional, Tuple
 import random
 from pathlib import Path
 
+# openai, googleapiclient, google-auth and requests are imported where they are
+# first used, so importing this module (e.g. for the data tables below) and
+# constructing a generator stay fast
+from otherides_cache import GenerationCache
+from otherides_db import VehicleDatabase
+from otherides_drive import DriveFolderCache, DriveUploadManager, is_not_found
+from otherides_http import ImageDownloader
+from otherides_jobs import JobQueue, JobRunner
+from otherides_phash import DEFAULT_MAX_DISTANCE, HammingIndex, phash, to_hex
+from otherides_postprocess import ImagePostProcessor, open_variant, read_image_bytes
+from otherides_prompts import PromptRenderer
+from otherides_ratelimit import ImageRateLimiter
+from otherides_shard import in_shard, select_shard, shard_db_path
+from otherides_schema import migrate
+from otherides_storage import FROM_ENV, StorageSet, stored_file_path
+from otherides_telemetry import NullTelemetry, Telemetry
+
+# DALL-E parameters shared by the sync and async generation paths
+IMAGE_GENERATION_PARAMS = {
+    'model': 'dall-e-3',
+    'size': '1024x1024',
+    'quality': 'hd',
+    'n': 1,
+}
+
+# Real Otherside biomes (29 environments from the metaverse)
+BIOMES = {
+    'swamp': 'Biogenic swamp environment with murky waters and twisted vegetation',
+    'glacier': 'Frozen glacier environment with ice formations and snow',
+    'barrens': 'Desolate barren landscape with rocky outcroppings',
+    'molten': 'Molten lava environment with fire and volcanic activity',
+    'thornwood': 'Dark thornwood forest with twisted spiky trees',
+    'shards': 'Crystalline shard environment with jagged crystal formations',
+    'biolum': 'Bioluminescent environment with glowing organic structures',
+    'sands': 'Desert sands environment with dunes and arid landscape',
+    'ruins': 'Ancient ruins environment with crumbling structures',
+    'sulfuric_water': 'Sulfuric water environment with toxic pools',
+    'wastelands': 'Post-apocalyptic wasteland with debris and decay',
+    'mystic': 'Mystical environment with magical energies and ethereal mists',
+    'weldan': 'Weldan metallic environment with industrial structures',
+    'spiers': 'Towering spiers environment with tall needle-like formations',
+    'malva': 'Malva environment with purple-hued alien landscapes',
+    'crimson': 'Crimson environment with red-tinted terrain and atmosphere',
+    'jungle': 'Dense jungle environment with lush tropical vegetation',
+    'plague': 'Plague-ridden environment with diseased and corrupted landscape',
+    'bone': 'Bone environment filled with skeletal remains and calcium structures',
+    'crystal': 'Pure crystal environment with transparent geometric formations',
+    'sky': 'Sky environment with floating platforms and aerial landscapes',
+    'shadow': 'Shadow environment with dark voids and minimal lighting',
+    'mycelium': 'Mycelium environment with fungal networks and spore clouds',
+    'obsidian': 'Obsidian environment with black volcanic glass formations',
+    'silt': 'Silt environment with fine sediment and muddy terrain',
+    'glitter': 'Glitter environment with sparkling, reflective surfaces',
+    'botanical': 'Botanical garden environment with diverse plant life',
+    'acid': 'Acid environment with corrosive pools and toxic atmosphere',
+    'chaos': 'Chaotic environment with reality-bending anomalies and instability',
+    # Special honorary biome
+    'miami_swamp': 'gray-purple Miami swamp with mist and soft twilight lighting'
+}
+
+VEHICLE_TYPES = {
+    'speedster': 'ultra-fast single-seat racer with aerodynamic body',
+    'bruiser': 'heavy-duty multi-terrain assault vehicle',
+    'glider': 'hovering vehicle with anti-gravity propulsion',
+    'phantom': 'stealth vehicle with cloaking capabilities',
+    'destroyer': 'weapon-laden combat racer',
+    'explorer': 'long-range vehicle built for unknown territories',
+    'buggy': 'all-terrain off-road racing vehicle'
+}
+
+# Vehicle aesthetic styles
+AESTHETIC_STYLES = {
+    'rough_cool_tattoo': 'Rough Cool / Tattoo Aesthetic',
+    'sleek_corporate': 'Sleek Corporate',
+    'brutalist_industrial': 'Brutalist Industrial',
+    'organic_bio': 'Organic Bio-Tech',
+    'mystical_ritual': 'Mystical Ritual',
+    'noble_refined': 'Noble Refined'
+}
+
+# Camera views and lighting
+CAMERA_VIEWS = ['Front 3/4', 'Side Profile', 'Rear 3/4', 'Top Down', 'Close Detail']
+LIGHTING_SETUPS = [
+    'Moody purple-gray haze',
+    'Bright studio lighting', 
+    'Dramatic sunset',
+    'Neon night glow',
+    'Soft natural light'
+]
+
+# Variant names: "<pattern> <style modifier> <Vehicle type>"
+VARIANT_PATTERNS = ['Leopard', 'Tiger', 'Dragon', 'Phoenix', 'Viper', 'Wolf', 'Eagle', 'Shark']
+VARIANT_ELEMENTS = ['Fire', 'Ice', 'Lightning', 'Shadow', 'Crystal', 'Steel', 'Bone', 'Gold']
+STYLE_MODIFIERS = {
+    'rough_cool_tattoo': ['Tattoo', 'Ink', 'Rough', 'Street'],
+    'sleek_corporate': ['Elite', 'Prime', 'Executive', 'Corporate'],
+    'brutalist_industrial': ['Heavy', 'Industrial', 'Forge', 'Steel'],
+    'organic_bio': ['Bio', 'Living', 'Symbiont', 'Wild'],
+    'mystical_ritual': ['Ritual', 'Mystic', 'Sacred', 'Ancient'],
+    'noble_refined': ['Noble', 'Pristine', 'Royal', 'Refined']
+}
+
+
+def variant_name(pattern, modifier, vehicle_type):
+    """Variant name from its parts, e.g. 'Tiger Elite Speedster'"""
+    return f"{pattern} {modifier} {vehicle_type.title()}"
+
+
+def image_id_for(faction, variant, version=1):
+    """Image ID for a faction/variant, e.g. 'scion_tiger_elite_speedster_v02'"""
+    safe_faction = faction.lower().replace(' ', '_')
+    safe_variant = variant.lower().replace(' ', '_')
+    return f"{safe_faction}_{safe_variant}_v{version:02d}"
+
+
+@lru_cache(maxsize=None)
+def load_faction_data():
+    """Faction data from data/otherides_factions.json, parsed once per process"""
+    try:
+        faction_file = Path(__file__).parent / 'data' / 'otherides_factions.json'
+        with open(faction_file, 'r') as f:
+            faction_list = json.load(f)
+
+        # Convert list to dict format
+        factions = {}
+        for faction in faction_list:
+            key = faction['name'].lower().replace(' ', '_')
+            factions[key] = {
+                'archetype': faction['archetype'],
+                'keywords': faction['keywords'],
+                'materials': faction['design_traits']['materials'],
+                'style': faction['design_traits']['style'],
+                'aesthetic_influences': faction['design_traits']['aesthetic_influences'],
+                'vehicle_themes': faction['vehicle_themes']
+            }
+
+            # Handle Kerr Org subfactions
+            if 'subfactions' in faction:
+                factions[key]['subfactions'] = {
+                    sub['name'].lower().replace(' ', '_'): f"{sub['focus']}, {sub['aesthetic']}"
+                    for sub in faction['subfactions']
+                }
+
+        # Add Honorary faction
+        factions['honorary'] = {
+            'archetype': 'Tribute Vehicles',
+            'keywords': ['tribute', 'legacy', 'special', 'commemorative', 'unique'],
+            'materials': ['custom themed bodywork', 'signature patterns', 'personalized details'],
+            'style': 'varies by honoree',
+            'aesthetic_influences': ['personal style of honoree'],
+            'vehicle_themes': ['custom tribute vehicles', 'signature aesthetics', 'legacy racers']
+        }
+
+        return factions
+
+    except FileNotFoundError:
+        print("Warning: Faction data file not found. Using fallback data.")
+        return _fallback_factions()
+
+
+def _fallback_factions():
+    """Fallback faction data if JSON file not found"""
+    return {
+        'amalfi': {
+            'archetype': 'Noble Planners',
+            'keywords': ['luxury', 'elegance', 'long-term vision', 'refinement', 'high society'],
+            'materials': ['crystalline bodywork', 'gold trim', 'pearl enamel'],
+            'style': 'streamlined and sculpted',
+            'aesthetic_influences': ['The Culture', 'Dune', 'Blade Runner corporate elite'],
+            'vehicle_themes': ['regal racers', 'hover-inspired tech', 'precision over power']
+        },
+        'raven_coats': {
+            'archetype': 'Stealth Tacticians',
+            'keywords': ['secrecy', 'strategy', 'trickery', 'ambush', 'deception'],
+            'materials': ['matte black plating', 'bioluminescent accents', 'tactical armor'],
+            'style': 'asymmetrical and agile',
+            'aesthetic_influences': ['Firefly', 'rogue archetypes', 'Deadfire'],
+            'vehicle_themes': ['stealth buggies', 'adaptive racers', 'mist-cloaked muscle']
+        }
+    }
+
+
 class OtheridesAssetGenerator:
-    def __init__(self, db_path="otherides_assets.db"):
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.drive_service = self._setup_google_drive()
+    def __init__(self, db_path="otherides_assets.db", db_synchronous="NORMAL",
+                 cache_dir=".otherides_cache", images_per_minute=None, seed=None,
+                 variants_dir="otherides_variants", postprocess_workers=None, telemetry=None,
+                 prompt_version=None, storage_dir=FROM_ENV, storage=None):
+        # Per-stage timers and error counts; defaults to OTHERIDES_TELEMETRY* settings,
+        # telemetry=False records nothing
+        if telemetry is None:
+            telemetry = Telemetry.from_env()
+        elif telemetry is False:
+            telemetry = NullTelemetry()
+        self.telemetry = telemetry
+        # API clients and the Drive service are created on first use
+        self._openai_client = None
+        self._async_openai_client = None
+        # Shared by the sync and async paths; defaults to OPENAI_IMAGES_PER_MINUTE
+        self.rate_limiter = ImageRateLimiter(images_per_minute) if images_per_minute \
+            else ImageRateLimiter.from_env()
+        self.downloader = ImageDownloader()
+        # Pass cache_dir=None to always call the API
+        self.cache = GenerationCache(cache_dir) if cache_dir else None
+        # Optimized PNG, WebP previews and thumbnails; pass variants_dir=None to skip
+        self.postprocessor = ImagePostProcessor(variants_dir, workers=postprocess_workers) \
+            if variants_dir else None
+        self._drive_service = None
+        self._drive_ready = False
+        self._drive_lock = threading.Lock()
+        self._drive_credentials = None
+        self._drive_api_endpoint = None
+        self._upload_manager = None
+        # Sinks every saved image goes to (local content-addressed store, S3, Drive);
+        # defaults to OTHERIDES_STORAGE, pass storage_dir=None to leave out the local store
+        self.storage = storage if storage is not None else StorageSet.from_env(self, storage_dir, telemetry)
+        # Random choices (variants, views, lighting...) come from here, so a
+        # seeded generator plans the same collection on every run and host
+        self.rng = random.Random(seed)
+        self._names = None
+        self._names_lock = threading.Lock()
+        # Prompt templates are loaded and compiled on first use
+        self.prompt_version = prompt_version
+        self._prompts = None
         self.db_path = db_path
+        self.db = VehicleDatabase(db_path, synchronous=db_synchronous)
         self._setup_database()
+        self.folder_cache = DriveFolderCache(self.db, self._get_or_create_folder)
+        # Saved vehicles within this many pHash bits of an earlier one are flagged
+        self.near_duplicate_distance = DEFAULT_MAX_DISTANCE
+        self._phash_index = None
+        self._phash_lock = threading.Lock()
         
-        # Load faction data from JSON file
-        self.racing_factions = self._load_faction_data()
-        
-        # Real Otherside biomes (29 environments from the metaverse)
-        self.biomes = {
-            'swamp': 'Biogenic swamp environment with murky waters and twisted vegetation',
-            'glacier': 'Frozen glacier environment with ice formations and snow',
-            'barrens': 'Desolate barren landscape with rocky outcroppings',
-            'molten': 'Molten lava environment with fire and volcanic activity',
-            'thornwood': 'Dark thornwood forest with twisted spiky trees',
-            'shards': 'Crystalline shard environment with jagged crystal formations',
-            'biolum': 'Bioluminescent environment with glowing organic structures',
-            'sands': 'Desert sands environment with dunes and arid landscape',
-            'ruins': 'Ancient ruins environment with crumbling structures',
-            'sulfuric_water': 'Sulfuric water environment with toxic pools',
-            'wastelands': 'Post-apocalyptic wasteland with debris and decay',
-            'mystic': 'Mystical environment with magical energies and ethereal mists',
-            'weldan': 'Weldan metallic environment with industrial structures',
-            'spiers': 'Towering spiers environment with tall needle-like formations',
-            'malva': 'Malva environment with purple-hued alien landscapes',
-            'crimson': 'Crimson environment with red-tinted terrain and atmosphere',
-            'jungle': 'Dense jungle environment with lush tropical vegetation',
-            'plague': 'Plague-ridden environment with diseased and corrupted landscape',
-            'bone': 'Bone environment filled with skeletal remains and calcium structures',
-            'crystal': 'Pure crystal environment with transparent geometric formations',
-            'sky': 'Sky environment with floating platforms and aerial landscapes',
-            'shadow': 'Shadow environment with dark voids and minimal lighting',
-            'mycelium': 'Mycelium environment with fungal networks and spore clouds',
-            'obsidian': 'Obsidian environment with black volcanic glass formations',
-            'silt': 'Silt environment with fine sediment and muddy terrain',
-            'glitter': 'Glitter environment with sparkling, reflective surfaces',
-            'botanical': 'Botanical garden environment with diverse plant life',
-            'acid': 'Acid environment with corrosive pools and toxic atmosphere',
-            'chaos': 'Chaotic environment with reality-bending anomalies and instability',
-            # Special honorary biome
-            'miami_swamp': 'gray-purple Miami swamp with mist and soft twilight lighting'
-        }
+        # Shared, process-wide lookup tables
+        self.racing_factions = load_faction_data()
+        self.biomes = BIOMES
+        self.vehicle_types = VEHICLE_TYPES
+        self.aesthetic_styles = AESTHETIC_STYLES
+        self.camera_views = CAMERA_VIEWS
+        self.lighting_setups = LIGHTING_SETUPS
         
-        self.vehicle_types = {
-            'speedster': 'ultra-fast single-seat racer with aerodynamic body',
-            'bruiser': 'heavy-duty multi-terrain assault vehicle',
-            'glider': 'hovering vehicle with anti-gravity propulsion',
-            'phantom': 'stealth vehicle with cloaking capabilities',
-            'destroyer': 'weapon-laden combat racer',
-            'explorer': 'long-range vehicle built for unknown territories',
-            'buggy': 'all-terrain off-road racing vehicle'
-        }
-        
-        # Vehicle aesthetic styles
-        self.aesthetic_styles = {
-            'rough_cool_tattoo': 'Rough Cool / Tattoo Aesthetic',
-            'sleek_corporate': 'Sleek Corporate',
-            'brutalist_industrial': 'Brutalist Industrial',
-            'organic_bio': 'Organic Bio-Tech',
-            'mystical_ritual': 'Mystical Ritual',
-            'noble_refined': 'Noble Refined'
-        }
-        
-        # Camera views and lighting
-        self.camera_views = ['Front 3/4', 'Side Profile', 'Rear 3/4', 'Top Down', 'Close Detail']
-        self.lighting_setups = [
-            'Moody purple-gray haze',
-            'Bright studio lighting', 
-            'Dramatic sunset',
-            'Neon night glow',
-            'Soft natural light'
-        ]
-        
-    def _load_faction_data(self):
-        """Load faction data from JSON file"""
-        try:
-            faction_file = Path(__file__).parent / 'data' / 'otherides_factions.json'
-            with open(faction_file, 'r') as f:
-                faction_list = json.load(f)
-            
-            # Convert list to dict format
-            factions = {}
-            for faction in faction_list:
-                key = faction['name'].lower().replace(' ', '_')
-                factions[key] = {
-                    'archetype': faction['archetype'],
-                    'keywords': faction['keywords'],
-                    'materials': faction['design_traits']['materials'],
-                    'style': faction['design_traits']['style'],
-                    'aesthetic_influences': faction['design_traits']['aesthetic_influences'],
-                    'vehicle_themes': faction['vehicle_themes']
-                }
-                
-                # Handle Kerr Org subfactions
-                if 'subfactions' in faction:
-                    factions[key]['subfactions'] = {
-                        sub['name'].lower().replace(' ', '_'): f"{sub['focus']}, {sub['aesthetic']}"
-                        for sub in faction['subfactions']
-                    }
-            
-            # Add Honorary faction
-            factions['honorary'] = {
-                'archetype': 'Tribute Vehicles',
-                'keywords': ['tribute', 'legacy', 'special', 'commemorative', 'unique'],
-                'materials': ['custom themed bodywork', 'signature patterns', 'personalized details'],
-                'style': 'varies by honoree',
-                'aesthetic_influences': ['personal style of honoree'],
-                'vehicle_themes': ['custom tribute vehicles', 'signature aesthetics', 'legacy racers']
-            }
-            
-            return factions
-            
-        except FileNotFoundError:
-            print("Warning: Faction data file not found. Using fallback data.")
-            return self._get_fallback_factions()
+    @property
+    def drive_service(self):
+        """Google Drive service, authenticated on first use (None if unavailable)"""
+        if not self._drive_ready:
+            with self._drive_lock:
+                if not self._drive_ready:
+                    self._drive_service = self._setup_google_drive()
+                    self._drive_ready = True
+        return self._drive_service
     
-    def _get_fallback_factions(self):
-        """Fallback faction data if JSON file not found"""
-        return {
-            'amalfi': {
-                'archetype': 'Noble Planners',
-                'keywords': ['luxury', 'elegance', 'long-term vision', 'refinement', 'high society'],
-                'materials': ['crystalline bodywork', 'gold trim', 'pearl enamel'],
-                'style': 'streamlined and sculpted',
-                'aesthetic_influences': ['The Culture', 'Dune', 'Blade Runner corporate elite'],
-                'vehicle_themes': ['regal racers', 'hover-inspired tech', 'precision over power']
-            },
-            'raven_coats': {
-                'archetype': 'Stealth Tacticians',
-                'keywords': ['secrecy', 'strategy', 'trickery', 'ambush', 'deception'],
-                'materials': ['matte black plating', 'bioluminescent accents', 'tactical armor'],
-                'style': 'asymmetrical and agile',
-                'aesthetic_influences': ['Firefly', 'rogue archetypes', 'Deadfire'],
-                'vehicle_themes': ['stealth buggies', 'adaptive racers', 'mist-cloaked muscle']
-            }
-        }
+    @drive_service.setter
+    def drive_service(self, service):
+        self._drive_service = service
+        self._drive_ready = True
+        self._upload_manager = None
     
     def _setup_google_drive(self):
         """Setup Google Drive API authentication"""
+        from googleapiclient.discovery import build
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        
         SCOPES = ['https://www.googleapis.com/auth/drive.file']
         creds = None
         
+        # Local stub Drive server (testing/benchmarks) - no OAuth needed
+        api_endpoint = os.getenv("DRIVE_API_ENDPOINT")
+        if api_endpoint:
+            from google.auth.credentials import AnonymousCredentials
+            self._drive_credentials = AnonymousCredentials()
+            self._drive_api_endpoint = api_endpoint
+            return build('drive', 'v3', credentials=self._drive_credentials,
+                         client_options={'api_endpoint': api_endpoint}, static_discovery=True)
+        
         if os.path.exists('token.json'):
             creds = Credentials.from_authorized_user_file('token.json', SCOPES)
         
@@ -185,6 +310,7 @@ class OtheridesAssetGenerator:
                 token.write(creds.to_json())
         
         try:
+            self._drive_credentials = creds
             return build('drive', 'v3', credentials=creds)
         except Exception as e:
             print(f"Warning: Could not initialize Google Drive service: {e}")
@@ -192,187 +318,396 @@ class OtheridesAssetGenerator:
     
     def _setup_database(self):
         """Database schema for OTHERIDES NFT collection"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS otherides_vehicles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                image_id TEXT UNIQUE,
-                token_id INTEGER,
-                vehicle_name TEXT,
-                faction TEXT,
-                vehicle_type TEXT,
-                variant TEXT,
-                traits TEXT,
-                biome TEXT,
-                style TEXT,
-                camera_view TEXT,
-                lighting TEXT,
-                mood TEXT,
-                honorary TEXT,
-                creator TEXT DEFAULT 'AI_Generator',
-                generation_date TEXT,
-                source_prompt TEXT,
-                tags TEXT,
-                file_name TEXT,
-                file_path TEXT,
-                drive_id TEXT,
-                drive_link TEXT,
-                created_at TIMESTAMP,
-                collection_batch TEXT,
-                image_hash TEXT,
-                minted BOOLEAN DEFAULT FALSE,
-                opensea_ready BOOLEAN DEFAULT FALSE
+        # Creates the schema or upgrades an older database in place
+        migrate(self.db.connection)
+    
+    @property
+    def openai_client(self):
+        """OpenAI client, created on first use"""
+        if self._openai_client is None:
+            import openai
+            # Retries are left to the rate limiter so they are paced globally
+            self._openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        return self._openai_client
+    
+    @openai_client.setter
+    def openai_client(self, client):
+        self._openai_client = client
+    
+    @property
+    def phash_index(self):
+        """Near-duplicate index over stored perceptual hashes, loaded on first use"""
+        if self._phash_index is None:
+            with self._phash_lock:
+                if self._phash_index is None:
+                    self._phash_index = HammingIndex.from_database(self.db.connection)
+        return self._phash_index
+    
+    @property
+    def prompts(self):
+        """Precompiled prompt templates (data/prompts/v<prompt_version>)"""
+        if self._prompts is None:
+            self._prompts = PromptRenderer(
+                self.racing_factions, self.vehicle_types, self.biomes, self.aesthetic_styles, self.prompt_version
             )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        return self._prompts
     
-    def generate_otherides_vehicle(self, faction=None, vehicle_type=None, biome=None, 
-                                 style=None, honorary=None, custom_traits=None, variant=None):
-        """Generate a vehicle matching real OTHERIDES structure"""
+    @property
+    def names(self):
+        """Index of image_ids already in the database, loaded on first use"""
+        if self._names is None:
+            with self._names_lock:
+                if self._names is None:
+                    from otherides_naming import ImageIdIndex
+                    self._names = ImageIdIndex(self.db)
+        return self._names
+    
+    @property
+    def async_openai_client(self):
+        """Async OpenAI client used for batch generation, created on first use"""
+        if self._async_openai_client is None:
+            import openai
+            self._async_openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        return self._async_openai_client
+    
+    def prepare_otherides_vehicle(self, faction=None, vehicle_type=None, biome=None, 
+                                  style=None, honorary=None, custom_traits=None, variant=None,
+                                  camera_view=None, lighting=None, vehicle_theme=None, version=None,
+                                  allow_taken=False):
+        """Build the prompt and vehicle data for a generation request
+        
+        Fully specified requests (including camera_view, lighting and
+        vehicle_theme) always produce the same prompt, which is what lets the
+        generation cache recognise them on a re-run. Generated variant names
+        avoid image_ids already in use, and any variant without a pinned
+        version gets the first free one. A pinned version that is already
+        taken raises ValueError (before anything is paid for). plan_batch()
+        sets allow_taken, keeping pinned and first versions as given.
+        """
         
         # Random selection if not specified
         if not faction:
-            faction = random.choice(list(self.racing_factions.keys()))
+            faction = self.rng.choice(list(self.racing_factions.keys()))
         if not vehicle_type:
-            vehicle_type = random.choice(list(self.vehicle_types.keys()))
+            vehicle_type = self.rng.choice(list(self.vehicle_types.keys()))
         if not biome:
-            biome = random.choice(list(self.biomes.keys()))
+            biome = self.rng.choice(list(self.biomes.keys()))
         if not style:
-            style = random.choice(list(self.aesthetic_styles.keys()))
+            style = self.rng.choice(list(self.aesthetic_styles.keys()))
         
         faction_data = self.racing_factions[faction]
-        vehicle_desc = self.vehicle_types[vehicle_type]
-        biome_desc = self.biomes[biome]
         style_desc = self.aesthetic_styles[style]
         
-        # Generate variant name if not provided
+        # Generate variant name if not provided, preferring unused names
         if not variant:
-            variant = self._generate_variant_name(faction, vehicle_type, style)
+            variant = self._generate_free_variant_name(faction, vehicle_type, style)
+            version = self.names.claim(faction, variant, version or 1)
+        elif version is None:
+            # Plans keep a named variant's first version so re-queuing a batch
+            # finds its jobs again; direct requests take the first free one
+            version = 1 if allow_taken else self.names.claim(faction, variant, 1)
+        elif not allow_taken and self._generate_image_id(faction, variant, version) in self.names:
+            raise ValueError(
+                f"image_id {self._generate_image_id(faction, variant, version)} is already taken; "
+                f"pass version=None to use the next free version"
+            )
         
         # Generate image ID
-        image_id = self._generate_image_id(faction, variant)
+        image_id = self._generate_image_id(faction, variant, version)
+        self.names.reserve(image_id)
         
         # Select camera view and lighting
-        camera_view = random.choice(self.camera_views)
-        lighting = random.choice(self.lighting_setups)
+        if not camera_view:
+            camera_view = self.rng.choice(self.camera_views)
+        if not lighting:
+            lighting = self.rng.choice(self.lighting_setups)
         
-        # Create comprehensive prompt
+        # Create comprehensive prompt from the precompiled templates
         if faction == 'honorary' and honorary:
-            enhanced_prompt = f"""
-            A tribute vehicle honoring {honorary}, designed as a {vehicle_desc} with {style_desc}.
-            
-            VEHICLE: {variant}
-            STYLE: {style_desc}
-            BIOME: {biome_desc}
-            CAMERA: {camera_view}
-            LIGHTING: {lighting}
-            
-            Key design elements:
-            - Custom themed bodywork honoring {honorary}
-            - Signature aesthetic elements and patterns
-            - High-quality vehicle concept art
-            - Professional racing vehicle design
-            - Dynamic pose in {biome_desc}
-            - Clean background suitable for collection showcase
-            
-            Art style: Detailed digital concept art, 4K resolution,
-            professional game asset quality, clean composition
-            """
+            enhanced_prompt = self.prompts.honorary_prompt(
+                honorary, vehicle_type, biome, style, variant, camera_view, lighting
+            )
         else:
-            materials = ', '.join(faction_data['materials'])
-            keywords = ', '.join(faction_data['keywords'])
-            vehicle_theme = random.choice(faction_data['vehicle_themes'])
+            if not vehicle_theme:
+                vehicle_theme = self.rng.choice(faction_data['vehicle_themes'])
             
-            enhanced_prompt = f"""
-            A {style_desc} {vehicle_desc} from the {faction.replace('_', ' ').title()} faction.
-            
-            VEHICLE: {variant}
-            FACTION: {faction_data['archetype']} - {keywords}
-            MATERIALS: {materials}
-            STYLE: {faction_data['style']}, {style_desc}
-            BIOME: {biome_desc}
-            CAMERA: {camera_view}  
-            LIGHTING: {lighting}
-            
-            Key design elements:
-            - Built with {materials}
-            - Embodies {faction_data['archetype']} philosophy
-            - {vehicle_theme} aesthetic
-            - Racing through {biome_desc}
-            - Professional concept art quality
-            
-            Art style: High-quality digital concept art, detailed vehicle design,
-            clean background perfect for NFT collection, 4K resolution
-            """
+            enhanced_prompt = self.prompts.faction_prompt(
+                faction, vehicle_type, biome, style, variant, camera_view, lighting, vehicle_theme
+            )
         
-        try:
-            response = self.openai_client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt,
-                size="1024x1024",
-                quality="hd",
-                n=1,
+        # Generate traits and tags
+        traits = self._generate_vehicle_traits(faction, vehicle_type, style, custom_traits)
+        tags = self._generate_vehicle_tags(faction, vehicle_type, biome, honorary)
+        
+        return {
+            'image_url': None,
+            'image_id': image_id,
+            'faction': faction,
+            'vehicle_type': vehicle_type,
+            'variant': variant,
+            'traits': traits,
+            'biome': biome,
+            'style': style_desc,
+            'camera_view': camera_view,
+            'lighting': lighting,
+            'honorary': honorary,
+            'prompt': enhanced_prompt,
+            'tags': tags
+        }
+    
+    def generate_otherides_vehicle(self, faction=None, vehicle_type=None, biome=None, 
+                                 style=None, honorary=None, custom_traits=None, variant=None,
+                                 camera_view=None, lighting=None, vehicle_theme=None, version=None):
+        """Generate a vehicle matching real OTHERIDES structure"""
+        with self.telemetry.timer('prompt'):
+            vehicle_data = self.prepare_otherides_vehicle(
+                faction=faction,
+                vehicle_type=vehicle_type,
+                biome=biome,
+                style=style,
+                honorary=honorary,
+                custom_traits=custom_traits,
+                variant=variant,
+                camera_view=camera_view,
+                lighting=lighting,
+                vehicle_theme=vehicle_theme,
+                version=version
             )
+        
+        return self._generate_image(vehicle_data)
+    
+    def _generate_image(self, vehicle_data):
+        """Request the image for prepared vehicle data (or answer from the cache)"""
+        if self._use_cached_generation(vehicle_data):
+            return vehicle_data
+        
+        try:
+            with self.telemetry.timer('api', image_id=vehicle_data['image_id']):
+                response = self.rate_limiter.call(
+                    self.openai_client.images.generate,
+                    prompt=vehicle_data['prompt'],
+                    **IMAGE_GENERATION_PARAMS
+                )
             
-            image_url = response.data[0].url
+            self._record_generation(vehicle_data, response)
+            return vehicle_data
             
-            # Generate traits and tags
-            traits = self._generate_vehicle_traits(faction, vehicle_type, style, custom_traits)
-            tags = self._generate_vehicle_tags(faction, vehicle_type, biome, honorary)
+        except Exception as e:
+            print(f"Error generating OTHERIDES vehicle: {e}")
+            return None
+    
+    def plan_batch(self, specs, seed=None):
+        """Prepare every spec up front; with a seed the plan is reproducible
+        
+        A seeded plan must come out the same on every host and shard, so its
+        names only avoid each other, not what this database already holds;
+        enqueue_batch() skips any that clash with another batch. Named
+        variants keep their pinned (or first) version even when it is taken,
+        so re-queuing a batch matches its existing jobs and a dry run reports
+        the clash.
+        """
+        if seed is None:
+            return [self.prepare_otherides_vehicle(**spec, allow_taken=True) for spec in specs]
+        
+        from otherides_naming import ImageIdIndex
+        
+        self.rng.seed(seed)
+        names, self._names = self._names, ImageIdIndex()
+        try:
+            return [self.prepare_otherides_vehicle(**spec, allow_taken=True) for spec in specs]
+        finally:
+            self._names = names
+    
+    def plan_collection(self, total, counts=None, weights=None, seed=None):
+        """Stratified, duplicate-free specs for a large drop (see otherides_planner)
+        
+        counts/weights map a dimension ('faction', 'vehicle_type', 'biome',
+        'style', 'camera_view', 'lighting', 'pattern') to per-value targets.
+        Versions continue after any already in this database.
+        """
+        from otherides_planner import CollectionPlanner
+        return CollectionPlanner(seed=seed).plan(total, counts=counts, weights=weights, index=self.names)
+    
+    def enqueue_batch(self, batch_name, specs, subfolder=None, seed=None, shards=1, shard_index=0):
+        """Plan a collection run as durable jobs; returns how many jobs were added
+        
+        Each spec is prepared up front (prompt, variant, camera and lighting
+        are fixed at this point) so a resumed run requests exactly the same
+        images. With shards > 1 only the vehicles whose image_id hashes to
+        shard_index are queued; every shard must use the same specs and seed.
+        """
+        vehicles = select_shard(self.plan_batch(specs, seed), shards, shard_index)
+        
+        # Drop vehicles whose image_id another batch already owns before any
+        # money is spent on them
+        conflicts = set(self.names.conflicts([v['image_id'] for v in vehicles], batch_name))
+        if conflicts:
+            print(f"⚠️ Skipping {len(conflicts)} vehicles whose image_id is already used by another batch")
+            vehicles = [v for v in vehicles if v['image_id'] not in conflicts]
+        
+        added = JobQueue(self.db).enqueue(batch_name, vehicles, subfolder)
+        for vehicle in vehicles:
+            self.names.reserve(vehicle['image_id'], batch_name)
+        if added:
+            self.prefetch_collection_folders([subfolder or batch_name])
+        return added
+    
+    def resume(self, batch_name, workers=4, lease_seconds=300):
+        """Finish every unfinished job of a batch; returns the jobs saved by this call
+        
+        Safe to run from several processes at once - each job is leased to
+        one worker at a time.
+        """
+        queue = JobQueue(self.db, lease_seconds=lease_seconds)
+        self.prefetch_collection_folders(queue.folder_names(batch_name))
+        with self.telemetry.batch(batch_name):
+            saved = JobRunner(self, queue, workers).run(batch_name)
+        
+        progress = queue.progress(batch_name)
+        print(f"📋 {batch_name}: " + ", ".join(f"{count} {state}" for state, count in progress.items() if count))
+        return saved
+    
+    def _use_cached_generation(self, vehicle_data):
+        """Fill vehicle_data from the generation cache; True on a hit"""
+        if not self.cache:
+            return False
+        
+        vehicle_data['cache_key'] = self.cache.key_for(vehicle_data['prompt'], IMAGE_GENERATION_PARAMS)
+        cached = self.cache.lookup(vehicle_data['cache_key'])
+        if not cached:
+            return False
+        
+        vehicle_data['image_url'] = cached['image_url']
+        return True
+    
+    def _record_generation(self, vehicle_data, response):
+        """Take the image URL from an API response and cache the response metadata"""
+        image = response.data[0]
+        vehicle_data['image_url'] = image.url
+        
+        if self.cache:
+            self.cache.put_metadata(vehicle_data['cache_key'], {
+                'image_url': image.url,
+                'revised_prompt': getattr(image, 'revised_prompt', None),
+                'created': getattr(response, 'created', None),
+                'params': IMAGE_GENERATION_PARAMS,
+                'vehicle': vehicle_data
+            })
+    
+    async def _generate_otherides_vehicle_async(self, spec):
+        """Async counterpart of generate_otherides_vehicle for a single spec"""
+        with self.telemetry.timer('prompt'):
+            vehicle_data = self.prepare_otherides_vehicle(**spec)
+        
+        if self._use_cached_generation(vehicle_data):
+            return vehicle_data
+        
+        try:
+            with self.telemetry.timer('api', image_id=vehicle_data['image_id']):
+                response = await self.rate_limiter.call_async(
+                    self.async_openai_client.images.generate,
+                    prompt=vehicle_data['prompt'],
+                    **IMAGE_GENERATION_PARAMS
+                )
             
-            return {
-                'image_url': image_url,
-                'image_id': image_id,
-                'faction': faction,
-                'vehicle_type': vehicle_type,
-                'variant': variant,
-                'traits': traits,
-                'biome': biome,
-                'style': style_desc,
-                'camera_view': camera_view,
-                'lighting': lighting,
-                'honorary': honorary,
-                'prompt': enhanced_prompt,
-                'tags': tags
-            }
+            self._record_generation(vehicle_data, response)
+            return vehicle_data
             
         except Exception as e:
             print(f"Error generating OTHERIDES vehicle: {e}")
             return None
     
+    async def generate_batch(self, specs, concurrency=4):
+        """Generate vehicles with up to `concurrency` image requests in flight
+        
+        Each spec is a dict of generate_otherides_vehicle keyword arguments.
+        Yields (spec, vehicle_data) pairs in completion order; vehicle_data is
+        None when generation failed.
+        """
+        import asyncio
+        
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        
+        spec_iter = iter(specs)
+        in_flight = {}
+        
+        def fill():
+            for spec in itertools.islice(spec_iter, concurrency - len(in_flight)):
+                task = asyncio.ensure_future(self._generate_otherides_vehicle_async(spec))
+                in_flight[task] = spec
+        
+        fill()
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    spec = in_flight.pop(task)
+                    yield spec, task.result()
+                fill()
+        finally:
+            # Consumer stopped early - don't leave requests running
+            for task in in_flight:
+                task.cancel()
+    
+    def run_batch(self, specs, batch_name=None, concurrency=4):
+        """Generate (and optionally save) a batch of vehicles concurrently
+        
+        When batch_name is given each finished vehicle is saved on a worker
+        thread, so downloads and uploads overlap with the remaining
+        generations. Returns a list of (spec, result) pairs in completion order.
+        """
+        import asyncio
+        
+        async def run():
+            loop = asyncio.get_running_loop()
+            saves = []
+            results = []
+            
+            async for spec, vehicle_data in self.generate_batch(specs, concurrency):
+                if vehicle_data and batch_name:
+                    saves.append((spec, loop.run_in_executor(
+                        None, self._save_otherides_vehicle, vehicle_data, batch_name
+                    )))
+                else:
+                    results.append((spec, vehicle_data))
+            
+            for spec, save in saves:
+                try:
+                    results.append((spec, await save))
+                except Exception as e:
+                    print(f"Error saving OTHERIDES vehicle: {e}")
+                    results.append((spec, None))
+            return results
+        
+        with self.telemetry.batch(batch_name or "run_batch"):
+            try:
+                return asyncio.run(run())
+            finally:
+                # asyncio.run has shut the executor down; drop its threads' connections
+                self.db.close_finished()
+    
     def _generate_variant_name(self, faction, vehicle_type, style):
         """Generate variant names matching OTHERIDES style"""
-        style_modifiers = {
-            'rough_cool_tattoo': ['Tattoo', 'Ink', 'Rough', 'Street'],
-            'sleek_corporate': ['Elite', 'Prime', 'Executive', 'Corporate'],
-            'brutalist_industrial': ['Heavy', 'Industrial', 'Forge', 'Steel'],
-            'organic_bio': ['Bio', 'Living', 'Symbiont', 'Wild'],
-            'mystical_ritual': ['Ritual', 'Mystic', 'Sacred', 'Ancient'],
-            'noble_refined': ['Noble', 'Pristine', 'Royal', 'Refined']
-        }
-        
-        patterns = ['Leopard', 'Tiger', 'Dragon', 'Phoenix', 'Viper', 'Wolf', 'Eagle', 'Shark']
-        elements = ['Fire', 'Ice', 'Lightning', 'Shadow', 'Crystal', 'Steel', 'Bone', 'Gold']
+        modifier = self.rng.choice(STYLE_MODIFIERS.get(style, ['Custom']))
+        pattern = self.rng.choice(VARIANT_PATTERNS)
         
-        modifier = random.choice(style_modifiers.get(style, ['Custom']))
-        pattern = random.choice(patterns)
+        return variant_name(pattern, modifier, vehicle_type)
+    
+    def _generate_free_variant_name(self, faction, vehicle_type, style, attempts=16):
+        """Variant name no vehicle uses yet, if one turns up within a few draws
         
-        return f"{pattern} {modifier} {vehicle_type.title()}"
+        Otherwise the last draw is returned and gets the next free version.
+        """
+        for _ in range(attempts):
+            variant = self._generate_variant_name(faction, vehicle_type, style)
+            if not self.names.name_in_use(faction, variant):
+                break
+        return variant
     
-    def _generate_image_id(self, faction, variant):
+    def _generate_image_id(self, faction, variant, version=1):
         """Generate image ID matching naming convention"""
-        safe_faction = faction.lower().replace(' ', '_')
-        safe_variant = variant.lower().replace(' ', '_')
-        version = "v01"
-        
-        if faction == 'honorary':
-            return f"honorary_{safe_variant}_{version}"
-        else:
-            return f"{safe_faction}_{safe_variant}_{version}"
+        return image_id_for(faction, variant, version)
     
     def _generate_vehicle_traits(self, faction, vehicle_type, style, custom_traits):
         """Generate specific visual traits"""
@@ -441,11 +776,47 @@ class OtheridesAssetGenerator:
         """Save vehicle with OTHERIDES metadata structure"""
         
         # Download image
-        image_data = self._download_image(vehicle_data['image_url'])
+        image_data = self._fetch_vehicle_image(vehicle_data)
         if not image_data:
             return None
         
         # Create filename and metadata
+        file_name, file_path = self._vehicle_file_location(vehicle_data, subfolder)
+        
+        # Variants are encoded in the process pool while this thread hashes
+        pending_variants = self.postprocessor.submit(image_data, vehicle_data['image_id']) \
+            if self.postprocessor else None
+        image_hash = self._hash_image(image_data)
+        perceptual_hash = self._perceptual_hash(image_data)
+        image_variants = None
+        if pending_variants:
+            with self.telemetry.timer('postprocess', image_id=vehicle_data['image_id']):
+                image_variants = self.postprocessor.result(pending_variants)
+        
+        # Store locally / in S3 / on Drive (whichever are configured)
+        stored = self._store_vehicle_image(
+            self._upload_image_data(image_data, image_variants), file_name, file_path, batch_name, subfolder
+        )
+        drive_info = stored.get('drive')
+        file_path = stored_file_path(stored, file_path)
+        
+        # Save to database
+        vehicle_record = self._build_vehicle_record(
+            vehicle_data, batch_name, file_name, file_path, drive_info,
+            image_hash, perceptual_hash, image_variants, stored
+        )
+        vehicle_id = self._save_vehicle_record(vehicle_record)
+        
+        return {
+            'id': vehicle_id,
+            'metadata': self._build_vehicle_metadata(vehicle_data, file_name, file_path),
+            'drive_link': drive_info['webViewLink'] if drive_info else None,
+            'file_name': file_name,
+            'image_variants': image_variants
+        }
+    
+    def _vehicle_file_location(self, vehicle_data, subfolder=None):
+        """File name and moodboard path for a vehicle"""
         file_name = f"{vehicle_data['image_id']}.png"
         
         if subfolder:
@@ -454,13 +825,63 @@ class OtheridesAssetGenerator:
             faction_folder = vehicle_data['faction'].replace('_', ' ').title()
             file_path = f"/Otherides_Moodboards/{faction_folder}/"
         
-        # Upload to Drive (if available)
-        drive_info = None
-        if self.drive_service:
-            folder_id = self._get_or_create_collection_folder(batch_name, subfolder)
-            drive_info = self._upload_to_drive(image_data, file_name, folder_id)
+        return file_name, file_path
+    
+    def _hash_image(self, image_data):
+        """MD5 hash of downloaded image bytes"""
+        # Streamed downloads are hashed on the fly
+        digests = getattr(image_data, 'digests', None)
+        if digests and 'md5' in digests:
+            return digests['md5']
+        with self.telemetry.timer('hash'):
+            return hashlib.md5(read_image_bytes(image_data)).hexdigest()
+    
+    def _perceptual_hash(self, image_data):
+        """pHash of downloaded image bytes as hex (None if the image can't be decoded)"""
+        try:
+            with self.telemetry.timer('phash'):
+                return to_hex(phash(image_data))
+        except Exception as e:
+            print(f"Warning: could not compute perceptual hash: {e}")
+            return None
+    
+    def _post_process_image(self, image_data, image_id):
+        """Optimized and resized variants of an image (None if post-processing is off)"""
+        if not self.postprocessor:
+            return None
+        with self.telemetry.timer('postprocess', image_id=image_id):
+            return self.postprocessor.process(image_data, image_id)
+    
+    def _upload_image_data(self, image_data, image_variants):
+        """The optimized PNG when it was produced, otherwise the downloaded image"""
+        return open_variant(image_variants, 'full.png') or image_data
+    
+    def _store_vehicle_image(self, image_data, file_name, file_path, batch_name, subfolder=None):
+        """Write an image to every storage backend; returns its sha256, size and locations"""
+        return self.storage.put(image_data, file_name, file_path, batch_name, subfolder)
+    
+    def _upload_vehicle_image(self, image_data, file_name, batch_name, subfolder=None):
+        """Upload a vehicle image into its collection folder (if Drive is available)"""
+        if not self.drive_service:
+            return None
         
-        # Create metadata
+        with self.telemetry.timer('upload', file_name=file_name):
+            for attempt in range(2):
+                folder_id = self._get_or_create_collection_folder(batch_name, subfolder)
+                try:
+                    return self._create_drive_file(image_data, file_name, folder_id)
+                except Exception as e:
+                    if attempt == 0 and folder_id and is_not_found(e):
+                        # Folder was deleted in Drive behind our cache - look it up again
+                        self.folder_cache.invalidate(folder_id)
+                        image_data.seek(0)
+                        continue
+                    self.telemetry.error('upload', e, file_name=file_name)
+                    print(f"Error uploading to Drive: {e}")
+                    return None
+    
+    def _build_vehicle_metadata(self, vehicle_data, file_name, file_path):
+        """OTHERIDES metadata structure returned to callers"""
         metadata = {
             "image_id": vehicle_data['image_id'],
             "faction": vehicle_data['faction'].title(),
@@ -483,8 +904,12 @@ class OtheridesAssetGenerator:
         if vehicle_data.get('honorary'):
             metadata["honorary"] = vehicle_data['honorary']
         
-        # Save to database
-        vehicle_record = {
+        return metadata
+    
+    def _build_vehicle_record(self, vehicle_data, batch_name, file_name, file_path, drive_info,
+                              image_hash, phash=None, image_variants=None, storage=None):
+        """Database row for a saved vehicle"""
+        return {
             'image_id': vehicle_data['image_id'],
             'faction': vehicle_data['faction'],
             'vehicle_type': vehicle_data['vehicle_type'],
@@ -504,52 +929,66 @@ class OtheridesAssetGenerator:
             'drive_link': drive_info['webViewLink'] if drive_info else None,
             'collection_batch': batch_name,
             'created_at': datetime.now().isoformat(),
-            'image_hash': hashlib.md5(image_data.getvalue()).hexdigest()
+            'image_hash': image_hash,
+            'phash': phash,
+            'image_variants': json.dumps(image_variants) if image_variants else None,
+            # Drive is already in drive_id/drive_link
+            'storage': json.dumps({key: value for key, value in storage.items() if key != 'drive'}) if storage else None
         }
+    
+    def _fetch_vehicle_image(self, vehicle_data):
+        """Image bytes for a generated vehicle, from the cache when possible"""
+        cache_key = vehicle_data.get('cache_key')
+        if self.cache and cache_key and self.cache.has_image(cache_key):
+            return self.cache.open_image(cache_key)
         
-        vehicle_id = self._save_vehicle_record(vehicle_record)
-        
-        return {
-            'id': vehicle_id,
-            'metadata': metadata,
-            'drive_link': drive_info['webViewLink'] if drive_info else None,
-            'file_name': file_name
-        }
+        with self.telemetry.timer('download', image_id=vehicle_data['image_id']):
+            image_data = self._download_image(vehicle_data['image_url'])
+        if image_data and self.cache and cache_key:
+            self.cache.put_image(cache_key, image_data)
+        return image_data
     
     def _download_image(self, image_url):
         """Download image from URL"""
         try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            return io.BytesIO(response.content)
+            return self.downloader.download(image_url)
         except Exception as e:
+            self.telemetry.error('download', e)
             print(f"Error downloading image: {e}")
             return None
     
-    def _upload_to_drive(self, image_data, filename, folder_id):
-        """Upload image to Google Drive"""
-        if not self.drive_service:
-            return None
-            
+    @property
+    def upload_manager(self):
+        """Drive upload manager (parallel resumable uploads, batching, backoff)"""
+        if self._upload_manager is None and self.drive_service:
+            self._upload_manager = DriveUploadManager(
+                self.drive_service,
+                credentials=self._drive_credentials,
+                api_endpoint=self._drive_api_endpoint
+            )
+        return self._upload_manager
+    
+    def _create_drive_file(self, image_data, filename, folder_id):
+        """Create the Drive file for an image (raises on API errors)"""
+        return self.upload_manager.upload(image_data, filename, folder_id)
+    
+    def prefetch_collection_folders(self, folder_names):
+        """Resolve several collection folders with batched Drive requests
+        
+        Called before queued jobs run, so their uploads find every batch or
+        subfolder in the folder cache instead of asking Drive one by one.
+        """
+        if not folder_names or not self.drive_service:
+            return {}
+        
         try:
-            file_metadata = {
-                'name': filename,
-                'parents': [folder_id] if folder_id else []
-            }
-            
-            media = MediaIoBaseUpload(image_data, mimetype='image/png', resumable=True)
-            
-            file = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,webViewLink,webContentLink'
-            ).execute()
-            
-            return file
-            
+            return self.folder_cache.resolve_many(
+                ("OTHERIDES_Collection",), folder_names, self.upload_manager.find_or_create_folders
+            )
         except Exception as e:
-            print(f"Error uploading to Drive: {e}")
-            return None
+            # Uploads fall back to resolving their folder one at a time
+            print(f"Error prefetching collection folders: {e}")
+            return {}
     
     def _get_or_create_collection_folder(self, batch_name, subfolder=None):
         """Create organized folder structure"""
@@ -557,14 +996,8 @@ class OtheridesAssetGenerator:
             return None
             
         try:
-            main_folder_id = self._get_or_create_folder("OTHERIDES_Collection")
-            
-            if subfolder:
-                subfolder_id = self._get_or_create_folder(subfolder, main_folder_id)
-                return subfolder_id
-            else:
-                batch_folder_id = self._get_or_create_folder(batch_name, main_folder_id)
-                return batch_folder_id
+            # Resolved through the folder cache - Drive is only asked once per folder
+            return self.folder_cache.resolve("OTHERIDES_Collection", subfolder or batch_name)
             
         except Exception as e:
             print(f"Error creating folder structure: {e}")
@@ -580,10 +1013,10 @@ class OtheridesAssetGenerator:
             if parent_id:
                 search_query += f" and '{parent_id}' in parents"
             
-            results = self.drive_service.files().list(
+            results = self.upload_manager.execute(self.drive_service.files().list(
                 q=search_query,
                 fields="files(id, name)"
-            ).execute()
+            ))
             
             folders = results.get('files', [])
             if folders:
@@ -600,10 +1033,10 @@ class OtheridesAssetGenerator:
             if parent_id:
                 file_metadata['parents'] = [parent_id]
             
-            folder = self.drive_service.files().create(
+            folder = self.upload_manager.execute(self.drive_service.files().create(
                 body=file_metadata,
                 fields='id'
-            ).execute()
+            ))
             
             return folder.get('id')
             
@@ -612,81 +1045,145 @@ class OtheridesAssetGenerator:
             return None
     
     def _save_vehicle_record(self, record):
-        """Save vehicle metadata to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        columns = ', '.join(record.keys())
-        placeholders = ', '.join(['?' for _ in record])
+        """Save vehicle metadata to database
         
-        cursor.execute(
-            f"INSERT INTO otherides_vehicles ({columns}) VALUES ({placeholders})",
-            list(record.values())
-        )
-        
-        vehicle_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        Inside a generator.batch() block the row is queued for a single
+        batched insert and None is returned instead of the row id.
+        """
+        if record.get('phash'):
+            with self.telemetry.timer('dedupe'):
+                self._flag_near_duplicates(record['image_id'], record['phash'])
         
-        return vehicle_id
+        with self.telemetry.timer('db_insert', image_id=record['image_id']):
+            if self.db.batching:
+                self.db.queue_vehicle(record)
+                return None
+            return self.db.insert_vehicle(record)
+    
+    def _flag_near_duplicates(self, image_id, phash_hex):
+        """Warn about saved vehicles that look almost the same, then index this one"""
+        value = int(phash_hex, 16)
+        matches = [
+            (distance, other) for distance, other in self.phash_index.search(value, self.near_duplicate_distance)
+            if other != image_id
+        ]
+        if matches:
+            distance, other = matches[0]
+            more = f" (+{len(matches) - 1} more)" if len(matches) > 1 else ""
+            print(f"⚠️ {image_id} looks like a near-duplicate of {other} (distance {distance}){more}")
+        self.phash_index.add(value, image_id)
+        return matches
+    
+    def batch(self):
+        """Context manager grouping vehicle inserts into batched transactions"""
+        return self.db.batch()
 
 def main():
     """Example usage"""
-    generator = OtheridesAssetGenerator()
+    import argparse
     
-    print("🏁 OTHERIDES Asset Generator")
-    print("="*50)
+    parser = argparse.ArgumentParser(description="Generate the OTHERIDES example collection")
+    parser.add_argument('--db', default="otherides_assets.db", help="database path")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split the run across this many processes/hosts")
+    parser.add_argument('--shard-index', type=int, default=0, help="which shard this process runs (0-based)")
+    parser.add_argument('--seed', default=None,
+                        help="planning seed; shards must share it (defaults to the batch name when sharded)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="print the exact plan's collisions, skew and projected cost without calling any API")
+    args = parser.parse_args()
     
-    # Create an Honorary vehicle
-    print("Creating Honorary Vehicle...")
-    garga_vehicle = generator.create_honorary_vehicle(
-        honoree_name="Garga",
-        honoree_org="Yuga Labs",
-        custom_style="rough_cool_tattoo",
-        custom_traits=["leopard_skin_pattern", "tattoo_body_art", "grill_smirk", "dual_headlight_eyes"]
-    )
-    
-    if garga_vehicle:
-        print(f"✅ Created Honorary: {garga_vehicle['metadata']['variant']}")
-        print(f"📁 File: {garga_vehicle['file_name']}")
-        if garga_vehicle['drive_link']:
-            print(f"🔗 Drive: {garga_vehicle['drive_link']}")
+    if not 0 <= args.shard_index < max(args.shards, 1):
+        parser.error(f"--shard-index must be between 0 and {args.shards - 1}")
     
-    # Create faction vehicles with real Otherside biomes
-    print("\nCreating Faction Vehicles...")
-    faction_vehicles = []
+    batch_name = "Genesis_Alpha_Collection"
+    seed = args.seed if args.seed is not None or args.shards <= 1 else batch_name
+    generator = OtheridesAssetGenerator(db_path=shard_db_path(args.db, args.shards, args.shard_index))
     
+    print("🏁 OTHERIDES Asset Generator")
+    print("="*50)
+    if args.shards > 1:
+        print(f"🧩 Shard {args.shard_index + 1} of {args.shards} → {generator.db_path}")
+    
+    # Faction vehicles with real Otherside biomes
     biome_examples = ['molten', 'crystal', 'shadow', 'jungle', 'chaos']
+    specs = []
     
     for i, faction in enumerate(['amalfi', 'raven_coats', 'scion', 'kerr_org', 'apostates']):
         if faction not in generator.racing_factions:
             print(f"⚠️ Skipping {faction} - not found in faction data")
             continue
-            
-        vehicle_data = generator.generate_otherides_vehicle(
-            faction=faction,
-            biome=biome_examples[i % len(biome_examples)],
-            style='noble_refined' if faction == 'amalfi' 
-                  else 'mystical_ritual' if faction == 'apostates'
-                  else 'sleek_corporate' if faction == 'scion'
-                  else 'organic_bio' if faction == 'kerr_org'
-                  else 'brutalist_industrial'
+        
+        specs.append({
+            'faction': faction,
+            'biome': biome_examples[i % len(biome_examples)],
+            'style': 'noble_refined' if faction == 'amalfi' 
+                     else 'mystical_ritual' if faction == 'apostates'
+                     else 'sleek_corporate' if faction == 'scion'
+                     else 'organic_bio' if faction == 'kerr_org'
+                     else 'brutalist_industrial'
+        })
+    
+    if args.dry_run:
+        from otherides_dryrun import dry_run, print_report
+        
+        honorary_spec = {
+            'faction': 'honorary', 'vehicle_type': 'buggy', 'biome': 'miami_swamp', 'style': 'rough_cool_tattoo',
+            'honorary': "Garga (Yuga Labs)", 'variant': "Garga Tribute Vehicle",
+            'custom_traits': ["leopard_skin_pattern", "tattoo_body_art", "grill_smirk", "dual_headlight_eyes"]
+        }
+        _, report = dry_run(generator, [honorary_spec] + specs, batch_name, seed)
+        print_report(report)
+        return
+    
+    # Create an Honorary vehicle (in whichever shard owns its image_id)
+    garga_vehicle = None
+    if in_shard(generator._generate_image_id('honorary', "Garga Tribute Vehicle"), args.shards, args.shard_index):
+        print("Creating Honorary Vehicle...")
+        garga_vehicle = generator.create_honorary_vehicle(
+            honoree_name="Garga",
+            honoree_org="Yuga Labs",
+            custom_style="rough_cool_tattoo",
+            custom_traits=["leopard_skin_pattern", "tattoo_body_art", "grill_smirk", "dual_headlight_eyes"]
         )
         
-        if vehicle_data:
-            saved_vehicle = generator._save_otherides_vehicle(
-                vehicle_data,
-                "Genesis_Alpha_Collection"
-            )
-            if saved_vehicle:
-                faction_vehicles.append(saved_vehicle)
-                biome_name = biome_examples[i % len(biome_examples)].title()
-                print(f"✅ {faction.title()}: {saved_vehicle['metadata']['variant']} in {biome_name}")
+        if garga_vehicle:
+            print(f"✅ Created Honorary: {garga_vehicle['metadata']['variant']}")
+            print(f"📁 File: {garga_vehicle['file_name']}")
+            if garga_vehicle['drive_link']:
+                print(f"🔗 Drive: {garga_vehicle['drive_link']}")
+    
+    # Create faction vehicles with real Otherside biomes
+    print("\nCreating Faction Vehicles...")
+    faction_vehicles = []
+    
+    # Queue the run as durable jobs; if this process dies, calling
+    # generator.resume("Genesis_Alpha_Collection") picks up where it stopped
+    generator.enqueue_batch(batch_name, specs, seed=seed, shards=args.shards, shard_index=args.shard_index)
+    
+    for job in generator.resume(batch_name, workers=len(specs) or 1):
+        vehicle_data = job['vehicle_data']
+        faction_vehicles.append(job)
+        biome_name = vehicle_data['biome'].title()
+        print(f"✅ {vehicle_data['faction'].title()}: {vehicle_data['variant']} in {biome_name}")
     
     print(f"\n🎉 Generated {len(faction_vehicles) + (1 if garga_vehicle else 0)} vehicles")
     print("📊 All vehicles saved with OTHERIDES metadata structure")
     print("🌍 Using real Otherside metaverse biomes!")
     print("🔗 Ready for 3D pipeline integration!")
+    
+    if generator.cache:
+        generator.cache.report()
+    generator.rate_limiter.report()
+    if generator.postprocessor:
+        generator.postprocessor.report()
+    generator.names.report()
+    generator.telemetry.report()
+    generator.telemetry.close()
+    
+    if args.shards > 1:
+        shard_files = ' '.join(shard_db_path(args.db, args.shards, i) for i in range(args.shards))
+        print(f"🧩 When every shard has finished: python otherides_shard.py merge --db {args.db} {shard_files}")
 
 if __name__ == "__main__":
     main()
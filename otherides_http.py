@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP downloads for generated OTHERIDES images
+
+One keep-alive session is shared by every download so TLS handshakes are
+reused across a batch. Bodies are streamed straight into a buffer sized from
+Content-Length (or a spool file for very large bodies) while the image
+digests are computed chunk by chunk, so the bytes are never copied again.
+"""
+
+import hashlib
+import io
+import random
+import tempfile
+import threading
+import time
+
+from otherides_ratelimit import parse_retry_after
+
+# Statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class ImageBuffer(io.BytesIO):
+    """In-memory image body with the digests computed while it streamed in"""
+    digests = None
+
+
+class SpooledImageBuffer(tempfile.SpooledTemporaryFile):
+    """Disk-backed image body for responses above the spool threshold"""
+    digests = None
+
+
+class ImageDownloader:
+    """Shared keep-alive session with timeouts and jittered retry"""
+
+    def __init__(self, pool_size=32, timeout=(5, 60), max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, chunk_size=64 * 1024,
+                 spool_threshold=16 * 1024 * 1024, hash_names=('md5',)):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.chunk_size = chunk_size
+        self.spool_threshold = spool_threshold
+        self.hash_names = tuple(hash_names)
+
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Keep-alive session shared by all downloads, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    # Retries are handled in download() so they also cover
+                    # failures part-way through a streamed body
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        """Close pooled connections"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, honouring Retry-After (seconds or HTTP-date) when given"""
+        seconds = parse_retry_after(retry_after)
+        if seconds is not None:
+            return min(seconds, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _new_buffer(self, content_length):
+        """Pre-sized in-memory buffer, or a spool file for large/unknown bodies"""
+        if content_length is not None and content_length <= self.spool_threshold:
+            buffer = ImageBuffer()
+            if content_length:
+                # Reserve the full body up front so chunk writes never reallocate
+                buffer.seek(content_length - 1)
+                buffer.write(b'\0')
+                buffer.seek(0)
+            return buffer
+        return SpooledImageBuffer(max_size=self.spool_threshold)
+
+    def _stream_body(self, response):
+        """Stream a response body into a buffer, hashing as it goes"""
+        length = response.headers.get('Content-Length')
+        content_length = int(length) if length and length.isdigit() else None
+
+        buffer = self._new_buffer(content_length)
+        hashers = [hashlib.new(name) for name in self.hash_names]
+
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            buffer.write(chunk)
+            for hasher in hashers:
+                hasher.update(chunk)
+
+        # Drop any reserved space the body didn't fill
+        buffer.truncate()
+        buffer.seek(0)
+        buffer.digests = {name: hasher.hexdigest() for name, hasher in zip(self.hash_names, hashers)}
+        return buffer
+
+    def download(self, url):
+        """Download url into a buffer with .digests set; raises after the final retry"""
+        import requests
+
+        attempt = 0
+        while True:
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    if response.status_code in RETRYABLE_STATUSES and attempt < self.max_retries:
+                        delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                    else:
+                        response.raise_for_status()
+                        return self._stream_body(response)
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+
+            attempt += 1
+            time.sleep(delay)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Durable job queue for resumable OTHERIDES collection runs
+
+Every planned vehicle becomes a row in generation_jobs that records how far
+it got: pending → generated → downloaded → uploaded → saved. Workers lease
+jobs for a limited time, so several processes can drain the same batch and
+a crashed worker's jobs become available again once its lease expires.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from otherides_storage import stored_file_path
+
+JOB_STATES = ('pending', 'generated', 'downloaded', 'uploaded', 'saved', 'failed')
+FINISHED_STATES = ('saved', 'failed')
+# Columns holding JSON-encoded stage output
+JSON_FIELDS = ('vehicle_data', 'drive_info', 'image_variants', 'storage')
+
+
+class JobQueue:
+    """SQLite-backed queue of planned vehicles with leased, staged jobs"""
+
+    def __init__(self, db, lease_seconds=300, max_attempts=5, worker_id=None):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    def enqueue(self, batch_name, vehicles, subfolder=None):
+        """Record prepared vehicles as pending jobs; returns how many were new
+
+        Vehicles already queued for the batch (same image_id) are skipped, so
+        enqueuing the same plan twice is harmless.
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (batch_name, subfolder, vehicle['image_id'], json.dumps(vehicle), now, now)
+            for vehicle in vehicles
+        ]
+
+        conn = self.db.connection
+        with conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO generation_jobs
+                    (batch_name, subfolder, image_id, vehicle_data, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            return conn.total_changes - before
+
+    def lease(self, batch_name, limit=1):
+        """Claim up to limit unfinished jobs whose lease is free or expired"""
+        now = time.time()
+        owner = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+
+        conn = self.db.connection
+        if conn.in_transaction:
+            conn.commit()
+        with conn:
+            # BEGIN IMMEDIATE so no other worker can lease between the
+            # candidate SELECT and the UPDATE
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [row[0] for row in conn.execute(f'''
+                SELECT id FROM generation_jobs
+                WHERE batch_name = ?
+                  AND state NOT IN ({', '.join('?' for _ in FINISHED_STATES)})
+                  AND (lease_expires IS NULL OR lease_expires < ?)
+                ORDER BY id
+                LIMIT ?
+            ''', (batch_name, *FINISHED_STATES, now, limit))]
+            if not ids:
+                return []
+
+            # Fetch by primary key: lease_owner has no index, and scanning
+            # the whole table for it on every lease made draining quadratic
+            placeholders = ', '.join('?' for _ in ids)
+            conn.execute(f'''
+                UPDATE generation_jobs
+                SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id IN ({placeholders})
+            ''', (owner, now + self.lease_seconds, datetime.now().isoformat(), *ids))
+
+            rows = conn.execute(
+                f"SELECT * FROM generation_jobs WHERE id IN ({placeholders}) AND lease_owner = ? ORDER BY id",
+                (*ids, owner)
+            )
+            columns = [description[0] for description in rows.description]
+            return [self._decode(dict(zip(columns, row))) for row in rows.fetchall()]
+
+    def _decode(self, job):
+        job['vehicle_data'] = json.loads(job['vehicle_data'])
+        for key in ('drive_info', 'image_variants', 'storage'):
+            if job.get(key):
+                job[key] = json.loads(job[key])
+        return job
+
+    def advance(self, job, state, **fields):
+        """Move a leased job to state, saving any stage output and renewing the lease
+
+        Returns False if the lease was lost (expired and taken by another
+        worker), in which case the caller should drop the job.
+        """
+        if state not in JOB_STATES:
+            raise ValueError(f"Unknown job state: {state}")
+
+        updates = {'state': state, 'updated_at': datetime.now().isoformat()}
+        for key, value in fields.items():
+            updates[key] = json.dumps(value) if key in JSON_FIELDS and value is not None else value
+
+        if state in FINISHED_STATES:
+            updates['lease_owner'] = None
+            updates['lease_expires'] = None
+        else:
+            updates['lease_expires'] = time.time() + self.lease_seconds
+
+        assignments = ', '.join(f"{key} = ?" for key in updates)
+        conn = self.db.connection
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE generation_jobs SET {assignments} WHERE id = ? AND lease_owner = ?",
+                (*updates.values(), job['id'], job['lease_owner'])
+            )
+
+        if cursor.rowcount:
+            job.update(fields)
+            job['state'] = state
+            if state in FINISHED_STATES:
+                job['lease_owner'] = None
+        return cursor.rowcount == 1
+
+    def fail(self, job, error, reset_to=None):
+        """Release a job after an error, optionally rewinding its state
+
+        Jobs that have used up max_attempts are marked failed.
+        """
+        state = reset_to or job['state']
+        if job['attempts'] >= self.max_attempts:
+            state = 'failed'
+
+        conn = self.db.connection
+        with conn:
+            conn.execute('''
+                UPDATE generation_jobs
+                SET state = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ?
+            ''', (state, str(error), datetime.now().isoformat(), job['id'], job['lease_owner']))
+
+    def retry_failed(self, batch_name):
+        """Give failed jobs in a batch a fresh set of attempts"""
+        conn = self.db.connection
+        with conn:
+            return conn.execute('''
+                UPDATE generation_jobs SET state = 'pending', attempts = 0, last_error = NULL
+                WHERE batch_name = ? AND state = 'failed'
+            ''', (batch_name,)).rowcount
+
+    def folder_names(self, batch_name):
+        """Collection folders (subfolder, else the batch name) of a batch's unfinished jobs"""
+        rows = self.db.connection.execute(f'''
+            SELECT DISTINCT COALESCE(subfolder, batch_name) FROM generation_jobs
+            WHERE batch_name = ? AND state NOT IN ({', '.join('?' for _ in FINISHED_STATES)})
+        ''', (batch_name, *FINISHED_STATES)).fetchall()
+        return [row[0] for row in rows]
+
+    def progress(self, batch_name):
+        """Job counts per state for a batch"""
+        rows = self.db.connection.execute(
+            "SELECT state, COUNT(*) FROM generation_jobs WHERE batch_name = ? GROUP BY state",
+            (batch_name,)
+        ).fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update(dict(rows))
+        return counts
+
+
+class JobRunner:
+    """Drains leased jobs through the remaining stages for each vehicle"""
+
+    def __init__(self, generator, queue, workers=4):
+        self.generator = generator
+        self.queue = queue
+        self.workers = workers
+
+    def run(self, batch_name):
+        """Process every unfinished job in the batch; returns the jobs this run saved"""
+        saved = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    jobs = self.queue.lease(batch_name, limit=1)
+                    if not jobs:
+                        return
+                    job = self.process(jobs[0])
+                    if job and job['state'] == 'saved':
+                        with lock:
+                            saved.append(job)
+            finally:
+                self.queue.db.release()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return saved
+
+    def process(self, job):
+        """Advance one leased job from its current state to saved"""
+        generator = self.generator
+        vehicle_data = job['vehicle_data']
+        image_data = None
+
+        try:
+            if job['state'] == 'pending':
+                if not generator._generate_image(vehicle_data):
+                    self.queue.fail(job, "generation failed")
+                    return None
+                if not self.queue.advance(job, 'generated', vehicle_data=vehicle_data):
+                    return None
+
+            if job['state'] in ('generated', 'downloaded'):
+                # Images survive restarts through the generation cache; without
+                # it they are downloaded again
+                image_data = generator._fetch_vehicle_image(vehicle_data)
+                if not image_data:
+                    # The image URL has most likely expired - generate again
+                    self.queue.fail(job, "download failed", reset_to='pending')
+                    return None
+                if job['state'] == 'generated':
+                    image_variants = generator._post_process_image(image_data, vehicle_data['image_id'])
+                    if not self.queue.advance(job, 'downloaded', image_hash=generator._hash_image(image_data),
+                                              phash=generator._perceptual_hash(image_data),
+                                              image_variants=image_variants):
+                        return None
+
+            file_name, file_path = generator._vehicle_file_location(vehicle_data, job['subfolder'])
+
+            if job['state'] == 'downloaded':
+                upload_data = generator._upload_image_data(image_data, job.get('image_variants'))
+                stored = generator._store_vehicle_image(upload_data, file_name, file_path,
+                                                        job['batch_name'], job['subfolder'])
+                drive_info = stored.pop('drive', None)
+                if not self.queue.advance(job, 'uploaded', drive_info=drive_info, storage=stored):
+                    return None
+
+            if job['state'] == 'uploaded':
+                vehicle_id = self._existing_vehicle_id(vehicle_data['image_id'], job['batch_name'])
+                if vehicle_id is None:
+                    record = generator._build_vehicle_record(
+                        vehicle_data, job['batch_name'], file_name, stored_file_path(job.get('storage'), file_path),
+                        job.get('drive_info'), job['image_hash'], job.get('phash'), job.get('image_variants'),
+                        job.get('storage')
+                    )
+                    vehicle_id = generator._save_vehicle_record(record)
+                self.queue.advance(job, 'saved', vehicle_id=vehicle_id)
+
+            return job
+
+        except Exception as e:
+            print(f"Error processing job {job['id']} ({vehicle_data.get('image_id')}): {e}")
+            self.queue.fail(job, e)
+            return None
+
+    def _existing_vehicle_id(self, image_id, batch_name):
+        """Row id if a previous run saved the vehicle but died before marking the job"""
+        row = self.generator.db.connection.execute(
+            "SELECT id FROM otherides_vehicles WHERE image_id = ? AND collection_batch = ?",
+            (image_id, batch_name)
+        ).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Collision-free image_id allocation for OTHERIDES vehicles
+
+ImageIdIndex holds every image_id already used by a saved vehicle or a
+queued job, loaded with a single query. Variant naming asks it for names
+nobody has used yet and for the next free version of a name, so a big batch
+never pays for an image whose row would then fail the UNIQUE constraint.
+"""
+
+import re
+import threading
+from collections import defaultdict
+
+from otherides_generator import (
+    STYLE_MODIFIERS, VARIANT_PATTERNS, VEHICLE_TYPES, image_id_for, load_faction_data, variant_name
+)
+
+VERSIONED_ID = re.compile(r'^(?P<base>.+)_v(?P<version>\d+)$')
+
+
+def base_name(faction, variant):
+    """image_id without its version suffix"""
+    return VERSIONED_ID.match(image_id_for(faction, variant)).group('base')
+
+
+class ImageIdIndex:
+    """In-memory set of image_ids in use, with the highest version per name"""
+
+    def __init__(self, db=None):
+        self.taken = {}          # image_id -> batch it belongs to (None: reserved this run)
+        self._versions = {}      # base name -> highest version in use
+        self._lock = threading.Lock()
+        self._name_space = None
+        if db is not None:
+            self.load(db)
+
+    def load(self, db):
+        """Add every image_id from otherides_vehicles and generation_jobs (one query)"""
+        rows = db.connection.execute('''
+            SELECT image_id, collection_batch FROM otherides_vehicles WHERE image_id IS NOT NULL
+            UNION ALL
+            SELECT image_id, batch_name FROM generation_jobs
+        ''').fetchall()
+        with self._lock:
+            for image_id, batch_name in rows:
+                self._add(image_id, batch_name)
+        return len(rows)
+
+    def _add(self, image_id, batch_name=None):
+        self.taken.setdefault(image_id, batch_name)
+        match = VERSIONED_ID.match(image_id)
+        if match:
+            base, version = match.group('base'), int(match.group('version'))
+            if version > self._versions.get(base, 0):
+                self._versions[base] = version
+
+    def __contains__(self, image_id):
+        return image_id in self.taken
+
+    def __len__(self):
+        return len(self.taken)
+
+    def name_in_use(self, faction, variant):
+        """True if any version of this faction/variant name exists"""
+        return base_name(faction, variant) in self._versions
+
+    def highest_version(self, faction, variant):
+        """Highest version of a name in use (0 if unused)"""
+        return self._versions.get(base_name(faction, variant), 0)
+
+    def claim(self, faction, variant, version=1):
+        """Reserve and return the first free version >= version for a name"""
+        with self._lock:
+            if image_id_for(faction, variant, version) in self.taken:
+                version = max(version, self._versions.get(base_name(faction, variant), 0) + 1)
+            self._add(image_id_for(faction, variant, version))
+            return version
+
+    def reserve(self, image_id, batch_name=None):
+        """Record an image_id chosen elsewhere (e.g. a pinned spec)"""
+        with self._lock:
+            self._add(image_id, batch_name)
+
+    def conflicts(self, image_ids, batch_name):
+        """The image_ids already used by a different batch"""
+        return [
+            image_id for image_id in image_ids
+            if self.taken.get(image_id, batch_name) not in (batch_name, None)
+        ]
+
+    def _names_by_group(self):
+        """(faction, vehicle_type) for every generatable base name"""
+        if self._name_space is None:
+            modifiers = sorted({word for words in STYLE_MODIFIERS.values() for word in words})
+            self._name_space = {
+                base_name(faction, variant_name(pattern, modifier, vehicle_type)): (faction, vehicle_type)
+                for faction in load_faction_data() if faction != 'honorary'
+                for vehicle_type in VEHICLE_TYPES
+                for pattern in VARIANT_PATTERNS
+                for modifier in modifiers
+            }
+        return self._name_space
+
+    def free_names(self):
+        """{(faction, vehicle_type): (free, total)} counting names with no version in use"""
+        name_space = self._names_by_group()
+        totals = defaultdict(int)
+        used = defaultdict(int)
+        for group in name_space.values():
+            totals[group] += 1
+        with self._lock:
+            for base in self._versions:
+                group = name_space.get(base)
+                if group:
+                    used[group] += 1
+        return {group: (total - used[group], total) for group, total in totals.items()}
+
+    def report(self):
+        """Print how many variant names are still unused per faction and type"""
+        by_faction = defaultdict(dict)
+        for (faction, vehicle_type), counts in self.free_names().items():
+            by_faction[faction][vehicle_type] = counts
+
+        print(f"🏷️  Image IDs in use: {len(self)}; unused variant names per faction/type:")
+        for faction, types in sorted(by_faction.items()):
+            free = sum(f for f, _ in types.values())
+            total = sum(t for _, t in types.values())
+            detail = ', '.join(f"{vehicle_type} {f}" for vehicle_type, (f, _) in sorted(types.items()))
+            print(f"   {faction:<15} {free:>5}/{total}  ({detail})")
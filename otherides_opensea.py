@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+ERC-721 / OpenSea metadata for OTHERIDES tokens
+
+build_metadata() gives every vehicle without a token_id the next one (in
+creation order), renders its ERC-721 metadata with faction, vehicle type,
+biome, style and trait attributes, and writes one JSON file per token plus
+a manifest of their SHA-256 hashes. A rebuild compares each token's hash
+with the previous manifest and only rewrites tokens whose metadata changed,
+so re-running a 10k-token reveal after a small fix touches a few files.
+
+Usage: python otherides_opensea.py [--db <path>] [--out <dir>] [--image-base-uri ipfs://<cid>/]
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from otherides_generator import load_faction_data
+from otherides_postprocess import write_atomic
+from otherides_schema import decode_json_list, migrate
+
+MANIFEST_NAME = "manifest.json"
+
+# (trait_type, column) for the attributes every token has
+ATTRIBUTE_COLUMNS = (
+    ('Faction', 'faction'),
+    ('Vehicle Type', 'vehicle_type'),
+    ('Biome', 'biome'),
+    ('Style', 'style'),
+)
+
+TOKEN_COLUMNS = ('token_id', 'image_id', 'faction', 'vehicle_type', 'variant', 'traits', 'biome',
+                 'style', 'honorary', 'file_name', 'drive_link')
+
+
+def _label(value):
+    return str(value).replace('_', ' ').title()
+
+
+def assign_token_ids(conn, batch=None, start=1):
+    """Give vehicles without a token_id the next free ids, oldest first; returns how many"""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        highest = conn.execute("SELECT MAX(token_id) FROM otherides_vehicles").fetchone()[0]
+        next_id = max(start, (highest or 0) + 1)
+        query = "SELECT id FROM otherides_vehicles WHERE token_id IS NULL"
+        params = []
+        if batch:
+            query += " AND collection_batch = ?"
+            params.append(batch)
+        vehicle_ids = [row[0] for row in conn.execute(query + " ORDER BY id", params)]
+        conn.executemany(
+            "UPDATE otherides_vehicles SET token_id = ? WHERE id = ?",
+            [(next_id + offset, vehicle_id) for offset, vehicle_id in enumerate(vehicle_ids)]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(vehicle_ids)
+
+
+def render_token(vehicle, image_base_uri=None):
+    """ERC-721 metadata dict for one vehicle row"""
+    faction = load_faction_data().get(vehicle['faction'], {})
+    if image_base_uri:
+        image = f"{image_base_uri}{vehicle['file_name']}"
+    else:
+        image = vehicle['drive_link'] or vehicle['file_name']
+
+    attributes = [
+        {'trait_type': trait_type, 'value': _label(vehicle[column])}
+        for trait_type, column in ATTRIBUTE_COLUMNS if vehicle[column]
+    ]
+    if vehicle['honorary']:
+        attributes.append({'trait_type': 'Honorary', 'value': vehicle['honorary']})
+    attributes.extend({'trait_type': 'Trait', 'value': _label(trait)} for trait in decode_json_list(vehicle['traits']))
+
+    description = f"{vehicle['variant']}, a {_label(vehicle['vehicle_type']).lower()} of the {_label(vehicle['faction'])}"
+    if faction.get('archetype'):
+        description += f" ({faction['archetype']})"
+    description += f", built for the {_label(vehicle['biome'])} biome of the Otherside."
+
+    return {
+        'name': f"{vehicle['variant']} #{vehicle['token_id']}",
+        'description': description,
+        'image': image,
+        'attributes': attributes,
+    }
+
+
+def _write_tokens(vehicles, output_dir, extension, previous, image_base_uri, force):
+    """Render, hash and (if changed) write a chunk of tokens; returns manifest entries"""
+    entries = []
+    for vehicle in vehicles:
+        data = json.dumps(render_token(vehicle, image_base_uri), indent=2).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = output_dir / f"{vehicle['token_id']}{extension}"
+
+        old = previous.get(str(vehicle['token_id']))
+        unchanged = not force and old and old['sha256'] == digest and path.exists() \
+            and path.stat().st_size == len(data)
+        if not unchanged:
+            write_atomic(path, data)
+
+        entries.append((vehicle['token_id'], {
+            'image_id': vehicle['image_id'],
+            'file': path.name,
+            'sha256': digest,
+            'bytes': len(data),
+        }, not unchanged))
+    return entries
+
+
+def _load_manifest(output_dir):
+    try:
+        with open(output_dir / MANIFEST_NAME, 'r') as f:
+            return json.load(f).get('tokens', {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def build_metadata(conn, output_dir="opensea_metadata", image_base_uri=None, batch=None,
+                   workers=8, chunk_size=500, extension="", force=False):
+    """Assign token_ids, write changed per-token JSON files and the manifest
+
+    Tokens are rendered in chunks on a thread pool (file writes release the
+    GIL). Built vehicles are marked opensea_ready. Returns counts and timing.
+    """
+    started = time.perf_counter()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    assigned = assign_token_ids(conn, batch)
+    previous = _load_manifest(output_dir)
+
+    query = f"SELECT {', '.join(TOKEN_COLUMNS)} FROM otherides_vehicles WHERE token_id IS NOT NULL"
+    params = []
+    if batch:
+        query += " AND collection_batch = ?"
+        params.append(batch)
+    cursor = conn.execute(query + " ORDER BY token_id", params)
+
+    entries = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            vehicles = [dict(zip(TOKEN_COLUMNS, row)) for row in rows]
+            pending.append(executor.submit(
+                _write_tokens, vehicles, output_dir, extension, previous, image_base_uri, force
+            ))
+            # Keep a bounded number of chunks in memory
+            if len(pending) >= workers * 2:
+                entries.extend(pending.pop(0).result())
+        for future in pending:
+            entries.extend(future.result())
+
+    # Tokens from an earlier build (e.g. another batch) stay in the manifest
+    tokens = dict(previous)
+    tokens.update({str(token_id): entry for token_id, entry, _ in entries})
+    ordered = sorted(tokens.items(), key=lambda item: int(item[0]))
+    manifest = {
+        'generated_at': datetime.now().isoformat(),
+        'token_count': len(ordered),
+        # Hash of every token's hash in token order - fixes the whole reveal
+        'provenance': hashlib.sha256(''.join(entry['sha256'] for _, entry in ordered).encode()).hexdigest(),
+        'tokens': dict(ordered),
+    }
+    write_atomic(output_dir / MANIFEST_NAME, json.dumps(manifest, indent=2).encode('utf-8'))
+
+    with conn:
+        conn.executemany(
+            "UPDATE otherides_vehicles SET opensea_ready = 1 WHERE token_id = ? AND opensea_ready IS NOT 1",
+            [(token_id,) for token_id, _, _ in entries]
+        )
+
+    written = sum(1 for _, _, changed in entries if changed)
+    return {
+        'assigned': assigned,
+        'tokens': len(entries),
+        'written': written,
+        'unchanged': len(entries) - written,
+        'provenance': manifest['provenance'],
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    """Build OpenSea metadata for the collection"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build ERC-721 metadata files for OTHERIDES tokens")
+    parser.add_argument('--db', default="otherides_assets.db")
+    parser.add_argument('--out', default="opensea_metadata", help="directory for token JSON files and the manifest")
+    parser.add_argument('--image-base-uri', help="prefix for image URLs, e.g. ipfs://<cid>/ (default: Drive link)")
+    parser.add_argument('--batch', help="only assign and build tokens for this collection batch")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--extension', default="", help="token file extension, e.g. .json (default: none)")
+    parser.add_argument('--force', action='store_true', help="rewrite every token file")
+    args = parser.parse_args()
+
+    try:
+        conn = sqlite3.connect(args.db, timeout=30)
+        migrate(conn)
+        result = build_metadata(conn, args.out, args.image_base_uri, args.batch,
+                                args.workers, extension=args.extension, force=args.force)
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+    print(f"🪙 Assigned {result['assigned']} new token IDs")
+    print(f"✅ Built {result['tokens']} tokens in {result['seconds']:.2f}s: "
+          f"{result['written']} written, {result['unchanged']} unchanged")
+    print(f"📜 Manifest: {Path(args.out) / MANIFEST_NAME} (provenance {result['provenance']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Perceptual hashes and near-duplicate lookup for generated images
+
+MD5 only catches byte-identical files; DALL-E often returns visually
+near-identical vehicles for similar prompts. pHash (DCT of a 32x32
+grayscale thumbnail) maps such images to 64-bit hashes a few bits apart.
+
+HammingIndex is a multi-index hash: each 64-bit hash is split into four
+16-bit chunks with one lookup table per chunk. Two hashes within distance r
+must agree to within r // 4 bits on at least one chunk, so a query probes a
+handful of buckets instead of scanning the collection.
+"""
+
+import threading
+from functools import lru_cache
+
+HASH_BITS = 64
+DEFAULT_MAX_DISTANCE = 6
+
+
+def _open_gray(image_data):
+    """Pillow grayscale image from a file-like object or PIL image"""
+    from PIL import Image
+
+    if isinstance(image_data, Image.Image):
+        return image_data.convert('L')
+    image_data.seek(0)
+    try:
+        with Image.open(image_data) as image:
+            return image.convert('L')
+    finally:
+        image_data.seek(0)
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(n):
+    """Orthonormal DCT-II matrix"""
+    import numpy as np
+
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def phash(image_data, hash_size=8, highfreq_factor=4):
+    """64-bit DCT perceptual hash of an image"""
+    import numpy as np
+    from PIL import Image
+
+    size = hash_size * highfreq_factor
+    image = _open_gray(image_data).resize((size, size), Image.LANCZOS)
+    pixels = np.asarray(image, dtype=np.float64)
+
+    dct = _dct_matrix(size)
+    low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    return _bits_to_int((low > np.median(low)).flatten())
+
+
+def to_hex(value):
+    """Hash as the 16-character hex string stored in the database"""
+    return f"{value:016x}"
+
+
+def from_hex(text):
+    return int(text, 16)
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+def _flips(value, bits, max_flips):
+    """Every value within max_flips bit flips of value (including itself)"""
+    results = [value]
+    frontier = [(value, -1)]
+    for _ in range(max_flips):
+        next_frontier = []
+        for current, last in frontier:
+            for bit in range(last + 1, bits):
+                flipped = current ^ (1 << bit)
+                results.append(flipped)
+                next_frontier.append((flipped, bit))
+        frontier = next_frontier
+    return results
+
+
+class HammingIndex:
+    """Multi-index hash table for Hamming-radius queries over 64-bit hashes"""
+
+    def __init__(self, chunks=4):
+        if HASH_BITS % chunks:
+            raise ValueError(f"chunks must divide {HASH_BITS}")
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._mask = (1 << self.chunk_bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self.hashes = []
+        self.items = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _parts(self, value):
+        return [(value >> (i * self.chunk_bits)) & self._mask for i in range(self.chunks)]
+
+    def add(self, value, item):
+        """Index a hash with the item it identifies (e.g. an image_id)"""
+        with self._lock:
+            position = len(self.hashes)
+            self.hashes.append(value)
+            self.items.append(item)
+            for table, part in zip(self._tables, self._parts(value)):
+                table.setdefault(part, []).append(position)
+
+    def _candidates(self, value, max_distance):
+        flips = max_distance // self.chunks
+        seen = set()
+        for table, part in zip(self._tables, self._parts(value)):
+            for probe in _flips(part, self.chunk_bits, flips):
+                positions = table.get(probe)
+                if positions:
+                    seen.update(positions)
+        return seen
+
+    def search(self, value, max_distance=DEFAULT_MAX_DISTANCE):
+        """[(distance, item)] for every indexed hash within max_distance, nearest first"""
+        with self._lock:
+            matches = []
+            for position in self._candidates(value, max_distance):
+                distance = hamming(value, self.hashes[position])
+                if distance <= max_distance:
+                    matches.append((distance, self.items[position]))
+        return sorted(matches, key=lambda match: match[0])
+
+    def duplicate_groups(self, max_distance=DEFAULT_MAX_DISTANCE):
+        """Groups of items whose hashes chain together within max_distance"""
+        parent = list(range(len(self.hashes)))
+
+        def find(position):
+            while parent[position] != position:
+                parent[position] = parent[parent[position]]
+                position = parent[position]
+            return position
+
+        with self._lock:
+            for position, value in enumerate(self.hashes):
+                for other in self._candidates(value, max_distance):
+                    if other > position and hamming(value, self.hashes[other]) <= max_distance:
+                        parent[find(other)] = find(position)
+
+            groups = {}
+            for position in range(len(self.hashes)):
+                groups.setdefault(find(position), []).append(self.items[position])
+
+        return [group for group in groups.values() if len(group) > 1]
+
+    @classmethod
+    def from_database(cls, conn, chunks=4):
+        """Index of (image_id) for every vehicle with a stored phash"""
+        index = cls(chunks)
+        rows = conn.execute(
+            "SELECT image_id, phash FROM otherides_vehicles WHERE phash IS NOT NULL"
+        ).fetchall()
+        for image_id, value in rows:
+            index.add(from_hex(value), image_id)
+        return index
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Staged generation pipeline for OTHERIDES collection runs
+
+Each stage (generate, download, hash, process, upload, persist) has its own
+bounded queue and worker pool. A full queue blocks the stage feeding it, so a slow
+upload (to Drive, S3 or the local store) applies backpressure instead of piling up images in memory,
+while the other stages keep working.
+"""
+
+import queue
+import threading
+import time
+
+from otherides_storage import stored_file_path
+
+# Marks the end of the work stream for a stage
+_STOP = object()
+
+
+class PipelineStage:
+    """One pipeline stage: an input queue drained by a pool of worker threads"""
+
+    def __init__(self, name, func, workers=1, queue_size=16):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def stats(self, elapsed):
+        """Snapshot of queue depth, throughput and utilization"""
+        with self._lock:
+            processed = self.processed
+            failed = self.failed
+            busy = self.busy_seconds
+
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'processed': processed,
+            'failed': failed,
+            'busy_seconds': round(busy, 3),
+            'throughput_per_sec': round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+            'utilization': round(busy / (elapsed * self.workers), 3) if elapsed > 0 else 0.0
+        }
+
+
+class VehiclePipeline:
+    """Generate → download → hash → process → upload → persist with per-stage worker pools
+
+    Items flowing between stages are dicts holding the original spec plus
+    whatever the previous stages produced. A stage that fails drops the item
+    and records (spec, None) in the results.
+    """
+
+    def __init__(self, generator, batch_name, subfolder=None, workers=None, queue_size=16):
+        self.generator = generator
+        self.batch_name = batch_name
+        self.subfolder = subfolder
+
+        # SQLite has a single writer, so persist defaults to one worker; process
+        # threads only wait on the generator's post-processing worker processes
+        pool_sizes = {'generate': 4, 'download': 4, 'hash': 1, 'process': 4, 'upload': 2, 'persist': 1}
+        pool_sizes.update(workers or {})
+
+        self.stages = [
+            PipelineStage('generate', self._generate, pool_sizes['generate'], queue_size),
+            PipelineStage('download', self._download, pool_sizes['download'], queue_size),
+            PipelineStage('hash', self._hash, pool_sizes['hash'], queue_size),
+            PipelineStage('process', self._process, pool_sizes['process'], queue_size),
+            PipelineStage('upload', self._upload, pool_sizes['upload'], queue_size),
+            PipelineStage('persist', self._persist, pool_sizes['persist'], queue_size),
+        ]
+
+        self.results = []
+        self._results_lock = threading.Lock()
+        self._started_at = None
+        self._finished_at = None
+
+    # Stage functions - each takes an item and returns it (or None to drop it)
+
+    def _generate(self, item):
+        item['vehicle_data'] = self.generator.generate_otherides_vehicle(**item['spec'])
+        return item if item['vehicle_data'] else None
+
+    def _download(self, item):
+        item['image_data'] = self.generator._fetch_vehicle_image(item['vehicle_data'])
+        return item if item['image_data'] else None
+
+    def _hash(self, item):
+        item['image_hash'] = self.generator._hash_image(item['image_data'])
+        item['phash'] = self.generator._perceptual_hash(item['image_data'])
+        return item
+
+    def _process(self, item):
+        item['image_variants'] = self.generator._post_process_image(
+            item['image_data'], item['vehicle_data']['image_id']
+        )
+        return item
+
+    def _upload(self, item):
+        file_name, file_path = self.generator._vehicle_file_location(item['vehicle_data'], self.subfolder)
+        item['stored'] = self.generator._store_vehicle_image(
+            self.generator._upload_image_data(item['image_data'], item['image_variants']),
+            file_name, file_path, self.batch_name, self.subfolder
+        )
+        item['file_name'] = file_name
+        item['file_path'] = stored_file_path(item['stored'], file_path)
+        item['drive_info'] = item['stored'].get('drive')
+        # The image bytes are no longer needed once they have left the process
+        item['image_data'] = None
+        return item
+
+    def _persist(self, item):
+        vehicle_data = item['vehicle_data']
+        drive_info = item['drive_info']
+
+        record = self.generator._build_vehicle_record(
+            vehicle_data, self.batch_name, item['file_name'], item['file_path'],
+            drive_info, item['image_hash'], item['phash'], item['image_variants'], item['stored']
+        )
+        vehicle_id = self.generator._save_vehicle_record(record)
+
+        item['result'] = {
+            'id': vehicle_id,
+            'metadata': self.generator._build_vehicle_metadata(vehicle_data, item['file_name'], item['file_path']),
+            'drive_link': drive_info['webViewLink'] if drive_info else None,
+            'file_name': item['file_name'],
+            'image_variants': item['image_variants']
+        }
+        return item
+
+    # Worker plumbing
+
+    def _record(self, spec, result):
+        with self._results_lock:
+            self.results.append((spec, result))
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        try:
+            while True:
+                item = stage.queue.get()
+                if item is _STOP:
+                    # Hand the marker on to a sibling worker; the last one out
+                    # passes it downstream instead
+                    with stage._lock:
+                        stage._running -= 1
+                        last = stage._running == 0
+                    if not last:
+                        stage.queue.put(_STOP)
+                    elif next_stage:
+                        next_stage.queue.put(_STOP)
+                    return
+
+                started = time.perf_counter()
+                try:
+                    output = stage.func(item)
+                except Exception as e:
+                    print(f"Error in {stage.name} stage for {item['spec']}: {e}")
+                    output = None
+                elapsed = time.perf_counter() - started
+
+                with stage._lock:
+                    stage.busy_seconds += elapsed
+                    if output is None:
+                        stage.failed += 1
+                    else:
+                        stage.processed += 1
+
+                if output is None:
+                    self._record(item['spec'], None)
+                elif next_stage:
+                    # Blocks while the next stage is saturated (backpressure)
+                    next_stage.queue.put(output)
+                else:
+                    self._record(item['spec'], output['result'])
+        finally:
+            self.generator.db.release()
+
+    def run(self, specs, progress_interval=None):
+        """Push specs through every stage and return (spec, result) pairs
+
+        With progress_interval set, per-stage stats are printed every
+        progress_interval seconds while the run is in progress.
+        """
+        self.results = []
+        self._started_at = time.perf_counter()
+        self._finished_at = None
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage.processed = stage.failed = 0
+            stage.busy_seconds = 0.0
+            stage._running = stage.workers
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(index,),
+                    name=f"otherides-{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        done = threading.Event()
+        if progress_interval:
+            def monitor():
+                while not done.wait(progress_interval):
+                    self.print_stats()
+            threading.Thread(target=monitor, daemon=True).start()
+
+        with self.generator.telemetry.batch(self.batch_name):
+            head = self.stages[0].queue
+            for spec in specs:
+                head.put({'spec': spec})
+            head.put(_STOP)
+
+            for thread in threads:
+                thread.join()
+
+        done.set()
+        self._finished_at = time.perf_counter()
+        return self.results
+
+    def stats(self):
+        """Per-stage queue depth and throughput (safe to call mid-run)"""
+        if self._started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished_at or time.perf_counter()) - self._started_at
+        return [stage.stats(elapsed) for stage in self.stages]
+
+    def bottleneck(self):
+        """Name of the stage with the highest worker utilization"""
+        stats = self.stats()
+        return max(stats, key=lambda s: s['utilization'])['stage'] if stats else None
+
+    def print_stats(self):
+        """Print a per-stage summary table"""
+        print(f"{'Stage':<10} {'Workers':>7} {'Queue':>6} {'Done':>6} {'Failed':>6} {'Items/s':>8} {'Util':>6}")
+        for s in self.stats():
+            print(f"{s['stage']:<10} {s['workers']:>7} {s['queue_depth']:>6} {s['processed']:>6} "
+                  f"{s['failed']:>6} {s['throughput_per_sec']:>8.2f} {s['utilization']:>6.0%}")
+        if self.generator.cache:
+            self.generator.cache.report()
+        self.generator.rate_limiter.report()
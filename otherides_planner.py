@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Stratified collection planning for large OTHERIDES drops
+
+Instead of an independent random.choice per attribute, the planner fills
+each dimension (faction, vehicle type, biome, style, camera view, lighting,
+variant pattern) with exact quotas derived from target counts or rarity
+weights, shuffles the columns independently and then repairs collisions by
+swapping values between rows - which keeps every quota intact. The result
+is a fully pinned spec list in which no two vehicles share a prompt and
+every (faction, variant) name gets its own version number, so no API call
+is spent on an accidental duplicate.
+
+Usage: python otherides_planner.py --total 10000 [--seed N] [--out plan.json]
+"""
+
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from otherides_generator import (
+    AESTHETIC_STYLES, BIOMES, CAMERA_VIEWS, LIGHTING_SETUPS, STYLE_MODIFIERS,
+    VARIANT_PATTERNS, VEHICLE_TYPES, load_faction_data, variant_name
+)
+
+# Dimensions that accept target counts or weights
+DIMENSIONS = ('faction', 'vehicle_type', 'biome', 'style', 'camera_view', 'lighting', 'pattern')
+
+# Special-purpose values that ordinary drops leave out
+RESERVED = {'faction': {'honorary'}, 'biome': {'miami_swamp'}}
+
+
+def apportion(total, weights):
+    """Split total into integer quotas proportional to weights (largest remainder)"""
+    weights = np.asarray(weights, dtype=float)
+    if weights.sum() <= 0:
+        raise ValueError("weights must not all be zero")
+    exact = weights / weights.sum() * total
+    quotas = np.floor(exact).astype(np.int64)
+    remainder = total - quotas.sum()
+    if remainder:
+        # Stable sort keeps ties in declaration order, so quotas are reproducible
+        quotas[np.argsort(-(exact - quotas), kind='stable')[:remainder]] += 1
+    return quotas
+
+
+class CollectionPlanner:
+    """Reproducible, stratified and collision-free spec lists"""
+
+    def __init__(self, factions=None, vehicle_types=None, biomes=None, styles=None,
+                 camera_views=None, lighting_setups=None, patterns=None, seed=None):
+        faction_data = load_faction_data()
+        defaults = {
+            'faction': list(faction_data),
+            'vehicle_type': list(VEHICLE_TYPES),
+            'biome': list(BIOMES),
+            'style': list(AESTHETIC_STYLES),
+            'camera_view': list(CAMERA_VIEWS),
+            'lighting': list(LIGHTING_SETUPS),
+            'pattern': list(VARIANT_PATTERNS),
+        }
+        given = {
+            'faction': factions, 'vehicle_type': vehicle_types, 'biome': biomes, 'style': styles,
+            'camera_view': camera_views, 'lighting': lighting_setups, 'pattern': patterns,
+        }
+        self.values = {}
+        for dimension in DIMENSIONS:
+            values = given[dimension]
+            if values is None:
+                values = [v for v in defaults[dimension] if v not in RESERVED.get(dimension, ())]
+            self.values[dimension] = list(values)
+
+        self.themes = [faction_data[f]['vehicle_themes'] for f in self.values['faction']]
+        self.modifiers = [STYLE_MODIFIERS.get(style, ['Custom']) for style in self.values['style']]
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        # Modifier words get global ids so names can be compared across styles
+        words = sorted({word for modifiers in self.modifiers for word in modifiers})
+        self._words = words
+        self._max_modifiers = max(len(m) for m in self.modifiers)
+        self._word_table = np.array([
+            [words.index(m[i % len(m)]) for i in range(self._max_modifiers)] for m in self.modifiers
+        ])
+        self._max_themes = max(len(t) for t in self.themes)
+        self._theme_counts = np.array([len(t) for t in self.themes])
+
+    def capacity(self):
+        """How many distinct vehicles the configured values allow"""
+        sizes = [len(self.values[d]) for d in DIMENSIONS]
+        modifiers = sum(len(m) for m in self.modifiers) / len(self.modifiers)
+        themes = sum(len(t) for t in self.themes) / len(self.themes)
+        return int(np.prod(sizes, dtype=float) * modifiers * themes)
+
+    def _quotas(self, dimension, total, counts, weights):
+        values = self.values[dimension]
+        if counts and dimension in counts:
+            wanted = counts[dimension]
+            unknown = set(wanted) - set(values)
+            if unknown:
+                raise ValueError(f"Unknown {dimension} values: {', '.join(sorted(map(str, unknown)))}")
+            quotas = np.array([wanted.get(v, 0) for v in values], dtype=np.int64)
+            if quotas.sum() != total:
+                raise ValueError(f"{dimension} counts add up to {quotas.sum()}, not {total}")
+            return quotas
+        if weights and dimension in weights:
+            unknown = set(weights[dimension]) - set(values)
+            if unknown:
+                raise ValueError(f"Unknown {dimension} values: {', '.join(sorted(map(str, unknown)))}")
+            return apportion(total, [weights[dimension].get(v, 1.0) for v in values])
+        return apportion(total, np.ones(len(values)))
+
+    def _stratified(self, quotas):
+        """Column with exactly quotas[i] rows of value i, in random order"""
+        return self.rng.permutation(np.repeat(np.arange(len(quotas)), quotas))
+
+    def _derived(self, columns):
+        """Modifier word and vehicle theme indices, which depend on style/faction"""
+        words = self._word_table[columns['style'], columns['modifier'] % self._word_table.shape[1]]
+        themes = columns['theme'] % self._theme_counts[columns['faction']]
+        return words, themes
+
+    def _codes(self, columns):
+        """One integer per row identifying its full combination (and so its prompt)"""
+        words, themes = self._derived(columns)
+        parts = [columns[d] for d in DIMENSIONS] + [words, themes]
+        dims = [len(self.values[d]) for d in DIMENSIONS] + [len(self._words), self._max_themes]
+        return np.ravel_multi_index(parts, dims)
+
+    def _make_unique(self, columns, total, max_rounds=200):
+        """Swap values between rows until every combination is unique
+
+        Swaps move a value from one row to another, so every dimension keeps
+        its quota.
+        """
+        swappable = [d for d in (*DIMENSIONS, 'modifier', 'theme') if len(np.unique(columns[d])) > 1]
+        all_rows = np.arange(total)
+
+        for _ in range(max_rounds):
+            _, first = np.unique(self._codes(columns), return_index=True)
+            if len(first) == total:
+                return
+            duplicate = np.ones(total, dtype=bool)
+            duplicate[first] = False
+            rows = np.flatnonzero(duplicate)
+
+            choice = self.rng.integers(0, len(swappable), size=len(rows))
+            for index, dimension in enumerate(swappable):
+                moving = rows[choice == index]
+                if not len(moving):
+                    continue
+                others = np.setdiff1d(all_rows, moving, assume_unique=True)
+                moving = moving[:len(others)]
+                partners = self.rng.choice(others, size=len(moving), replace=False)
+                column = columns[dimension]
+                column[moving], column[partners] = column[partners], column[moving].copy()
+
+        raise ValueError(
+            f"Could not find {total} distinct vehicles with these quotas; "
+            "loosen the counts/weights or allow more values"
+        )
+
+    def _versions(self, columns):
+        """Version numbers (1, 2, ...) for rows sharing a faction + variant name"""
+        words, _ = self._derived(columns)
+        keys = np.ravel_multi_index(
+            [columns['faction'], columns['pattern'], words, columns['vehicle_type']],
+            [len(self.values['faction']), len(self.values['pattern']), len(self._words),
+             len(self.values['vehicle_type'])]
+        )
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        positions = np.arange(len(keys))
+        group_start = np.maximum.accumulate(np.where(starts, positions, 0))
+
+        versions = np.empty(len(keys), dtype=np.int64)
+        versions[order] = positions - group_start + 1
+        return versions
+
+    def plan(self, total, counts=None, weights=None, index=None):
+        """Fully pinned generate_otherides_vehicle specs for a drop of total vehicles
+
+        counts maps a dimension to exact {value: count} targets that must add
+        up to total; weights maps a dimension to relative {value: weight}
+        rarities (unlisted values weigh 1, weight 0 excludes a value).
+        Dimensions without either are spread evenly. With an ImageIdIndex,
+        versions continue after the highest one already in use.
+        """
+        if total < 1:
+            return []
+        if total > self.capacity():
+            raise ValueError(f"Only {self.capacity()} distinct vehicles are possible, {total} requested")
+        for dimension in {*(counts or {}), *(weights or {})}:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dimension}'; expected one of {', '.join(DIMENSIONS)}")
+
+        columns = {d: self._stratified(self._quotas(d, total, counts, weights)) for d in DIMENSIONS}
+        columns['modifier'] = self._stratified(apportion(total, np.ones(self._max_modifiers)))
+        columns['theme'] = self._stratified(apportion(total, np.ones(self._max_themes)))
+
+        self._make_unique(columns, total)
+        versions = self._versions(columns)
+        words, themes = self._derived(columns)
+
+        labels = {d: np.array(self.values[d], dtype=object)[columns[d]] for d in DIMENSIONS}
+        words = np.array(self._words, dtype=object)[words]
+        faction_themes = [self.themes[f][t] for f, t in zip(columns['faction'].tolist(), themes.tolist())]
+
+        specs = [
+            {
+                'faction': faction,
+                'vehicle_type': vehicle_type,
+                'biome': biome,
+                'style': style,
+                'variant': variant_name(pattern, word, vehicle_type),
+                'camera_view': camera_view,
+                'lighting': lighting,
+                'vehicle_theme': theme,
+                'version': version,
+            }
+            for faction, vehicle_type, biome, style, camera_view, lighting, pattern, word, theme, version in zip(
+                labels['faction'], labels['vehicle_type'], labels['biome'], labels['style'],
+                labels['camera_view'], labels['lighting'], labels['pattern'], words,
+                faction_themes, versions.tolist()
+            )
+        ]
+
+        if index is not None and len(index):
+            for spec in specs:
+                spec['version'] += index.highest_version(spec['faction'], spec['variant'])
+        return specs
+
+
+def summarize(specs):
+    """Per-dimension value counts of a plan, for checking its balance"""
+    summary = {}
+    for dimension in ('faction', 'vehicle_type', 'biome', 'style', 'camera_view', 'lighting'):
+        summary[dimension] = dict(Counter(spec[dimension] for spec in specs).most_common())
+    return summary
+
+
+def main():
+    """Plan a drop and print its balance (optionally saving the spec list)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plan a stratified, duplicate-free OTHERIDES drop")
+    parser.add_argument('--total', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--weights', help="JSON file of {dimension: {value: weight}}")
+    parser.add_argument('--out', help="write the spec list to this JSON file")
+    args = parser.parse_args()
+
+    weights = None
+    if args.weights:
+        with open(args.weights, 'r') as f:
+            weights = json.load(f)
+
+    start = time.perf_counter()
+    try:
+        specs = CollectionPlanner(seed=args.seed).plan(args.total, weights=weights)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"📋 Planned {len(specs)} vehicles in {elapsed * 1000:.1f} ms")
+    for dimension, counts in summarize(specs).items():
+        low, high = min(counts.values()), max(counts.values())
+        print(f"   {dimension:<13} {len(counts):>3} values, {low}-{high} each")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(specs, f, indent=2)
+        print(f"💾 Saved plan to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
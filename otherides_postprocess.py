@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Image post-processing for generated OTHERIDES vehicles
+
+Each downloaded 1024x1024 PNG is re-encoded without its metadata into an
+optimized PNG (the file that gets uploaded) plus WebP previews and
+thumbnails. Encoding is CPU-bound - an optimized PNG alone takes a couple
+of seconds - so ImagePostProcessor runs it on a process pool while the
+generator's threads carry on with network I/O.
+
+Variants are written to <output_dir>/<image_id>/<size>.<format> and
+described by a dict keyed 'full.png', 'preview.webp', ... that is stored
+as JSON in the vehicle's image_variants column.
+"""
+
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# Variant name -> (longest edge, formats); 'full' keeps the original size.
+# Only the uploaded master is worth a (slow) optimized PNG.
+VARIANTS = {
+    'full': (None, ('png', 'webp')),
+    'preview': (512, ('webp',)),
+    'thumbnail': (256, ('webp',)),
+}
+
+SAVE_OPTIONS = {
+    'png': {'format': 'PNG', 'optimize': True},
+    'webp': {'format': 'WEBP', 'quality': 85, 'method': 4},
+    # Supported when Pillow is built with libavif; far slower to encode, so opt-in
+    'avif': {'format': 'AVIF', 'quality': 70},
+}
+
+
+def _strip_metadata(image):
+    """Pixels only: drop EXIF, text chunks, ICC profile and other info"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    else:
+        image = image.copy()
+    image.info = {}
+    return image
+
+
+def read_image_bytes(image_data):
+    """Bytes of an image given as bytes or any file-like object (in-memory or spooled to disk)"""
+    if not hasattr(image_data, 'read'):
+        return image_data
+    image_data.seek(0)
+    data = image_data.read()
+    image_data.seek(0)
+    return data
+
+
+def write_atomic(path, data):
+    """Write bytes via a temporary file so readers never see a partial variant"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def process_image(image_bytes, image_id, output_dir, variants=None, extra_formats=()):
+    """Write every size/format variant of an image; returns their descriptions
+
+    extra_formats (e.g. ('avif',)) are written for every size on top of
+    the formats listed in variants.
+
+    Runs in pool worker processes, so it takes and returns plain picklable
+    values.
+    """
+    from PIL import Image
+
+    variants = VARIANTS if variants is None else variants
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source.load()
+        original = _strip_metadata(source)
+
+    target_dir = Path(output_dir) / image_id
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    written = {}
+    for size_name, (longest_edge, formats) in variants.items():
+        image = original
+        if longest_edge and max(original.size) > longest_edge:
+            image = original.copy()
+            image.thumbnail((longest_edge, longest_edge), Image.LANCZOS, reducing_gap=3.0)
+
+        for image_format in dict.fromkeys((*formats, *extra_formats)):
+            buffer = io.BytesIO()
+            image.save(buffer, **SAVE_OPTIONS[image_format])
+            path = target_dir / f"{size_name}.{image_format}"
+            write_atomic(path, buffer.getvalue())
+            written[f"{size_name}.{image_format}"] = {
+                'path': str(path),
+                'width': image.width,
+                'height': image.height,
+                'bytes': buffer.tell(),
+            }
+    return written
+
+
+class ImagePostProcessor:
+    """Process pool producing stripped, optimized and resized image variants"""
+
+    def __init__(self, output_dir="otherides_variants", workers=None, variants=None, extra_formats=()):
+        self.variants = VARIANTS if variants is None else variants
+        formats = {f for _, size_formats in self.variants.values() for f in size_formats} | set(extra_formats)
+        unknown = formats - set(SAVE_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown image formats: {', '.join(sorted(unknown))}")
+        self.output_dir = output_dir
+        # workers=0 processes images in the calling thread (no pool)
+        self.workers = (os.cpu_count() or 2) if workers is None else workers
+        self.extra_formats = tuple(extra_formats)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.processed = 0
+        self.failed = 0
+        self.original_bytes = 0
+        self.variant_bytes = {}
+
+    @property
+    def executor(self):
+        """Worker processes, started on first use"""
+        if self._executor is None and self.workers:
+            with self._lock:
+                if self._executor is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # spawn rather than fork: the parent holds threads, locks and
+                    # SQLite connections that a forked child must not inherit
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def submit(self, image_data, image_id):
+        """Start processing an image; returns a Future of its variants"""
+        image_bytes = read_image_bytes(image_data)
+        if not self.workers:
+            from concurrent.futures import Future
+
+            future = Future()
+            try:
+                future.set_result(process_image(image_bytes, image_id, self.output_dir, self.variants, self.extra_formats))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self.executor.submit(
+                process_image, image_bytes, image_id, self.output_dir, self.variants, self.extra_formats
+            )
+        future.original_size = len(image_bytes)
+        return future
+
+    def result(self, future):
+        """Variants from a submitted image (None, with a warning, if processing failed)"""
+        try:
+            variants = future.result()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f"Warning: image post-processing failed: {e}")
+            return None
+
+        with self._lock:
+            self.processed += 1
+            self.original_bytes += future.original_size
+            for key, variant in variants.items():
+                self.variant_bytes[key] = self.variant_bytes.get(key, 0) + variant['bytes']
+        return variants
+
+    def process(self, image_data, image_id):
+        """Variants of one image, waiting for the pool"""
+        return self.result(self.submit(image_data, image_id))
+
+    def close(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def stats(self):
+        """Processed image counts and bytes per variant"""
+        with self._lock:
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'original_bytes': self.original_bytes,
+                'variant_bytes': dict(self.variant_bytes),
+            }
+
+    def report(self):
+        """Print how many bytes the variants save over the downloaded PNGs"""
+        stats = self.stats()
+        if not stats['processed']:
+            return
+        original = stats['original_bytes']
+        print(f"🖼️  Post-processed {stats['processed']} images ({stats['failed']} failed), "
+              f"originals {original / 1024 ** 2:.1f} MB:")
+        for key, size in sorted(stats['variant_bytes'].items()):
+            print(f"   {key:<16} {size / 1024 ** 2:>8.2f} MB  ({size / original:.0%})")
+
+
+def open_variant(variants, key):
+    """A variant's file contents as a BytesIO (None if it isn't available)"""
+    variant = (variants or {}).get(key)
+    if not variant:
+        return None
+    try:
+        with open(variant['path'], 'rb') as f:
+            return io.BytesIO(f.read())
+    except OSError:
+        return None
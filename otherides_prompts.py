@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Precompiled image prompt templates for OTHERIDES vehicles
+
+Prompt text lives in versioned template files, data/prompts/v<N>/<name>.txt,
+with {field} placeholders. Each template is parsed once into literal and
+field pieces; the faction, vehicle type and style fields of a combination
+are then bound once (faction names, joined materials and keywords are
+interned per faction), so rendering a prompt only concatenates cached
+pieces with the per-vehicle variant, biome, camera, lighting and theme.
+
+Prompts are hashed into generation cache keys, so template files must not
+change once used: data/prompts/versions.json records the SHA-256 of every
+template, and a new wording goes into a new version directory instead.
+OTHERIDES_PROMPT_VERSION (or prompt_version=) selects the version.
+
+Usage: python otherides_prompts.py [--list] [--diff OLD NEW --total N [--seed S]]
+"""
+
+import hashlib
+import json
+import os
+import string
+import threading
+from pathlib import Path
+
+PROMPT_DIR = Path(__file__).parent / 'data' / 'prompts'
+
+# Version used when none is requested; v1 reproduces the original inline prompts
+DEFAULT_PROMPT_VERSION = 1
+
+TEMPLATE_NAMES = ('faction', 'honorary')
+
+# Spec keys every rendered prompt needs (honorary specs need 'honorary' instead of a theme)
+PINNED_FIELDS = ('faction', 'vehicle_type', 'biome', 'style', 'variant', 'camera_view', 'lighting')
+
+
+class PromptTemplate:
+    """A template compiled to (literal, field) pieces; field is None for the final literal"""
+
+    __slots__ = ('name', 'parts', 'fields')
+
+    def __init__(self, name, parts):
+        self.name = name
+        self.parts = tuple(parts)
+        self.fields = frozenset(field for _, field in self.parts if field)
+
+    @classmethod
+    def compile(cls, name, text):
+        """Parse {field} placeholders (no format specs or conversions)"""
+        parts = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            if format_spec or conversion:
+                raise ValueError(f"Template {name}: format specs and conversions are not supported ({{{field}}})")
+            if field == '' or (field and not field.isidentifier()):
+                raise ValueError(f"Template {name}: invalid field {{{field}}}")
+            parts.append((literal, field))
+        return cls(name, cls._merge(parts))
+
+    @staticmethod
+    def _merge(parts):
+        """Join adjacent literals so rendering does one append per field"""
+        merged = []
+        pending = ''
+        for literal, field in parts:
+            pending += literal
+            if field:
+                merged.append((pending, field))
+                pending = ''
+        merged.append((pending, None))
+        return merged
+
+    def bind(self, **values):
+        """A template with some fields filled in and folded into the literals"""
+        parts = []
+        for literal, field in self.parts:
+            if field in values:
+                parts.append((literal + str(values[field]), ''))
+            else:
+                parts.append((literal, field))
+        return PromptTemplate(self.name, self._merge(parts))
+
+    def render(self, **values):
+        """The prompt text; every remaining field must be given"""
+        try:
+            return ''.join([literal + values[field] if field else literal for literal, field in self.parts])
+        except KeyError:
+            missing = self.fields - values.keys()
+            raise KeyError(f"Template {self.name} needs {', '.join(sorted(missing))}") from None
+
+
+def _version_dir(version, prompt_dir=PROMPT_DIR):
+    return Path(prompt_dir) / f"v{int(version)}"
+
+
+def available_versions(prompt_dir=PROMPT_DIR):
+    """Template versions present on disk, oldest first"""
+    return sorted(int(path.name[1:]) for path in Path(prompt_dir).glob('v*') if path.name[1:].isdigit())
+
+
+def load_templates(version=None, prompt_dir=PROMPT_DIR, verify=True):
+    """Compiled templates of a version; checks them against versions.json unless verify=False"""
+    version = int(version or os.getenv("OTHERIDES_PROMPT_VERSION") or DEFAULT_PROMPT_VERSION)
+    version_dir = _version_dir(version, prompt_dir)
+    if not version_dir.is_dir():
+        raise ValueError(f"Unknown prompt version {version} (available: {available_versions(prompt_dir)})")
+
+    expected = {}
+    if verify:
+        with open(Path(prompt_dir) / 'versions.json', 'r') as f:
+            expected = json.load(f).get(str(version), {})
+
+    templates = {}
+    for name in TEMPLATE_NAMES:
+        # newline='' keeps the text byte-for-byte (prompts feed cache keys)
+        with open(version_dir / f"{name}.txt", 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if verify and expected.get(name) != digest:
+            raise ValueError(f"Prompt template v{version}/{name}.txt does not match versions.json; "
+                             f"published templates must not change - add a new version instead")
+        templates[name] = PromptTemplate.compile(name, text)
+    return version, templates
+
+
+def _label(value):
+    return value.replace('_', ' ').title()
+
+
+class PromptRenderer:
+    """Renders vehicle prompts from precompiled, per-combination bound templates"""
+
+    def __init__(self, factions, vehicle_types, biomes, styles, version=None, prompt_dir=PROMPT_DIR):
+        self.factions = factions
+        self.vehicle_types = vehicle_types
+        self.biomes = biomes
+        self.styles = styles
+        self.version, self.templates = load_templates(version, prompt_dir)
+        self._fragments = {}
+        self._bound = {}
+        self._lock = threading.Lock()
+
+    def _faction_fragments(self, faction):
+        """Per-faction prompt pieces, built once"""
+        fragments = self._fragments.get(faction)
+        if fragments is None:
+            faction_data = self.factions[faction]
+            fragments = {
+                'faction_name': _label(faction),
+                'archetype': faction_data['archetype'],
+                'keywords': ', '.join(faction_data['keywords']),
+                'materials': ', '.join(faction_data['materials']),
+                'faction_style': faction_data['style'],
+            }
+            with self._lock:
+                self._fragments[faction] = fragments
+        return fragments
+
+    def _template_for(self, name, faction, vehicle_type, style):
+        """Template with the faction, vehicle type and style fields bound (cached)"""
+        key = (name, faction, vehicle_type, style)
+        template = self._bound.get(key)
+        if template is None:
+            values = {'vehicle_desc': self.vehicle_types[vehicle_type], 'style_desc': self.styles[style]}
+            if name == 'faction':
+                values.update(self._faction_fragments(faction))
+            template = self.templates[name].bind(**values)
+            with self._lock:
+                self._bound[key] = template
+        return template
+
+    def faction_prompt(self, faction, vehicle_type, biome, style, variant, camera_view, lighting, vehicle_theme):
+        """Prompt for a faction vehicle"""
+        return self._template_for('faction', faction, vehicle_type, style).render(
+            variant=variant, biome_desc=self.biomes[biome], camera_view=camera_view,
+            lighting=lighting, vehicle_theme=vehicle_theme
+        )
+
+    def honorary_prompt(self, honorary, vehicle_type, biome, style, variant, camera_view, lighting):
+        """Prompt for a tribute vehicle"""
+        return self._template_for('honorary', 'honorary', vehicle_type, style).render(
+            honorary=honorary, variant=variant, biome_desc=self.biomes[biome],
+            camera_view=camera_view, lighting=lighting
+        )
+
+    def render(self, spec):
+        """Prompt for a fully pinned spec (generate_otherides_vehicle keyword arguments)"""
+        honorary = spec.get('faction') == 'honorary' and spec.get('honorary')
+        missing = [field for field in PINNED_FIELDS + (() if honorary else ('vehicle_theme',)) if not spec.get(field)]
+        if missing:
+            raise ValueError(f"Spec is not fully pinned, missing {', '.join(missing)}: {spec}")
+
+        if honorary:
+            return self.honorary_prompt(spec['honorary'], spec['vehicle_type'], spec['biome'], spec['style'],
+                                        spec['variant'], spec['camera_view'], spec['lighting'])
+        return self.faction_prompt(spec['faction'], spec['vehicle_type'], spec['biome'], spec['style'],
+                                   spec['variant'], spec['camera_view'], spec['lighting'], spec['vehicle_theme'])
+
+
+def default_renderer(version=None):
+    """Renderer over the generator's faction, vehicle type, biome and style tables"""
+    from otherides_generator import AESTHETIC_STYLES, BIOMES, VEHICLE_TYPES, load_faction_data
+
+    return PromptRenderer(load_faction_data(), VEHICLE_TYPES, BIOMES, AESTHETIC_STYLES, version)
+
+
+def render_prompts(specs, version=None, renderer=None):
+    """Prompts for fully pinned specs (e.g. a CollectionPlanner plan), in order"""
+    renderer = renderer or default_renderer(version)
+    return [renderer.render(spec) for spec in specs]
+
+
+def diff_prompts(specs, old_version, new_version):
+    """(index, spec, old prompt, new prompt) for every spec whose prompt differs between versions"""
+    old = default_renderer(old_version)
+    new = default_renderer(new_version)
+    for index, spec in enumerate(specs):
+        before, after = old.render(spec), new.render(spec)
+        if before != after:
+            yield index, spec, before, after
+
+
+def main():
+    """List template versions or diff the prompts of a planned drop between two versions"""
+    import argparse
+    import difflib
+    import time
+
+    parser = argparse.ArgumentParser(description="Inspect OTHERIDES prompt template versions")
+    parser.add_argument('--list', action='store_true', help="list template versions")
+    parser.add_argument('--diff', nargs=2, type=int, metavar=('OLD', 'NEW'), help="compare two versions")
+    parser.add_argument('--total', type=int, default=1000, help="vehicles to plan for --diff")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.diff:
+        from otherides_planner import CollectionPlanner
+
+        specs = CollectionPlanner(seed=args.seed).plan(args.total)
+        started = time.perf_counter()
+        changed = list(diff_prompts(specs, *args.diff))
+        elapsed = time.perf_counter() - started
+        print(f"📝 {len(changed)} of {len(specs)} prompts differ between v{args.diff[0]} and v{args.diff[1]} "
+              f"(rendered in {elapsed * 1000:.0f} ms)")
+        if changed:
+            index, spec, before, after = changed[0]
+            print(f"   First change, spec {index} ({spec['faction']} {spec['variant']}):")
+            for line in difflib.unified_diff(before.splitlines(), after.splitlines(), lineterm='', n=1):
+                print(f"   {line}")
+        return
+
+    default = int(os.getenv("OTHERIDES_PROMPT_VERSION") or DEFAULT_PROMPT_VERSION)
+    for version in available_versions():
+        try:
+            load_templates(version)
+            status = "✅"
+        except ValueError as e:
+            status = f"❌ {e}"
+        marker = " (default)" if version == default else ""
+        print(f"   v{version}{marker}: {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Trait rarity scores and ranks for OTHERIDES tokens
+
+trait_counts holds how many vehicles have each faction, vehicle type,
+biome, style, honoree and trait. VehicleDatabase updates it in the same
+transaction as each batch of inserts (shard merges do the same), so adding
+vehicles costs one counter upsert per distinct attribute value rather than
+a recount of the collection.
+
+Scores are computed from those counts:
+
+- information content: sum of -log2(count / N) over a vehicle's attributes,
+  i.e. k * log2(N) - sum(log2(count)); higher is rarer (as in OpenRarity)
+- statistical rarity: product of count / N, the chance of drawing that
+  exact combination of attributes; lower is rarer
+
+N and the shared counts change with every new vehicle, so every token's
+score moves a little on each insert. Scores and ranks are therefore cached
+in vehicle_rarity and recomputed in one SQL pass against the counts (no
+re-aggregation) only when the counts changed since the last refresh;
+score_vehicle() answers for a single vehicle in O(its attributes).
+"""
+
+import math
+import sqlite3
+from datetime import datetime
+
+from otherides_schema import RARITY_COLUMNS
+
+# Every (vehicle_id, trait_type, value) attribute, as counted in trait_counts
+ATTRIBUTES_SQL = " UNION ALL ".join(
+    [f"SELECT id AS vehicle_id, '{c}' AS trait_type, {c} AS value FROM otherides_vehicles "
+     f"WHERE {c} IS NOT NULL" for c in RARITY_COLUMNS]
+    + ["SELECT vehicle_id, 'trait', trait FROM vehicle_traits"]
+)
+
+
+def _ensure_math_functions(conn):
+    """Register log2() and pow() when SQLite was built without its math functions"""
+    for name, args, func in (('log2', 1, math.log2), ('pow', 2, math.pow)):
+        try:
+            conn.execute(f"SELECT {name}({', '.join(['2.0'] * args)})").fetchone()
+        except sqlite3.OperationalError:
+            conn.create_function(name, args, func, deterministic=True)
+
+
+def is_stale(conn):
+    """True if trait counts changed since scores were last computed"""
+    counts_version, scored_version = conn.execute(
+        "SELECT counts_version, scored_version FROM rarity_state WHERE id = 1"
+    ).fetchone()
+    return scored_version != counts_version
+
+
+def refresh_rarity(conn, force=False):
+    """Recompute scores and ranks if the counts changed; returns True if it did"""
+    _ensure_math_functions(conn)
+    if conn.in_transaction:
+        conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not force and not is_stale(conn):
+            conn.execute("COMMIT")
+            return False
+
+        conn.execute("DELETE FROM vehicle_rarity")
+        conn.execute(f'''
+            WITH total(n) AS (SELECT COUNT(*) FROM otherides_vehicles),
+            attributes AS ({ATTRIBUTES_SQL}),
+            scores AS (
+                SELECT a.vehicle_id, SUM(log2(total.n * 1.0 / c.count)) AS information_content
+                FROM attributes a
+                JOIN trait_counts c ON c.trait_type = a.trait_type AND c.value = a.value
+                CROSS JOIN total
+                GROUP BY a.vehicle_id
+            )
+            INSERT INTO vehicle_rarity (vehicle_id, information_content, statistical_rarity, rarity_rank)
+            SELECT vehicle_id, information_content, pow(2.0, -information_content),
+                   RANK() OVER (ORDER BY information_content DESC)
+            FROM scores
+        ''')
+        conn.execute(
+            "UPDATE rarity_state SET scored_version = counts_version, scored_at = ? WHERE id = 1",
+            (datetime.now().isoformat(),)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return True
+
+
+def score_vehicle(conn, vehicle_id):
+    """Current scores of one vehicle from the trait counts, without a refresh"""
+    total = conn.execute("SELECT COUNT(*) FROM otherides_vehicles").fetchone()[0]
+    attributes = conn.execute(f'''
+        SELECT a.trait_type, a.value, c.count
+        FROM ({ATTRIBUTES_SQL}) a
+        JOIN trait_counts c ON c.trait_type = a.trait_type AND c.value = a.value
+        WHERE a.vehicle_id = ?
+    ''', (vehicle_id,)).fetchall()
+    if not attributes:
+        return None
+
+    information_content = sum(math.log2(total / count) for _, _, count in attributes)
+    return {
+        'vehicle_id': vehicle_id,
+        'information_content': information_content,
+        'statistical_rarity': 2.0 ** -information_content,
+        'attributes': [
+            {'trait_type': trait_type, 'value': value, 'count': count, 'frequency': count / total}
+            for trait_type, value, count in sorted(attributes, key=lambda a: a[2])
+        ],
+    }
+
+
+def top_vehicles(conn, limit=20, refresh=True):
+    """(rank, image_id, token_id, information content, statistical rarity), rarest first"""
+    if refresh:
+        refresh_rarity(conn)
+    return conn.execute('''
+        SELECT r.rarity_rank, v.image_id, v.token_id, r.information_content, r.statistical_rarity
+        FROM vehicle_rarity r
+        JOIN otherides_vehicles v ON v.id = r.vehicle_id
+        ORDER BY r.rarity_rank, v.id
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def trait_frequencies(conn, trait_type=None):
+    """(trait_type, value, count, frequency) from the maintained counts, rarest first"""
+    total = conn.execute("SELECT COUNT(*) FROM otherides_vehicles").fetchone()[0]
+    query = "SELECT trait_type, value, count FROM trait_counts"
+    params = []
+    if trait_type:
+        query += " WHERE trait_type = ?"
+        params.append(trait_type)
+    rows = conn.execute(query + " ORDER BY count, trait_type, value", params).fetchall()
+    return [(t, value, count, count / total if total else 0.0) for t, value, count in rows]
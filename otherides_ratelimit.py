@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Adaptive rate limiting for OpenAI image generation calls
+
+One ImageRateLimiter is shared by every sync and async generation path. A
+token bucket refilled at the account's images-per-minute limit spaces the
+requests out; a 429 pauses all callers for the Retry-After interval and
+lowers the refill rate, which then creeps back up towards the limit as
+requests succeed. Throttled and transient failures are retried with
+full-jitter backoff, and the counters show where the time went.
+"""
+
+import os
+import random
+import threading
+import time
+
+# Statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _status(error):
+    return getattr(error, 'status_code', None)
+
+
+def is_rate_limited(error):
+    """True for an OpenAI 429 response"""
+    return _status(error) == 429
+
+
+def is_retryable(error):
+    """True for throttling, transient 5xx and connection-level failures"""
+    status = _status(error)
+    if status is None:
+        import openai
+        return isinstance(error, (openai.APIConnectionError, ConnectionError, TimeoutError))
+    return status in RETRYABLE_STATUSES
+
+
+def parse_retry_after(value):
+    """Seconds to wait for a Retry-After header value (delta-seconds or HTTP-date), if valid"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (retry-after-ms / Retry-After), if any"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    return parse_retry_after(headers.get('retry-after'))
+
+
+class ImageRateLimiter:
+    """Token bucket plus retry policy shared by all image generation requests"""
+
+    def __init__(self, images_per_minute=None, burst=None, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, min_rate_fraction=0.1):
+        self.images_per_minute = images_per_minute
+        self.max_rate = images_per_minute / 60.0 if images_per_minute else None
+        self.rate = self.max_rate
+        self.min_rate = self.max_rate * min_rate_fraction if self.max_rate else None
+        self.capacity = burst or (max(1, images_per_minute // 10) if images_per_minute else None)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._tokens = float(self.capacity or 0)
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.wait_seconds = 0.0
+        self.throttled_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Limiter sized from OPENAI_IMAGES_PER_MINUTE (unlimited when unset)"""
+        value = os.getenv("OPENAI_IMAGES_PER_MINUTE")
+        images_per_minute = int(value) if value and value.isdigit() and int(value) > 0 else None
+        return cls(images_per_minute, **kwargs)
+
+    def _reserve(self):
+        """Take a token and return how long the caller must wait before using it
+
+        Callers that find the bucket empty still take their token (the bucket
+        goes into debt), so concurrent callers are spaced out in arrival
+        order rather than all waking at once.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            delay = max(0.0, self._resume_at - now)
+
+            if self.rate:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    delay = max(delay, -self._tokens / self.rate)
+
+            self.wait_seconds += delay
+            return delay
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a request may be sent"""
+        import asyncio
+
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt, error):
+        """Record a failed attempt; returns the delay before retrying"""
+        server_delay = retry_after(error)
+        delay = server_delay if server_delay is not None else \
+            random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+        with self._lock:
+            self.retries += 1
+            self.throttled_seconds += delay
+            if is_rate_limited(error):
+                self.throttled += 1
+                # Pause every caller for the server's window and slow the refill
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                if self.rate:
+                    self.rate = max(self.min_rate, self.rate * 0.75)
+                    self._tokens = min(self._tokens, 0.0)
+        return delay
+
+    def _success(self):
+        """Let the refill rate recover towards the configured limit"""
+        if self.rate and self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def _give_up(self, attempt, error):
+        if attempt >= self.max_retries or not is_retryable(error):
+            with self._lock:
+                self.failures += 1
+            return True
+        return False
+
+    def call(self, func, *args, **kwargs):
+        """Call func under the limiter, retrying throttled/transient errors"""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if self._give_up(attempt, e):
+                    raise
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            self._success()
+            return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """Await func(*args, **kwargs) under the limiter, with the same retry policy"""
+        import asyncio
+
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if self._give_up(attempt, e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            self._success()
+            return result
+
+    def stats(self):
+        """Request, throttling and waiting counters"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'retries': self.retries,
+                'failures': self.failures,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'images_per_minute': round(self.rate * 60, 2) if self.rate else None,
+            }
+
+    def report(self):
+        """Print request and throttling counters"""
+        stats = self.stats()
+        limit = f"{stats['images_per_minute']}/min" if stats['images_per_minute'] else "unlimited"
+        print(f"⏱️  Image rate limiter ({limit}): {stats['requests']} requests, "
+              f"{stats['throttled']} throttled, {stats['retries']} retries, {stats['failures']} failed; "
+              f"{stats['wait_seconds']:.1f}s pacing, {stats['throttled_seconds']:.1f}s backing off")
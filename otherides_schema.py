@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the OTHERIDES vehicle database
+
+The applied version is stored in SQLite's PRAGMA user_version. Each migration
+runs in its own IMMEDIATE transaction, so existing databases are upgraded in
+place and concurrent processes never apply the same step twice.
+
+Usage: python otherides_schema.py [--db <path>] [--status]
+"""
+
+import json
+import sqlite3
+import sys
+
+
+def _create_vehicles_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS otherides_vehicles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_id TEXT UNIQUE,
+            token_id INTEGER,
+            vehicle_name TEXT,
+            faction TEXT,
+            vehicle_type TEXT,
+            variant TEXT,
+            traits TEXT,
+            biome TEXT,
+            style TEXT,
+            camera_view TEXT,
+            lighting TEXT,
+            mood TEXT,
+            honorary TEXT,
+            creator TEXT DEFAULT 'AI_Generator',
+            generation_date TEXT,
+            source_prompt TEXT,
+            tags TEXT,
+            file_name TEXT,
+            file_path TEXT,
+            drive_id TEXT,
+            drive_link TEXT,
+            created_at TIMESTAMP,
+            collection_batch TEXT,
+            image_hash TEXT,
+            minted BOOLEAN DEFAULT FALSE,
+            opensea_ready BOOLEAN DEFAULT FALSE
+        )
+    ''')
+
+
+def _add_vehicle_indexes(conn):
+    for column in ('faction', 'biome', 'vehicle_type', 'collection_batch', 'created_at', 'image_hash'):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_vehicles_{column} ON otherides_vehicles({column})")
+
+
+def _create_trait_tag_tables(conn):
+    # traits/tags JSON columns stay as the denormalized copy used by exports;
+    # these tables are what trait and tag queries should hit
+    for table, column in (('vehicle_traits', 'trait'), ('vehicle_tags', 'tag')):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                vehicle_id INTEGER NOT NULL REFERENCES otherides_vehicles(id) ON DELETE CASCADE,
+                {column} TEXT NOT NULL,
+                PRIMARY KEY (vehicle_id, {column})
+            ) WITHOUT ROWID
+        ''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column}, vehicle_id)")
+
+    # Backfill from the existing JSON columns
+    cursor = conn.execute("SELECT id, traits, tags FROM otherides_vehicles")
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+
+        trait_rows = []
+        tag_rows = []
+        for vehicle_id, traits, tags in rows:
+            trait_rows.extend((vehicle_id, trait) for trait in decode_json_list(traits))
+            tag_rows.extend((vehicle_id, tag) for tag in decode_json_list(tags))
+
+        conn.executemany("INSERT OR IGNORE INTO vehicle_traits (vehicle_id, trait) VALUES (?, ?)", trait_rows)
+        conn.executemany("INSERT OR IGNORE INTO vehicle_tags (vehicle_id, tag) VALUES (?, ?)", tag_rows)
+
+
+def _create_generation_jobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_name TEXT NOT NULL,
+            subfolder TEXT,
+            image_id TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            vehicle_data TEXT NOT NULL,
+            image_hash TEXT,
+            drive_info TEXT,
+            vehicle_id INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            last_error TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            UNIQUE (batch_name, image_id)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_jobs_batch_state ON generation_jobs(batch_name, state, lease_expires)")
+
+
+def _create_drive_folders(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS drive_folders (
+            path TEXT PRIMARY KEY,
+            folder_id TEXT NOT NULL,
+            updated_at TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_drive_folders_folder_id ON drive_folders(folder_id)")
+
+
+def _add_perceptual_hashes(conn):
+    # 16-hex-digit 64-bit pHash; near-duplicate lookups go through
+    # otherides_phash.HammingIndex rather than an SQL index
+    for table in ('otherides_vehicles', 'generation_jobs'):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'phash' not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN phash TEXT")
+
+
+def _add_image_variants(conn):
+    # JSON {'full.png': {'path', 'width', 'height', 'bytes'}, 'preview.webp': ...}
+    for table in ('otherides_vehicles', 'generation_jobs'):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'image_variants' not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN image_variants TEXT")
+
+
+def _create_exports(conn):
+    # One row per metadata export; the newest row for a name is the
+    # watermark that incremental exports continue from
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS exports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            format TEXT NOT NULL,
+            output_file TEXT,
+            filters TEXT,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            last_created_at TEXT,
+            last_vehicle_id INTEGER,
+            exported_at TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_exports_name ON exports(name, id)")
+
+
+def _add_token_id_index(conn):
+    # token_ids are assigned once and must never be handed out twice
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vehicles_token_id ON otherides_vehicles(token_id)")
+
+
+# Vehicle columns that count as rarity attributes (traits come from vehicle_traits)
+RARITY_COLUMNS = ('faction', 'vehicle_type', 'biome', 'style', 'honorary')
+
+
+def rarity_attributes(record):
+    """(trait_type, value) pairs a vehicle record adds to trait_counts"""
+    attributes = {(column, record[column]) for column in RARITY_COLUMNS if record.get(column)}
+    attributes.update(('trait', trait) for trait in decode_json_list(record.get('traits')))
+    return attributes
+
+
+def add_trait_counts(conn, after_id=0):
+    """Count the attributes of vehicles with id > after_id into trait_counts"""
+    for column in RARITY_COLUMNS:
+        conn.execute(f'''
+            INSERT INTO trait_counts (trait_type, value, count)
+            SELECT '{column}', {column}, COUNT(*) FROM otherides_vehicles
+            WHERE id > ? AND {column} IS NOT NULL GROUP BY {column}
+            ON CONFLICT (trait_type, value) DO UPDATE SET count = count + excluded.count
+        ''', (after_id,))
+    conn.execute('''
+        INSERT INTO trait_counts (trait_type, value, count)
+        SELECT 'trait', trait, COUNT(*) FROM vehicle_traits WHERE vehicle_id > ? GROUP BY trait
+        ON CONFLICT (trait_type, value) DO UPDATE SET count = count + excluded.count
+    ''', (after_id,))
+    conn.execute("UPDATE rarity_state SET counts_version = counts_version + 1 WHERE id = 1")
+
+
+def _create_rarity_tables(conn):
+    # trait_counts is updated alongside every vehicle insert (see
+    # VehicleDatabase and shard merges); counts_version tells the cached
+    # scores in vehicle_rarity that they are stale
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trait_counts (
+            trait_type TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (trait_type, value)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vehicle_rarity (
+            vehicle_id INTEGER PRIMARY KEY REFERENCES otherides_vehicles(id) ON DELETE CASCADE,
+            information_content REAL NOT NULL,
+            statistical_rarity REAL NOT NULL,
+            rarity_rank INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vehicle_rarity_rank ON vehicle_rarity(rarity_rank)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rarity_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            counts_version INTEGER NOT NULL DEFAULT 0,
+            scored_version INTEGER,
+            scored_at TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO rarity_state (id, counts_version) VALUES (1, 0)")
+
+    # Backfill from the existing rows
+    conn.execute("DELETE FROM trait_counts")
+    add_trait_counts(conn)
+
+
+def _create_dry_run_tables(conn):
+    # Planned drops from otherides_dryrun: one summary row per named run and
+    # one row per planned vehicle (traits, tags and flags as JSON lists)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dry_runs (
+            name TEXT PRIMARY KEY,
+            batch_name TEXT,
+            vehicles INTEGER NOT NULL,
+            billable_images INTEGER NOT NULL,
+            estimated_usd REAL,
+            estimated_drive_bytes INTEGER,
+            report TEXT,
+            created_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dry_run_plans (
+            run_name TEXT NOT NULL REFERENCES dry_runs(name) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            image_id TEXT NOT NULL,
+            faction TEXT,
+            vehicle_type TEXT,
+            variant TEXT,
+            biome TEXT,
+            style TEXT,
+            camera_view TEXT,
+            lighting TEXT,
+            honorary TEXT,
+            traits TEXT,
+            tags TEXT,
+            prompt TEXT,
+            file_name TEXT,
+            file_path TEXT,
+            cached BOOLEAN DEFAULT FALSE,
+            flags TEXT,
+            PRIMARY KEY (run_name, position)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dry_run_plans_image_id ON dry_run_plans(image_id)")
+
+
+def _add_storage_locations(conn):
+    # JSON {'sha256', 'bytes', 'local': path, 's3': uri, 'archive': 'path#offset+length'}
+    # from otherides_storage
+    for table in ('otherides_vehicles', 'generation_jobs'):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'storage' not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN storage TEXT")
+
+
+def _create_drive_folder_claims(conn):
+    # A process about to look up or create a Drive folder claims its path
+    # here first, so processes sharing the database never create it twice
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS drive_folder_claims (
+            path TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL
+        )
+    ''')
+
+# (version, description, function) - append only, never renumber
+MIGRATIONS = [
+    (1, "Create otherides_vehicles table", _create_vehicles_table),
+    (2, "Index faction, biome, vehicle_type, collection_batch, created_at and image_hash", _add_vehicle_indexes),
+    (3, "Move traits and tags into junction tables", _create_trait_tag_tables),
+    (4, "Add generation_jobs table for resumable collection runs", _create_generation_jobs),
+    (5, "Add drive_folders table caching Drive folder IDs", _create_drive_folders),
+    (6, "Add perceptual hash (phash) columns", _add_perceptual_hashes),
+    (7, "Add image_variants columns for post-processed images", _add_image_variants),
+    (8, "Add exports table for incremental metadata exports", _create_exports),
+    (9, "Add unique index on token_id", _add_token_id_index),
+    (10, "Add trait_counts and vehicle_rarity tables", _create_rarity_tables),
+    (11, "Add dry_runs and dry_run_plans tables", _create_dry_run_tables),
+    (12, "Add storage columns for content-addressed image locations", _add_storage_locations),
+    (13, "Add drive_folder_claims table for cross-process folder creation", _create_drive_folder_claims),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def decode_json_list(value):
+    """Decode a traits/tags column value (JSON text or list), tolerating bad data"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return [str(item) for item in value] if isinstance(value, list) else []
+
+
+def current_version(conn):
+    """Schema version recorded in the database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=None, verbose=False):
+    """Apply pending migrations up to target (default: latest); returns applied versions"""
+    target = SCHEMA_VERSION if target is None else target
+    applied = []
+
+    if conn.in_transaction:
+        conn.commit()
+
+    for version, description, func in MIGRATIONS:
+        if version > target:
+            break
+        if version <= current_version(conn):
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if current_version(conn) >= version:
+                conn.execute("COMMIT")
+                continue
+
+            func(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        applied.append(version)
+        if verbose:
+            print(f"✅ Migration {version}: {description}")
+
+    return applied
+
+
+def main():
+    """Apply or report schema migrations for a database"""
+    db_path = "otherides_assets.db"
+    status_only = "--status" in sys.argv
+
+    if "--db" in sys.argv:
+        index = sys.argv.index("--db")
+        if index + 1 < len(sys.argv):
+            db_path = sys.argv[index + 1]
+
+    try:
+        conn = sqlite3.connect(db_path)
+        version = current_version(conn)
+        print(f"📊 {db_path}: schema version {version} (latest {SCHEMA_VERSION})")
+
+        if status_only:
+            for number, description, _ in MIGRATIONS:
+                marker = "✅" if number <= version else "⏳"
+                print(f"   {marker} {number}: {description}")
+        elif version >= SCHEMA_VERSION:
+            print("✅ Schema is up to date")
+        else:
+            migrate(conn, verbose=True)
+
+        conn.close()
+
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Sharded collection runs and shard database merging
+
+A collection plan is split by a stable hash of each vehicle's image_id, so K
+processes or machines given the same specs and seed each generate a
+disjoint slice into their own SQLite file. merge_shards() then folds those
+files into the main database with ATTACH, skipping rows that were already
+merged and reporting image_id conflicts and duplicate images.
+
+Usage: python otherides_shard.py merge [--db <path>] <shard.db> [<shard.db> ...]
+"""
+
+import hashlib
+import sqlite3
+import sys
+from pathlib import Path
+
+from otherides_schema import add_trait_counts, migrate
+
+
+def shard_for(image_id, shards):
+    """Shard index for an image_id (stable across processes and hosts)"""
+    digest = hashlib.sha1(image_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def in_shard(image_id, shards, shard_index):
+    """True if image_id belongs to shard_index of shards"""
+    return shards <= 1 or shard_for(image_id, shards) == shard_index
+
+
+def select_shard(vehicles, shards, shard_index):
+    """The prepared vehicles belonging to one shard"""
+    if shards < 1 or not 0 <= shard_index < shards:
+        raise ValueError(f"shard index {shard_index} is out of range for {shards} shards")
+    return [vehicle for vehicle in vehicles if in_shard(vehicle['image_id'], shards, shard_index)]
+
+
+def shard_db_path(db_path, shards, shard_index):
+    """Per-shard database file next to db_path, e.g. otherides_assets.shard-2-of-4.db"""
+    if shards <= 1:
+        return db_path
+    path = Path(db_path)
+    return str(path.with_name(f"{path.stem}.shard-{shard_index}-of-{shards}{path.suffix}"))
+
+
+# Not copied from shards: row ids differ per file, and token_ids (plus the
+# OpenSea metadata written for them) are handed out by the main database
+# after the merge, since every shard numbers its own tokens from 1
+SHARD_LOCAL_COLUMNS = ('id', 'token_id', 'opensea_ready')
+
+
+def _columns(conn, schema):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(otherides_vehicles)")]
+
+
+def merge_shard(conn, shard_path):
+    """Merge one shard file into the database open on conn
+
+    Rows whose image_id is already present with the same image_hash were
+    merged before and are skipped; a different hash is a conflict and the
+    main database's row is kept. Rows whose image is byte-identical to a
+    vehicle with another image_id are merged but reported. Merged rows get
+    no token_id; assign_token_ids() (build_metadata) numbers them later.
+    """
+    # Bring the shard's schema up to date so the column lists line up
+    shard_conn = sqlite3.connect(shard_path)
+    try:
+        migrate(shard_conn)
+    finally:
+        shard_conn.close()
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = _merge_attached(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute("DETACH DATABASE shard")
+
+    result['shard'] = shard_path
+    return result
+
+
+def _merge_attached(conn):
+    conflicts = conn.execute('''
+        SELECT s.image_id, m.image_hash, s.image_hash
+        FROM shard.otherides_vehicles s
+        JOIN main.otherides_vehicles m ON m.image_id = s.image_id
+        WHERE m.image_hash IS NOT s.image_hash
+    ''').fetchall()
+    already_present = conn.execute('''
+        SELECT COUNT(*) FROM shard.otherides_vehicles s
+        JOIN main.otherides_vehicles m ON m.image_id = s.image_id
+        WHERE m.image_hash IS s.image_hash
+    ''').fetchone()[0]
+    # Same image bytes under another image_id, in the main database or this shard
+    duplicate_images = conn.execute('''
+        SELECT s.image_id, MIN(other.image_id)
+        FROM shard.otherides_vehicles s
+        JOIN (
+            SELECT image_id, image_hash FROM main.otherides_vehicles
+            UNION ALL
+            SELECT image_id, image_hash FROM shard.otherides_vehicles
+        ) other ON other.image_hash = s.image_hash AND other.image_id != s.image_id
+        WHERE s.image_hash IS NOT NULL
+          AND s.image_id NOT IN (SELECT image_id FROM main.otherides_vehicles)
+        GROUP BY s.image_id
+    ''').fetchall()
+
+    shard_columns = set(_columns(conn, 'shard'))
+    columns = ', '.join(c for c in _columns(conn, 'main') if c not in SHARD_LOCAL_COLUMNS and c in shard_columns)
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM main.otherides_vehicles").fetchone()[0]
+    merged = conn.execute(f'''
+        INSERT INTO main.otherides_vehicles ({columns})
+        SELECT {columns} FROM shard.otherides_vehicles
+        WHERE image_id NOT IN (SELECT image_id FROM main.otherides_vehicles)
+        ORDER BY id
+    ''').rowcount
+
+    # Junction rows follow their vehicle by image_id, since row ids differ
+    # per file; only rows merged just now, so a conflicting shard row's
+    # traits never land on the main database's vehicle
+    for table, column in (('vehicle_traits', 'trait'), ('vehicle_tags', 'tag')):
+        conn.execute(f'''
+            INSERT OR IGNORE INTO main.{table} (vehicle_id, {column})
+            SELECT m.id, t.{column}
+            FROM shard.{table} t
+            JOIN shard.otherides_vehicles s ON s.id = t.vehicle_id
+            JOIN main.otherides_vehicles m ON m.image_id = s.image_id
+            WHERE m.id > ?
+        ''', (last_id,))
+    if merged:
+        add_trait_counts(conn, last_id)
+
+    return {
+        'merged': merged,
+        'already_present': already_present,
+        'conflicts': [
+            {'image_id': image_id, 'main_hash': main_hash, 'shard_hash': shard_hash}
+            for image_id, main_hash, shard_hash in conflicts
+        ],
+        'duplicate_images': [
+            {'image_id': image_id, 'duplicate_of': other} for image_id, other in duplicate_images
+        ],
+    }
+
+
+def merge_shards(db_path, shard_paths):
+    """Merge shard files into db_path; returns one summary per shard"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        migrate(conn)
+        return [merge_shard(conn, str(path)) for path in shard_paths]
+    finally:
+        conn.close()
+
+
+def main():
+    """Merge per-shard databases into the main database"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge sharded OTHERIDES databases")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    merge = subparsers.add_parser('merge', help="merge shard databases into the main database")
+    merge.add_argument('--db', default="otherides_assets.db")
+    merge.add_argument('shards', nargs='+')
+    args = parser.parse_args()
+
+    missing = [path for path in args.shards if not Path(path).exists()]
+    if missing:
+        print(f"❌ Shard files not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    try:
+        results = merge_shards(args.db, args.shards)
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+    for result in results:
+        print(f"✅ {result['shard']}: {result['merged']} merged, {result['already_present']} already present")
+        for conflict in result['conflicts']:
+            print(f"   ⚠️ {conflict['image_id']}: different image already in {args.db} (kept existing)")
+        for duplicate in result['duplicate_images']:
+            print(f"   ⚠️ {duplicate['image_id']}: same image as {duplicate['duplicate_of']}")
+
+    total = sum(result['merged'] for result in results)
+    print(f"📊 Merged {total} vehicles from {len(results)} shards into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Storage backends for saved OTHERIDES vehicle images
+
+Every image the generator saves goes to each sink of a StorageSet:
+
+- LocalContentStore: content-addressed files on disk. Each distinct image is
+  stored once at <root>/objects/<sha256[:2]>/<sha256[2:4]>/<sha256>.png
+  (written to a temp file and renamed into place), and the browsable tree
+  <root>/Otherides_Moodboards/<Faction>/<image_id>.png is made of hard links
+  to those objects - so a vehicle's file_path is a real directory and
+  identical images take up disk space once
+- S3Store: any S3-compatible object store (AWS S3, MinIO, R2...) through the
+  optional boto3 package, under content-addressed keys; objects that are
+  already there are not uploaded again
+- DriveStore: the Google Drive collection folders the generator has always
+  uploaded to, now one optional sink among others
+- otherides_archive.ArchiveStore: a packed, memory-mapped archive keyed by
+  image_id for tools that read many images at once
+
+StorageSet.from_env() builds the set from:
+
+    OTHERIDES_STORAGE=local,drive   sinks to use, any of local, s3, archive, drive (default local,drive)
+    OTHERIDES_STORAGE_DIR=path      root of the local store unless one is passed (default otherides_assets)
+    OTHERIDES_S3_BUCKET=bucket      bucket for the s3 sink
+    OTHERIDES_S3_PREFIX=prefix      key prefix inside the bucket (default otherides/)
+    OTHERIDES_S3_ENDPOINT=url       endpoint of an S3-compatible server, e.g. http://127.0.0.1:9000
+    OTHERIDES_ARCHIVE=path          data file of the archive sink (default otherides_assets/otherides.pack)
+
+Usage: python otherides_storage.py [--root DIR] [--verify]
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from otherides_postprocess import write_atomic
+
+DEFAULT_STORAGE = 'local,drive'
+DEFAULT_STORAGE_DIR = 'otherides_assets'
+DEFAULT_S3_PREFIX = 'otherides/'
+
+# Default for a local store root that wasn't passed: OTHERIDES_STORAGE_DIR,
+# else DEFAULT_STORAGE_DIR (an explicit None still means no local store)
+FROM_ENV = object()
+
+
+def _object_name(digest, suffix='.png'):
+    """Fan-out path of a content-addressed object, relative to the objects directory"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+
+
+class StorageBackend(ABC):
+    """A sink for saved images; put() returns where the image went (None if it didn't)"""
+
+    name = None
+
+    @abstractmethod
+    def put(self, data, digest, file_name, folder, batch_name=None, subfolder=None):
+        """Store data (bytes with SHA-256 hex digest) as folder/file_name"""
+
+
+class LocalContentStore(StorageBackend):
+    """Content-addressed objects on disk, hard-linked into a browsable folder tree"""
+
+    name = 'local'
+
+    def __init__(self, root=DEFAULT_STORAGE_DIR):
+        # Absolute so stored file_paths stay valid from any working directory
+        self.root = Path(root).absolute()
+        self.objects_dir = self.root / 'objects'
+        self.deduplicated = 0
+
+    def object_path(self, digest):
+        """Where the object with this SHA-256 lives (whether or not it exists yet)"""
+        return self.objects_dir / _object_name(digest)
+
+    def put(self, data, digest, file_name, folder, batch_name=None, subfolder=None):
+        """Write the object if it's new, then link it in as folder/file_name; returns the link path"""
+        blob = self.object_path(digest)
+        if blob.exists():
+            self.deduplicated += 1
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(blob, data)
+
+        path = self.root / folder.strip('/') / file_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._link(blob, path)
+        return str(path)
+
+    def _link(self, blob, path):
+        """Point path at blob via a hard link, replacing whatever was there atomically"""
+        try:
+            if os.path.samefile(blob, path):
+                return
+        except FileNotFoundError:
+            pass
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        os.close(fd)
+        os.unlink(tmp_path)
+        try:
+            os.link(blob, tmp_path)
+        except OSError:
+            # Filesystem without hard links (or objects on another device): keep a copy
+            write_atomic(path, blob.read_bytes())
+            return
+        try:
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def open(self, digest):
+        """Stored object contents as a BytesIO (None if it isn't stored)"""
+        try:
+            return io.BytesIO(self.object_path(digest).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def verify(self):
+        """(objects checked, paths whose contents no longer match their name)"""
+        checked = 0
+        corrupt = []
+        for path in self.objects_dir.glob('*/*/*.png'):
+            checked += 1
+            if hashlib.sha256(path.read_bytes()).hexdigest() != path.stem:
+                corrupt.append(path)
+        return checked, corrupt
+
+    def stats(self):
+        """Objects, bytes on disk and linked file names in the store"""
+        objects = 0
+        object_bytes = 0
+        for path in self.objects_dir.glob('*/*/*.png'):
+            stat = path.stat()
+            objects += 1
+            object_bytes += stat.st_size
+        links = sum(1 for path in self.root.rglob('*.png') if self.objects_dir not in path.parents)
+        return {'objects': objects, 'bytes': object_bytes, 'files': links}
+
+
+def _is_missing(error):
+    """True for a botocore ClientError meaning the object doesn't exist"""
+    response = getattr(error, 'response', None) or {}
+    return str(response.get('Error', {}).get('Code')) in ('404', 'NoSuchKey', 'NotFound')
+
+
+class S3Store(StorageBackend):
+    """Content-addressed objects in an S3-compatible bucket (requires boto3)"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix=DEFAULT_S3_PREFIX, endpoint_url=None, region_name=None, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self._client = client
+        self.deduplicated = 0
+
+    @property
+    def client(self):
+        """boto3 S3 client, created on first use"""
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("The s3 storage backend needs boto3 (pip install boto3)") from None
+            self._client = boto3.client('s3', endpoint_url=self.endpoint_url, region_name=self.region_name)
+        return self._client
+
+    def key_for(self, digest):
+        return f"{self.prefix}objects/{_object_name(digest)}"
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception as e:
+            if _is_missing(e):
+                return False
+            raise
+
+    def put(self, data, digest, file_name, folder, batch_name=None, subfolder=None):
+        """Upload the object unless the bucket already has it; returns its s3:// URI"""
+        key = self.key_for(digest)
+        if self.exists(key):
+            self.deduplicated += 1
+        else:
+            self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=data, ContentType='image/png',
+                Metadata={'sha256': digest, 'file-name': file_name}
+            )
+        return f"s3://{self.bucket}/{key}"
+
+    def open(self, digest):
+        """Stored object contents as a BytesIO (None if it isn't stored)"""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key_for(digest))
+        except Exception as e:
+            if _is_missing(e):
+                return None
+            raise
+        return io.BytesIO(response['Body'].read())
+
+
+class DriveStore(StorageBackend):
+    """The generator's Google Drive collection folders (skipped while Drive is unavailable)"""
+
+    name = 'drive'
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def put(self, data, digest, file_name, folder, batch_name=None, subfolder=None):
+        """Upload into the batch's collection folder; returns the Drive file info"""
+        return self.generator._upload_vehicle_image(io.BytesIO(data), file_name, batch_name, subfolder)
+
+
+class StorageSet:
+    """Writes each saved image to every configured backend"""
+
+    def __init__(self, backends, telemetry=None):
+        self.backends = list(backends)
+        self.telemetry = telemetry
+
+    @classmethod
+    def from_env(cls, generator=None, root=FROM_ENV, telemetry=None):
+        """Backends named by OTHERIDES_STORAGE; root=None drops the local store"""
+        names = [name.strip() for name in (os.getenv("OTHERIDES_STORAGE") or DEFAULT_STORAGE).split(',') if name.strip()]
+        unknown = set(names) - {'local', 's3', 'archive', 'drive'}
+        if unknown:
+            raise ValueError(f"Unknown storage backends: {', '.join(sorted(unknown))}")
+
+        if root is FROM_ENV:
+            root = os.getenv("OTHERIDES_STORAGE_DIR") or DEFAULT_STORAGE_DIR
+        backends = []
+        if 'local' in names and root:
+            backends.append(LocalContentStore(root))
+        if 's3' in names:
+            bucket = os.getenv("OTHERIDES_S3_BUCKET")
+            if not bucket:
+                raise ValueError("OTHERIDES_STORAGE includes s3 but OTHERIDES_S3_BUCKET is not set")
+            backends.append(S3Store(bucket, prefix=os.getenv("OTHERIDES_S3_PREFIX", DEFAULT_S3_PREFIX),
+                                    endpoint_url=os.getenv("OTHERIDES_S3_ENDPOINT")))
+        if 'archive' in names:
+            from otherides_archive import DEFAULT_ARCHIVE, ArchiveStore
+            backends.append(ArchiveStore(os.getenv("OTHERIDES_ARCHIVE") or DEFAULT_ARCHIVE))
+        if 'drive' in names and generator is not None:
+            backends.append(DriveStore(generator))
+        return cls(backends, telemetry)
+
+    def get(self, name):
+        """The backend called name (None if it isn't configured)"""
+        return next((backend for backend in self.backends if backend.name == name), None)
+
+    @property
+    def local(self):
+        return self.get('local')
+
+    def put(self, image_data, file_name, folder, batch_name=None, subfolder=None):
+        """Store an image (file-like) everywhere; returns {'sha256', 'bytes', <backend>: location}
+
+        A failing backend is reported and skipped, like a failed Drive upload
+        always was, so one sink being down never loses the vehicle.
+        """
+        image_data.seek(0)
+        data = image_data.read()
+        image_data.seek(0)
+        digest = hashlib.sha256(data).hexdigest()
+
+        stored = {'sha256': digest, 'bytes': len(data)}
+        for backend in self.backends:
+            try:
+                if self.telemetry and backend.name != 'drive':
+                    # Drive uploads are already timed as the 'upload' stage
+                    with self.telemetry.timer(f"store_{backend.name}", file_name=file_name):
+                        location = backend.put(data, digest, file_name, folder, batch_name, subfolder)
+                else:
+                    location = backend.put(data, digest, file_name, folder, batch_name, subfolder)
+            except Exception as e:
+                if self.telemetry and backend.name != 'drive':
+                    self.telemetry.error(f"store_{backend.name}", e, file_name=file_name)
+                print(f"Error storing {file_name} in {backend.name} storage: {e}")
+                location = None
+            if location:
+                stored[backend.name] = location
+        return stored
+
+
+def stored_file_path(stored, file_path):
+    """Directory of the locally stored file (with a trailing slash), else file_path unchanged"""
+    local = (stored or {}).get('local')
+    return os.path.dirname(local) + os.sep if local else file_path
+
+
+def main():
+    """Summarize (and optionally verify) the local content-addressed store"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the OTHERIDES local asset store")
+    parser.add_argument('--root', default=os.getenv("OTHERIDES_STORAGE_DIR") or DEFAULT_STORAGE_DIR)
+    parser.add_argument('--verify', action='store_true', help="re-hash every object")
+    args = parser.parse_args()
+
+    store = LocalContentStore(args.root)
+    stats = store.stats()
+    print(f"🗄️  {store.root}: {stats['objects']} objects ({stats['bytes'] / 1024 ** 2:.1f} MB) "
+          f"behind {stats['files']} file names")
+
+    if args.verify:
+        checked, corrupt = store.verify()
+        if corrupt:
+            for path in corrupt:
+                print(f"   ❌ {path} does not match its SHA-256")
+            raise SystemExit(1)
+        print(f"   ✅ {checked} objects verified")
+
+
+if __name__ == "__main__":
+    main()
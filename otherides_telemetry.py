@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and error telemetry for OTHERIDES generation runs
+
+The generator wraps each step of a vehicle (prompt build, image API call,
+download, hashing, post-processing, Drive upload, database insert) in
+telemetry.timer(stage). Durations go into per-stage totals and Prometheus
+histogram buckets, and exceptions are counted by stage and error class.
+The data is available as:
+
+- a per-batch summary of where the wall-clock time went (batch() / report())
+- Prometheus text format (prometheus_text(), a dump file or a /metrics endpoint)
+- JSON-lines structured logs, one event per timed step or error
+
+Configured from the environment by Telemetry.from_env():
+
+    OTHERIDES_TELEMETRY=0         no-op mode (NullTelemetry)
+    OTHERIDES_TELEMETRY_LOG=path  append JSON-lines events to path
+    OTHERIDES_METRICS_FILE=path   write Prometheus text to path on close()
+    OTHERIDES_METRICS_PORT=port   serve Prometheus text on http://127.0.0.1:port/metrics
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Histogram upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DISABLED_VALUES = ('0', 'false', 'off', 'no')
+
+
+class _StageTimer:
+    """Context manager timing one stage; exceptions are counted and re-raised"""
+
+    __slots__ = ('telemetry', 'stage', 'fields', 'started')
+
+    def __init__(self, telemetry, stage, fields):
+        self.telemetry = telemetry
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry.record(self.stage, time.perf_counter() - self.started, exc, **self.fields)
+        return False
+
+
+class _StageStats:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def copy(self):
+        stats = _StageStats()
+        stats.count, stats.total, stats.max, stats.buckets = self.count, self.total, self.max, list(self.buckets)
+        return stats
+
+
+class _Counters:
+    """Stage stats and (stage, error class) counts for a run or one batch"""
+
+    __slots__ = ('stages', 'errors')
+
+    def __init__(self):
+        self.stages = {}
+        self.errors = {}
+
+    def add(self, stage, seconds=None, error=None):
+        if seconds is not None:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = _StageStats()
+            stats.add(seconds)
+        if error is not None:
+            key = (stage, type(error).__name__)
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Telemetry:
+    """Stage timers, error counters, batch summaries and metric exports"""
+
+    enabled = True
+
+    def __init__(self, log_path=None, metrics_path=None):
+        self.log_path = log_path
+        self.metrics_path = metrics_path
+        self.batches = []
+
+        self._lock = threading.Lock()
+        self._totals = _Counters()
+        # Counters of the batch() blocks currently open
+        self._scopes = []
+        self._log_file = None
+        self._server = None
+
+    @classmethod
+    def from_env(cls):
+        """Telemetry configured by the OTHERIDES_TELEMETRY* / OTHERIDES_METRICS_* variables"""
+        if os.getenv("OTHERIDES_TELEMETRY", "").lower() in DISABLED_VALUES:
+            return NullTelemetry()
+
+        telemetry = cls(log_path=os.getenv("OTHERIDES_TELEMETRY_LOG"),
+                        metrics_path=os.getenv("OTHERIDES_METRICS_FILE"))
+        port = os.getenv("OTHERIDES_METRICS_PORT")
+        if port and port.isdigit():
+            telemetry.serve(int(port))
+        return telemetry
+
+    def timer(self, stage, **fields):
+        """Time a block as one call of stage; extra fields go into the log event"""
+        return _StageTimer(self, stage, fields)
+
+    def record(self, stage, seconds, error=None, **fields):
+        """Add a timed call of stage (and count error, if the call raised one)"""
+        with self._lock:
+            self._totals.add(stage, seconds, error)
+            for scope in self._scopes:
+                scope.add(stage, seconds, error)
+
+        if self.log_path:
+            event = {'event': 'stage', 'stage': stage, 'seconds': round(seconds, 6), **fields}
+            if error is not None:
+                event['error'] = type(error).__name__
+                event['message'] = str(error)
+            self._log(event)
+
+    def error(self, stage, error, **fields):
+        """Count an error that was handled inside a stage (so the timer never saw it)"""
+        with self._lock:
+            self._totals.add(stage, error=error)
+            for scope in self._scopes:
+                scope.add(stage, error=error)
+
+        if self.log_path:
+            self._log({'event': 'error', 'stage': stage, 'error': type(error).__name__,
+                       'message': str(error), **fields})
+
+    def _log(self, event):
+        line = json.dumps({'ts': datetime.now().isoformat(), **event}, default=str)
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, 'a', buffering=1)
+            self._log_file.write(line + "\n")
+
+    def snapshot(self):
+        """Copy of the run's stage stats and error counts"""
+        with self._lock:
+            return {name: stats.copy() for name, stats in self._totals.stages.items()}, dict(self._totals.errors)
+
+    def summary(self, counters=None, wall_seconds=None):
+        """Per-stage calls, time and errors for the run (or a batch's counters)
+
+        share is a stage's total time over the wall-clock time; concurrent
+        stages overlap, so shares can add up to more than 100%.
+        """
+        if counters is None:
+            stages, errors = self.snapshot()
+        else:
+            with self._lock:
+                stages, errors = dict(counters.stages), dict(counters.errors)
+
+        rows = {}
+        for name, stats in stages.items():
+            rows[name] = {
+                'stage': name,
+                'calls': stats.count,
+                'seconds': round(stats.total, 4),
+                'mean_ms': round(stats.total / stats.count * 1000, 3),
+                'max_ms': round(stats.max * 1000, 3),
+                'share': round(stats.total / wall_seconds, 4) if wall_seconds else None,
+                'errors': {},
+            }
+        for (stage, error), count in errors.items():
+            # Errors can come from stages that were never timed
+            row = rows.setdefault(stage, {'stage': stage, 'calls': 0, 'seconds': 0.0, 'mean_ms': 0.0,
+                                          'max_ms': 0.0, 'share': None, 'errors': {}})
+            row['errors'][error] = count
+        return sorted(rows.values(), key=lambda row: row['seconds'], reverse=True)
+
+    @contextmanager
+    def batch(self, name):
+        """Summarize the stage time spent inside the block as one batch"""
+        scope = _Counters()
+        with self._lock:
+            self._scopes.append(scope)
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            wall_seconds = time.perf_counter() - started
+            with self._lock:
+                self._scopes.remove(scope)
+            summary = {
+                'batch': name,
+                'wall_seconds': round(wall_seconds, 4),
+                'stages': self.summary(scope, wall_seconds),
+            }
+            with self._lock:
+                self.batches.append(summary)
+            if self.log_path:
+                self._log({'event': 'batch', **summary})
+
+    def prometheus_text(self):
+        """All counters in the Prometheus text exposition format"""
+        stages, errors = self.snapshot()
+        lines = [
+            "# HELP otherides_stage_seconds Time spent in each generation stage",
+            "# TYPE otherides_stage_seconds histogram",
+        ]
+        for name, stats in sorted(stages.items()):
+            label = f'stage="{_escape(name)}"'
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, '+Inf'), stats.buckets):
+                cumulative += count
+                lines.append(f'otherides_stage_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"otherides_stage_seconds_sum{{{label}}} {stats.total:.6f}")
+            lines.append(f"otherides_stage_seconds_count{{{label}}} {stats.count}")
+
+        lines += [
+            "# HELP otherides_stage_errors_total Errors raised in each generation stage, by error class",
+            "# TYPE otherides_stage_errors_total counter",
+        ]
+        for (stage, error), count in sorted(errors.items()):
+            lines.append(f'otherides_stage_errors_total{{stage="{_escape(stage)}",error="{_escape(error)}"}} {count}')
+
+        with self._lock:
+            batches = list(self.batches)
+        if batches:
+            lines += [
+                "# HELP otherides_batch_wall_seconds Wall-clock time of each finished batch",
+                "# TYPE otherides_batch_wall_seconds gauge",
+            ]
+            for batch in batches:
+                lines.append(f'otherides_batch_wall_seconds{{batch="{_escape(batch["batch"])}"}} {batch["wall_seconds"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path=None):
+        """Dump prometheus_text() to a file (e.g. for node_exporter's textfile collector)"""
+        from otherides_postprocess import write_atomic
+
+        path = Path(path or self.metrics_path)
+        write_atomic(path, self.prometheus_text().encode('utf-8'))
+        return path
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serve prometheus_text() at http://host:port/metrics from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def report(self):
+        """Print where the wall-clock time of each batch went"""
+        with self._lock:
+            batches = list(self.batches)
+        if not batches:
+            batches = [{'batch': 'this run', 'wall_seconds': None, 'stages': self.summary()}]
+
+        for batch in batches:
+            if not batch['stages']:
+                continue
+            wall = f" ({batch['wall_seconds']:.1f}s wall clock)" if batch['wall_seconds'] else ""
+            print(f"📈 Stage timings for {batch['batch']}{wall}:")
+            print(f"   {'stage':<14} {'calls':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'of wall':>8}  errors")
+            for row in batch['stages']:
+                share = f"{row['share']:.0%}" if row['share'] is not None else "-"
+                errors = ', '.join(f"{error} x{count}" for error, count in row['errors'].items()) or "0"
+                print(f"   {row['stage']:<14} {row['calls']:>6} {row['seconds']:>9.2f} {row['mean_ms']:>9.1f} "
+                      f"{row['max_ms']:>9.1f} {share:>8}  {errors}")
+
+    def close(self):
+        """Write the metrics file (if configured), close the log and stop the endpoint"""
+        if self.metrics_path:
+            self.write_metrics()
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullTelemetry:
+    """Drop-in Telemetry that records nothing (one shared no-op timer per call)"""
+
+    enabled = False
+    batches = ()
+
+    def timer(self, stage, **fields):
+        return _NULL_TIMER
+
+    def record(self, stage, seconds, error=None, **fields):
+        pass
+
+    def error(self, stage, error, **fields):
+        pass
+
+    @contextmanager
+    def batch(self, name):
+        yield self
+
+    def summary(self, counters=None, wall_seconds=None):
+        return []
+
+    def prometheus_text(self):
+        return ""
+
+    def report(self):
+        pass
+
+    def close(self):
+        pass
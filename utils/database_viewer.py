@@ -5,9 +5,17 @@ Utility to view and manage the OTHERIDES vehicle database
 
 import sqlite3
 import json
+import itertools
 from datetime import datetime
 import sys
 import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from otherides_schema import migrate, current_version, SCHEMA_VERSION
+from otherides_db import VehicleDatabase
+from otherides_naming import ImageIdIndex
+from otherides_phash import DEFAULT_MAX_DISTANCE, HammingIndex
+from otherides_rarity import refresh_rarity, top_vehicles, trait_frequencies
 
 def view_all_vehicles(db_path="otherides_assets.db"):
     """Display all vehicles in the database"""
@@ -120,59 +128,278 @@ def view_biome_distribution(db_path="otherides_assets.db"):
     except sqlite3.Error as e:
         print(f"❌ Database error: {e}")
 
-def export_metadata(db_path="otherides_assets.db", output_file=None):
-    """Export all vehicle metadata to JSON"""
+def view_trait_rarity(db_path="otherides_assets.db"):
+    """Display trait counts and rarity across the collection"""
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM otherides_vehicles ORDER BY created_at DESC")
-        vehicles = cursor.fetchall()
-        columns = [description[0] for description in cursor.description]
+        if current_version(conn) < 10:
+            print("❌ Trait count tables missing - run 'python database_viewer.py migrate' first")
+            conn.close()
+            return
         
-        if not vehicles:
-            print("💭 No vehicles to export.")
+        total = cursor.execute("SELECT COUNT(*) FROM otherides_vehicles").fetchone()[0]
+        stats = trait_frequencies(conn, 'trait')
+        
+        if not stats:
+            print("💭 No trait statistics available.")
             return
         
-        # Convert to list of dictionaries
-        vehicle_list = []
-        for vehicle in vehicles:
-            vehicle_dict = dict(zip(columns, vehicle))
-            
-            # Parse JSON fields
-            if vehicle_dict.get('traits'):
-                try:
-                    vehicle_dict['traits'] = json.loads(vehicle_dict['traits'])
-                except json.JSONDecodeError:
-                    pass
-            
-            if vehicle_dict.get('tags'):
-                try:
-                    vehicle_dict['tags'] = json.loads(vehicle_dict['tags'])
-                except json.JSONDecodeError:
-                    pass
-            
-            vehicle_list.append(vehicle_dict)
+        print("🧬 Trait Rarity (rarest first)")
+        print("="*45)
         
-        # Create export data
-        export_data = {
-            'export_timestamp': datetime.now().isoformat(),
-            'total_vehicles': len(vehicle_list),
-            'vehicles': vehicle_list
-        }
+        for _, trait, count, frequency in stats:
+            print(f"   {trait:<28} {count:>5} ({frequency * 100:5.1f}%)")
         
-        # Determine output filename
-        if not output_file:
-            output_file = f"otherides_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        print(f"\n   Total Vehicles: {total}")
+        
+        conn.close()
+        
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+
+def view_rarity_ranks(db_path="otherides_assets.db", limit=20):
+    """Display the rarest vehicles by information content"""
+    try:
+        conn = sqlite3.connect(db_path)
+        
+        if current_version(conn) < 10:
+            print("❌ Rarity tables missing - run 'python database_viewer.py migrate' first")
+            conn.close()
+            return
+        
+        started = datetime.now()
+        refreshed = refresh_rarity(conn)
+        elapsed = (datetime.now() - started).total_seconds()
+        ranks = top_vehicles(conn, limit, refresh=False)
+        conn.close()
+        
+        if not ranks:
+            print("💭 No vehicles to rank.")
+            return
+        
+        print(f"💎 Rarest {len(ranks)} Vehicles (information content, higher is rarer)")
+        print("="*60)
+        
+        for rank, image_id, token_id, information_content, statistical_rarity in ranks:
+            token = f"#{token_id}" if token_id is not None else "-"
+            print(f"   {rank:>5}. {image_id:<42} {token:>7} {information_content:7.2f} bits  "
+                  f"(1 in {1 / statistical_rarity:,.0f})")
+        
+        status = f"recomputed in {elapsed:.2f}s" if refreshed else "cached, counts unchanged"
+        print(f"\n   Scores {status}")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+
+def view_free_names(db_path="otherides_assets.db"):
+    """Display how many variant names are still unused per faction and type"""
+    try:
+        db = VehicleDatabase(db_path)
+        
+        if current_version(db.connection) < 4:
+            print("❌ Job tables missing - run 'python database_viewer.py migrate' first")
+            db.close()
+            return
+        
+        ImageIdIndex(db).report()
+        db.close()
+        
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+
+def dedupe_collection(db_path="otherides_assets.db", max_distance=DEFAULT_MAX_DISTANCE):
+    """Display groups of visually near-identical vehicles (by perceptual hash)"""
+    try:
+        conn = sqlite3.connect(db_path)
+        
+        if current_version(conn) < 6:
+            print("❌ Perceptual hash column missing - run 'python database_viewer.py migrate' first")
+            conn.close()
+            return
         
-        # Write to file
-        with open(output_file, 'w') as f:
-            json.dump(export_data, f, indent=2)
+        started = datetime.now()
+        index = HammingIndex.from_database(conn)
+        groups = index.duplicate_groups(max_distance)
+        elapsed = (datetime.now() - started).total_seconds()
+        unhashed = conn.execute("SELECT COUNT(*) FROM otherides_vehicles WHERE phash IS NULL").fetchone()[0]
+        conn.close()
+        
+        print(f"🔍 Near-Duplicate Vehicles (within {max_distance} bits)")
+        print("="*45)
+        
+        if not groups:
+            print("💭 No near-duplicates found.")
+        
+        for number, group in enumerate(sorted(groups, key=len, reverse=True), 1):
+            print(f"   Group {number} ({len(group)} vehicles):")
+            for image_id in sorted(group):
+                print(f"      {image_id}")
+        
+        duplicates = sum(len(group) - 1 for group in groups)
+        print(f"\n   Checked {len(index)} vehicles in {elapsed:.2f}s: "
+              f"{len(groups)} groups, {duplicates} vehicles could be dropped")
+        if unhashed:
+            print(f"   {unhashed} vehicles have no perceptual hash (saved before it was recorded)")
+        
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+
+def migrate_database(db_path="otherides_assets.db"):
+    """Upgrade the database schema to the latest version"""
+    try:
+        conn = sqlite3.connect(db_path)
+        version = current_version(conn)
+        
+        if version >= SCHEMA_VERSION:
+            print(f"✅ Schema is up to date (version {version})")
+        else:
+            print(f"🔧 Migrating schema from version {version} to {SCHEMA_VERSION}")
+            migrate(conn, verbose=True)
+        
+        conn.close()
+        
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+
+# --filter name -> WHERE clause on otherides_vehicles
+EXPORT_FILTERS = {
+    'faction': "faction = ?",
+    'biome': "biome = ?",
+    'vehicle_type': "vehicle_type = ?",
+    'batch': "collection_batch = ?",
+    'since': "created_at >= ?",
+    'until': "created_at < ?",
+}
+
+# Columns stored as JSON text, decoded row by row on export
+EXPORT_JSON_COLUMNS = ('traits', 'tags', 'image_variants')
+
+def _last_export(conn, export_name):
+    """Highest vehicle id written by the newest export with this name (None if there was none)"""
+    row = conn.execute(
+        "SELECT last_vehicle_id FROM exports WHERE name = ? AND last_vehicle_id IS NOT NULL "
+        "ORDER BY id DESC LIMIT 1",
+        (export_name,)
+    ).fetchone()
+    return row[0] if row else None
+
+def iter_vehicles(conn, filters=None, after=None, batch_size=1000):
+    """Yield vehicle dicts (JSON columns decoded) one fetchmany batch at a time
+    
+    after is a vehicle id watermark; only rows inserted later are returned.
+    The AUTOINCREMENT id only ever grows, unlike created_at: merged shards
+    keep their original timestamps and batched inserts are stamped before
+    they commit, so a created_at watermark would skip such rows for good.
+    """
+    clauses = []
+    params = []
+    for key, value in (filters or {}).items():
+        if key not in EXPORT_FILTERS:
+            raise ValueError(f"Unknown export filter '{key}'; expected one of {', '.join(EXPORT_FILTERS)}")
+        clauses.append(EXPORT_FILTERS[key])
+        params.append(value)
+    if after is not None:
+        clauses.append("id > ?")
+        params.append(after)
+    
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor = conn.execute(f"SELECT * FROM otherides_vehicles {where} ORDER BY created_at DESC, id DESC", params)
+    columns = [description[0] for description in cursor.description]
+    
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            vehicle = dict(zip(columns, row))
+            for column in EXPORT_JSON_COLUMNS:
+                if vehicle.get(column):
+                    try:
+                        vehicle[column] = json.loads(vehicle[column])
+                    except json.JSONDecodeError:
+                        pass
+            yield vehicle
+
+def export_metadata(db_path="otherides_assets.db", output_file=None, output_format="json",
+                    filters=None, since_last=False, export_name="default", batch_size=1000):
+    """Stream vehicle metadata to a JSON document or NDJSON file
+    
+    Rows are read with fetchmany and written one at a time, so memory use
+    does not grow with the collection. With since_last, only vehicles
+    inserted after the previous export of the same name are written.
+    
+    The vehicles are read through a read-only connection; only the
+    exports log row is written. An out-of-date schema is reported rather
+    than migrated (run the migrate command first).
+    """
+    if output_format not in ("json", "ndjson"):
+        print(f"❌ Unknown export format: {output_format} (use json or ndjson)")
+        return
+    
+    try:
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        version = current_version(conn)
+        if version < SCHEMA_VERSION:
+            print(f"❌ Schema is at version {version}, export needs {SCHEMA_VERSION} - "
+                  f"run 'python database_viewer.py migrate' first")
+            conn.close()
+            return
         
-        print(f"✅ Exported {len(vehicle_list)} vehicles to {output_file}")
+        after = _last_export(conn, export_name) if since_last else None
+        vehicles = iter_vehicles(conn, filters, after, batch_size)
+        first = next(vehicles, None)
         
+        if first is None:
+            print("💭 No new vehicles since the last export." if after is not None else "💭 No vehicles to export.")
+            conn.close()
+            return
+        
+        # Determine output filename
+        if not output_file:
+            output_file = f"otherides_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
+        
+        # Write to a temporary file so a failed export leaves nothing behind
+        count = 0
+        last_id = 0
+        last_created_at = None
+        tmp_file = f"{output_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            if output_format == "json":
+                f.write(f'{{\n  "export_timestamp": {json.dumps(datetime.now().isoformat())},\n  "vehicles": [\n')
+            
+            for vehicle in itertools.chain([first], vehicles):
+                if output_format == "json":
+                    f.write(",\n" if count else "")
+                    f.write("    " + json.dumps(vehicle))
+                else:
+                    f.write(json.dumps(vehicle) + "\n")
+                count += 1
+                # The highest id written is the next --since-last watermark
+                if vehicle['id'] > last_id:
+                    last_id = vehicle['id']
+                if vehicle['created_at'] and (last_created_at is None or vehicle['created_at'] > last_created_at):
+                    last_created_at = vehicle['created_at']
+            
+            if output_format == "json":
+                f.write(f'\n  ],\n  "total_vehicles": {count}\n}}\n')
+        os.replace(tmp_file, output_file)
         conn.close()
         
+        # Record the watermark for the next --since-last export
+        log = sqlite3.connect(db_path)
+        with log:
+            log.execute(
+                "INSERT INTO exports (name, format, output_file, filters, row_count, last_created_at, "
+                "last_vehicle_id, exported_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (export_name, output_format, output_file, json.dumps(filters or {}), count,
+                 last_created_at, last_id, datetime.now().isoformat())
+            )
+        log.close()
+        
+        print(f"✅ Exported {count} vehicles to {output_file}")
+        
     except sqlite3.Error as e:
         print(f"❌ Database error: {e}")
     except Exception as e:
@@ -188,15 +415,32 @@ def main():
         print("  all        - View all vehicles")
         print("  factions   - View faction statistics")
         print("  biomes     - View biome distribution")
-        print("  export     - Export all data to JSON")
+        print("  traits     - View trait rarity")
+        print("  rarity     - View the rarest vehicles and their rarity scores")
+        print("  names      - View unused variant names per faction/type")
+        print("  dedupe     - Find visually near-identical vehicles")
+        print("  migrate    - Upgrade the database schema")
+        print("  export     - Export vehicle metadata to JSON or NDJSON")
         print("\nOptions:")
         print("  --db <path>     - Specify database path (default: otherides_assets.db)")
         print("  --output <file> - Specify output file for export")
+        print(f"  --distance <n>  - Max differing pHash bits for dedupe (default: {DEFAULT_MAX_DISTANCE})")
+        print("  --limit <n>     - Number of vehicles shown by rarity (default: 20)")
+        print("  --format <fmt>  - Export format: json (default) or ndjson")
+        print(f"  --<filter> <v>  - Export only matching vehicles ({', '.join('--' + f.replace('_', '-') for f in EXPORT_FILTERS)})")
+        print("  --since-last    - Export only vehicles added since the last export")
+        print("  --name <name>   - Export name that --since-last continues from (default: default)")
         return
     
     command = sys.argv[1]
     db_path = "otherides_assets.db"
     output_file = None
+    max_distance = DEFAULT_MAX_DISTANCE
+    limit = 20
+    output_format = "json"
+    filters = {}
+    since_last = False
+    export_name = "default"
     
     # Parse options
     i = 2
@@ -207,6 +451,25 @@ def main():
         elif sys.argv[i] == "--output" and i + 1 < len(sys.argv):
             output_file = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == "--distance" and i + 1 < len(sys.argv):
+            max_distance = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == "--limit" and i + 1 < len(sys.argv):
+            limit = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == "--format" and i + 1 < len(sys.argv):
+            output_format = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i].startswith("--") and sys.argv[i][2:].replace('-', '_') in EXPORT_FILTERS \
+                and i + 1 < len(sys.argv):
+            filters[sys.argv[i][2:].replace('-', '_')] = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == "--since-last":
+            since_last = True
+            i += 1
+        elif sys.argv[i] == "--name" and i + 1 < len(sys.argv):
+            export_name = sys.argv[i + 1]
+            i += 2
         else:
             i += 1
     
@@ -217,11 +480,21 @@ def main():
         view_faction_stats(db_path)
     elif command == "biomes":
         view_biome_distribution(db_path)
+    elif command == "traits":
+        view_trait_rarity(db_path)
+    elif command == "rarity":
+        view_rarity_ranks(db_path, limit)
+    elif command == "names":
+        view_free_names(db_path)
+    elif command == "dedupe":
+        dedupe_collection(db_path, max_distance)
+    elif command == "migrate":
+        migrate_database(db_path)
     elif command == "export":
-        export_metadata(db_path, output_file)
+        export_metadata(db_path, output_file, output_format, filters, since_last, export_name)
     else:
         print(f"❌ Unknown command: {command}")
-        print("Use 'all', 'factions', 'biomes', or 'export'")
+        print("Use 'all', 'factions', 'biomes', 'traits', 'rarity', 'names', 'dedupe', 'migrate', or 'export'")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file